@@ -0,0 +1,141 @@
+# async_driver_api.py
+"""Awaitable high-level operations on top of AsyncEnipTransport."""
+import asyncio
+from typing import Optional, Union
+from interfaces import AsyncTransport
+from async_transport import AsyncEnipTransport
+from forward_open import ForwardOpenParams
+from input_reader import ImplicitInputReader, InputMap, IN_POS, MOVE
+from o2t_payload import O2TPayload, IN_FW_JOG, IN_START, IN_STOP, IN_ALM_RST
+from direct_data import DirectDataStream
+
+class AsyncDriverAPI:
+    def __init__(self, drive_ip: str, rpi_ms: int = 10,
+                 transport: Optional[AsyncTransport] = None,
+                 fixed_out_offset: Optional[int] = None,
+                 fo_params: Optional[ForwardOpenParams] = None,
+                 input_map: Optional[InputMap] = None):
+        self.rpi_ms = max(1, int(rpi_ms))
+        if fo_params is None:
+            fo_params = ForwardOpenParams(o2t_rpi_us=self.rpi_ms * 1000, t2o_rpi_us=self.rpi_ms * 1000)
+        self.tx = transport or AsyncEnipTransport(drive_ip, fixed_out_offset=fixed_out_offset,
+                                                  fo_params=fo_params)
+        self.input = ImplicitInputReader(fixed_out_offset=fixed_out_offset, input_map=input_map)
+        self.out: O2TPayload = getattr(self.tx, "payload", None) or O2TPayload()
+        self._push_out = not hasattr(self.tx, "payload")
+
+    # True while the T→O stream is lost (set by the transport's watchdog, cleared by the next packet)
+    @property
+    def input_stale(self) -> bool:
+        return bool(getattr(self.tx, "input_stale", False))
+
+    @property
+    def _rpi_s(self) -> float:
+        return getattr(self.tx, "input_period_s", self.rpi_ms / 1000.0)
+
+    def _command(self, **fields):
+        self.out.update(**fields)
+        if self._push_out:
+            self.tx.update_app(self.out.snapshot())
+
+    async def connect(self):
+        await self.tx.connect()
+        self._command(fixed_in=IN_STOP)  # idle baseline
+        o2t_size = getattr(getattr(self.tx, "fo_params", None), "o2t_size", 44)
+        self.tx.start_cyclic(rpi_ms=self.rpi_ms, o2t_size=o2t_size)
+
+    async def close(self):
+        self.tx.stop_cyclic()
+        await self.tx.close()
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _poll_input_once(self):
+        data = self.tx.get_app()
+        if data:
+            self.input.update(data)
+
+    async def _await_input(self, timeout_s: float):
+        await self.tx.wait_packets(1, timeout=timeout_s)
+        self._poll_input_once()
+
+    async def wait_for(self, bits_set: int = 0, bits_clear: int = 0,
+                       timeout: Optional[float] = None) -> bool:
+        """Await Fixed I/O (OUT) bits; resolves on the packet that satisfies them."""
+        ok = await self.tx.wait_for(bits_set, bits_clear, timeout)
+        self._poll_input_once()
+        return ok
+
+    async def stop(self):
+        self._command(fixed_in=IN_STOP)
+        for _ in range(3):
+            await self._await_input(self._rpi_s)
+
+    async def jog(self, duration_s: float = 1.0):
+        self._command(fixed_in=IN_FW_JOG)
+        try:
+            await asyncio.sleep(max(0.0, duration_s))
+        finally:
+            await self.stop()
+
+    async def alarm_reset(self):
+        if self.input.alarm_active():
+            self._command(fixed_in=IN_ALM_RST)
+            for _ in range(3):
+                await self._await_input(self._rpi_s)
+
+    async def motor_operation(self, n: int, timeout_s: float = 10.0) -> bool:
+        """Run stored operation `n` (1-based); True once IN-POS is reported."""
+        if not 1 <= int(n) <= 256:
+            raise ValueError("operation number must be 1..256")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(0.0, timeout_s)
+        self._command(op_select=int(n) - 1, fixed_in=IN_START)
+        try:
+            # let the drive take START: IN-POS drops once motion begins
+            await self.wait_for(bits_clear=IN_POS, timeout=min(3 * self._rpi_s, timeout_s))
+            return await self.wait_for(bits_set=IN_POS, bits_clear=MOVE,
+                                       timeout=max(0.0, deadline - loop.time()))
+        finally:
+            await self.stop()
+
+    async def stream(self, setpoints, timeout_s: Optional[float] = None, queue_size: int = 64) -> dict:
+        """Async counterpart of DriverAPI.Motor_Stream; returns the stream stats."""
+        stream = DirectDataStream(setpoints, queue_size=queue_size).attach(self.out)
+        self.tx.set_cycle_hook(stream.on_cycle)
+        loop = asyncio.get_running_loop()
+        end = None if timeout_s is None else loop.time() + max(0.0, timeout_s)
+        try:
+            # the hook runs on this loop's timer, so polling here is cheap and race-free
+            while not stream.done and (end is None or loop.time() < end):
+                await asyncio.sleep(self._rpi_s)
+        finally:
+            stream.cancel()
+            for _ in range(4):
+                if stream.done:
+                    break
+                await asyncio.sleep(self._rpi_s)
+            self.tx.set_cycle_hook(None)
+        return stream.stats()
+
+    async def pause(self, seconds: float, keep: Union[str, bytes] = "stop"):
+        """Async counterpart of DriverAPI.Pause (keep="stop" | "hold" | bytes payload)."""
+        if isinstance(keep, (bytes, bytearray)):
+            self.tx.update_app(bytes(keep))
+        elif isinstance(keep, str):
+            k = keep.lower()
+            if k == "stop":
+                self._command(fixed_in=IN_STOP)
+            elif k != "hold":
+                raise ValueError("keep must be 'stop', 'hold', or bytes payload")
+        else:
+            raise TypeError("keep must be str or bytes")
+        await asyncio.sleep(max(0.0, float(seconds)))
+        self._poll_input_once()
+
+__all__ = ["AsyncDriverAPI"]
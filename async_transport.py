@@ -0,0 +1,447 @@
+# async_transport.py
+"""asyncio-native EtherNet/IP transport (no threads).
+
+RegisterSession/ForwardOpen run over an asyncio TCP stream, implicit I/O
+over an asyncio.DatagramProtocol, and the cyclic O→T stream is driven by
+the event loop's timer on absolute RPI deadlines. One loop can host many
+drives without a thread pair per axis: they share one UDP endpoint on the
+I/O port, and T→O packets are routed by T→O connection ID (falling back to
+the source IP), as DriveGroup does.
+
+Each tick also watches the input: with no T→O packet for input_timeout_s
+the transport goes stale (pending waits fail at once), sends ForwardClose
+and reconnects with bounded exponential backoff while the cyclic timer runs.
+"""
+from __future__ import annotations
+import asyncio, socket, struct, weakref
+from typing import Callable, Dict, List, Optional, Tuple
+from hexutil import hx
+from types_hex import REGISTER_SESSION_HEX
+from enip_transport import EnipSender, IoFrame
+from forward_open import (ForwardOpenParams, ForwardOpenReply, build_forward_open,
+                          parse_forward_open_reply, build_forward_close, parse_forward_close_reply,
+                          next_connection_ids)
+from input_listener import UdpInputListener, SeqTracker, _SAI_HEAD
+from input_reader import InputMap
+from bit_waiters import BitWaiterIndex, matches
+from cyclic_scheduler import DeadlineScheduler, POLICY_SKIP
+from o2t_payload import O2TPayload
+
+class _FutureWaiter:
+    __slots__ = ("fut",)
+    def __init__(self, fut: asyncio.Future):
+        self.fut = fut
+    def resolve(self, word: Optional[int]) -> None:
+        """`word` None: the input went stale, the wait fails."""
+        if not self.fut.done():
+            self.fut.set_result(word)
+
+# === shared I/O endpoint ===
+class _SharedEndpoint(asyncio.DatagramProtocol):
+    """The one UDP socket on the I/O port of an event loop; routes T→O datagrams
+    to their transport by T→O connection ID, else by source IP."""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.dgram: Optional[asyncio.DatagramTransport] = None
+        self.ready: Optional[asyncio.Future] = None
+        self.by_conn: Dict[int, "AsyncEnipTransport"] = {}
+        self.by_ip: Dict[str, "AsyncEnipTransport"] = {}
+        self.users = 0
+        self.unrouted = 0
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        tr = None
+        if len(data) >= 14:
+            _n, typ, ln, cid, _seq = _SAI_HEAD.unpack_from(data, 0)
+            if typ == 0x8002 and ln >= 8:
+                tr = self.by_conn.get(cid)
+        if tr is None:
+            tr = self.by_ip.get(addr[0])
+        if tr is None:
+            self.unrouted += 1
+            return
+        tr._on_datagram(data)
+
+    def error_received(self, exc: Exception) -> None:
+        pass    # ICMP unreachable etc.; the cyclic streams keep going
+
+    def route(self, tr: "AsyncEnipTransport") -> None:
+        self.unroute(tr)
+        if tr.t2o_conn_id:
+            self.by_conn[tr.t2o_conn_id] = tr
+        self.by_ip[tr.drive_ip] = tr
+
+    def unroute(self, tr: "AsyncEnipTransport") -> None:
+        for cid in [c for c, t in self.by_conn.items() if t is tr]:
+            del self.by_conn[cid]
+        if self.by_ip.get(tr.drive_ip) is tr:
+            del self.by_ip[tr.drive_ip]
+
+_ENDPOINTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[int, _SharedEndpoint]]" = \
+    weakref.WeakKeyDictionary()
+
+async def _acquire_endpoint(port: int) -> _SharedEndpoint:
+    """This loop's endpoint on `port`, created (bound to it) by the first user."""
+    loop = asyncio.get_running_loop()
+    eps = _ENDPOINTS.setdefault(loop, {})
+    ep = eps.get(port)
+    if ep is None:
+        ep = eps[port] = _SharedEndpoint(port)
+        ep.ready = loop.create_future()
+        try:
+            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            except Exception:
+                pass
+            try:
+                s.bind(("", port))
+                s.setblocking(False)
+                ep.dgram, _ = await loop.create_datagram_endpoint(lambda: ep, sock=s)
+            except BaseException:
+                s.close()
+                raise
+        except BaseException:
+            del eps[port]
+            raise
+        finally:
+            ep.ready.set_result(None)
+    else:
+        await asyncio.shield(ep.ready)
+        if ep.dgram is None:
+            raise OSError(f"could not open the I/O endpoint on UDP/{port}")
+    ep.users += 1
+    return ep
+
+def _release_endpoint(ep: _SharedEndpoint) -> None:
+    ep.users -= 1
+    if ep.users <= 0 and ep.dgram is not None:
+        ep.dgram.close()
+        ep.dgram = None
+        for eps in _ENDPOINTS.values():
+            if eps.get(ep.port) is ep:
+                del eps[ep.port]
+
+class AsyncEnipTransport:
+    def __init__(self, drive_ip: str, tcp_port: int = 44818, udp_port: int = 2222,
+                 fixed_out_offset: Optional[int] = None, connect_timeout_s: float = 5.0,
+                 fo_params: Optional[ForwardOpenParams] = None):
+        self.drive_ip = drive_ip
+        self.tcp_port = tcp_port
+        self.udp_port = udp_port
+        self.connect_timeout_s = connect_timeout_s
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._ep: Optional[_SharedEndpoint] = None
+        self._peer = (drive_ip, udp_port)
+
+        self.session = 0
+        self.conn_id = 0
+        self.t2o_conn_id = 0
+        self.fo_params = fo_params or ForwardOpenParams()
+        self.granted: Optional[ForwardOpenReply] = None
+        self._conn_serial = 0
+        self.seq_ctp = 1
+        self.seq_sai = 1
+
+        self._o2t_size = 44
+        self.payload = O2TPayload()
+        self._cycle_hook: Optional[Callable[[memoryview], None]] = None
+        self._frame: Optional[IoFrame] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._sched: Optional[DeadlineScheduler] = None
+
+        # input side
+        self._latest = b""
+        self._count = 0
+        self._fixed_off: Optional[int] = fixed_out_offset
+        self._word = 0
+        self._have_word = False
+        self._waiters = BitWaiterIndex()
+        self._pkt_futs: List[Tuple[int, asyncio.Future]] = []
+        self._seq = SeqTracker()
+
+        # input watchdog + reconnect
+        self._last_rx = 0.0
+        self._connected_at = 0.0
+        self._stale = False
+        self._recover_task: Optional[asyncio.Task] = None
+        self.reconnect_backoff = (0.05, 2.0)    # first delay, cap (s)
+        self._link = {"drops": 0, "last_downtime_s": 0.0, "total_downtime_s": 0.0}
+
+    # === connection ===
+    async def _request(self, msg: bytes) -> bytes:
+        self._writer.write(msg)
+        await self._writer.drain()
+        hdr = await self._reader.readexactly(24)
+        ln = struct.unpack_from("<H", hdr, 2)[0]
+        return hdr + (await self._reader.readexactly(ln) if ln else b"")
+
+    async def connect(self) -> None:
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.drive_ip, self.tcp_port), self.connect_timeout_s)
+        try:
+            reg = await asyncio.wait_for(self._request(hx(REGISTER_SESSION_HEX)), self.connect_timeout_s)
+            self.session = int.from_bytes(reg[4:8], "little") if len(reg) >= 8 else 0
+            if self.session == 0:
+                raise RuntimeError("RegisterSession failed")
+            p = self.fo_params
+            serial, t2o_id = next_connection_ids()
+            if p.conn_serial is not None: serial = p.conn_serial
+            if p.t2o_conn_id is not None: t2o_id = p.t2o_conn_id
+            rep = await asyncio.wait_for(
+                self._request(build_forward_open(self.session, p, serial, t2o_id)), self.connect_timeout_s)
+            g = parse_forward_open_reply(rep)
+            if g is None or g.o2t_conn_id == 0:
+                raise RuntimeError("ForwardOpen failed")
+            self.granted = g
+            self._conn_serial = serial
+            self.conn_id, self.t2o_conn_id = g.o2t_conn_id, g.t2o_conn_id
+        except BaseException:
+            await self._close_tcp()
+            raise
+        self._frame = IoFrame(self.conn_id, self._o2t_size, self.payload.snapshot())
+        if self._ep is None:
+            try:
+                self._ep = await _acquire_endpoint(self.udp_port)
+            except BaseException:
+                await self.forward_close()
+                await self._close_tcp()
+                raise
+        self._ep.route(self)
+        self._connected_at = asyncio.get_running_loop().time()
+
+    async def _close_tcp(self) -> None:
+        w, self._writer, self._reader = self._writer, None, None
+        if w is not None:
+            w.close()
+            try:
+                await w.wait_closed()
+            except Exception:
+                pass
+
+    async def forward_close(self, timeout_s: float = 0.5) -> bool:
+        """Release the connection on the drive so its slot is free for the next ForwardOpen."""
+        serial, self._conn_serial = self._conn_serial, 0
+        if not (self._writer and self.session and serial):
+            return False
+        try:
+            rep = await asyncio.wait_for(
+                self._request(build_forward_close(self.session, self.fo_params, serial)), timeout_s)
+            return parse_forward_close_reply(rep)
+        except Exception:
+            return False
+
+    async def close(self) -> None:
+        self.stop_cyclic()
+        t, self._recover_task = self._recover_task, None
+        if t is not None and t is not asyncio.current_task():
+            t.cancel()
+        await self.forward_close()
+        await self._close_tcp()
+        if self._ep is not None:
+            self._ep.unroute(self)
+            _release_endpoint(self._ep)
+            self._ep = None
+        self.session = 0
+        self.conn_id = 0
+        self.t2o_conn_id = 0
+        self.granted = None
+        self._frame = None
+        self._waiters.resolve_all(None)
+        for _, f in self._pkt_futs:
+            if not f.done():
+                f.set_result(False)
+        self._pkt_futs.clear()
+
+    # === output ===
+    def send_app(self, app: bytes) -> None:
+        """One-shot send of `app` (does not change the cyclic payload)."""
+        if not (self._ep and self._ep.dgram and self.conn_id):
+            raise RuntimeError("Not connected")
+        self._ep.dgram.sendto(EnipSender._build_udp_io_cpf(self.conn_id, self.seq_ctp, self.seq_sai, app),
+                              self._peer)
+        self.seq_ctp = (self.seq_ctp + 1) & 0xFFFF
+        self.seq_sai = (self.seq_sai + 1) & 0xFFFF
+
+    def update_app(self, app: bytes) -> None:
+        """Replace the whole O→T payload the cyclic timer transmits."""
+        self.payload.load(app)
+
+    def set_cycle_hook(self, hook: Optional[Callable[[memoryview], None]]) -> None:
+        """Call `hook(app)` each tick after the payload is copied into the frame."""
+        self._cycle_hook = hook
+
+    def start_cyclic(self, rpi_ms: int = 10, o2t_size: int = 44,
+                     miss_policy: str = POLICY_SKIP) -> None:
+        """Arm the loop timer; each RPI slot sends the preassembled frame."""
+        o2t_size = max(0, int(o2t_size))
+        if o2t_size != self._o2t_size:
+            self._o2t_size = o2t_size
+            self.payload.resize(o2t_size)
+            if self.conn_id:
+                self._frame = IoFrame(self.conn_id, o2t_size, self.payload.snapshot())
+        if self._timer is not None:
+            return
+        loop = asyncio.get_running_loop()
+        if self.granted and self.granted.o2t_api_us:
+            period = self.granted.o2t_api_us / 1e6      # negotiated in ForwardOpen
+        else:
+            period = max(0.001, rpi_ms / 1000.0)
+        self._sched = DeadlineScheduler(period, policy=miss_policy)
+        self._sched.start(loop.time())
+        self._timer = loop.call_at(self._sched.next_deadline, self._tick)
+
+    def stop_cyclic(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    @property
+    def input_period_s(self) -> float:
+        if self.granted and self.granted.t2o_api_us:
+            return self.granted.t2o_api_us / 1e6
+        return self.fo_params.t2o_rpi_us / 1e6
+
+    @property
+    def input_timeout_s(self) -> float:
+        return self.fo_params.timeout_factor * self.input_period_s
+
+    def cyclic_stats(self) -> dict:
+        return self._sched.stats() if self._sched else {}
+
+    def link_stats(self) -> dict:
+        """Connection drops and the downtime (s) of the last / all recoveries."""
+        return dict(self._link)
+
+    @property
+    def input_stale(self) -> bool:
+        """True from an input timeout until the next T→O packet."""
+        return self._stale
+
+    def _tick(self) -> None:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        self._sched.fired(now)
+        self._timer = loop.call_at(self._sched.next_deadline, self._tick)
+        if (self.conn_id and not self._stale and
+                now - max(self._last_rx, self._connected_at) > self.input_timeout_s):
+            self._on_input_timeout(now)
+        fr, ep = self._frame, self._ep
+        if fr is None or ep is None or ep.dgram is None or not self.conn_id:
+            return
+        d = ep.dgram
+        self.payload.copy_into(fr.app)
+        if self._cycle_hook is not None:
+            self._cycle_hook(fr.app)
+        fr.stamp(self.seq_ctp, self.seq_sai)
+        d.sendto(fr.buf, self._peer)
+        self.seq_ctp = (self.seq_ctp + 1) & 0xFFFF
+        self.seq_sai = (self.seq_sai + 1) & 0xFFFF
+
+    # === watchdog ===
+    def _on_input_timeout(self, now: float) -> None:
+        """No T→O packet within the connection timeout: fail waits now and reconnect."""
+        self._stale = True
+        self._link["drops"] += 1
+        self._waiters.resolve_all(None)
+        for _, f in self._pkt_futs:
+            if not f.done():
+                f.set_result(False)
+        self._pkt_futs.clear()
+        if self._recover_task is None or self._recover_task.done():
+            self._recover_task = asyncio.get_running_loop().create_task(self._recover(now))
+
+    async def _recover(self, t_detect: float) -> None:
+        loop = asyncio.get_running_loop()
+        await self.forward_close(timeout_s=0.2)
+        await self._close_tcp()
+        self.session = self.conn_id = self.t2o_conn_id = 0
+        delay, cap = self.reconnect_backoff
+        while self._timer is not None:      # give up once the cyclic stream is stopped
+            try:
+                await self.connect()
+            except (OSError, RuntimeError, asyncio.TimeoutError):
+                await asyncio.sleep(delay)
+                delay = min(cap, delay * 2)
+                continue
+            down = loop.time() - t_detect
+            self._link["last_downtime_s"] = down
+            self._link["total_downtime_s"] += down
+            return
+
+    # === input ===
+    def get_app(self) -> bytes:
+        return self._latest
+
+    def fixed_word(self) -> int:
+        return self._word
+
+    def input_stats(self) -> dict:
+        """Accepted/lost/duplicate/reordered T→O packet counters."""
+        return self._seq.stats()
+
+    def _on_datagram(self, data: bytes) -> None:
+        now = asyncio.get_running_loop().time()
+        if len(data) >= 14:
+            _n, typ, ln, cid, seq = _SAI_HEAD.unpack_from(data, 0)
+            if typ == 0x8002 and ln >= 8 and not self._seq.accept(cid, seq, now):
+                return
+        app = UdpInputListener._extract_app_from_cpf(data)
+        if app is None:
+            return
+        self._last_rx = now
+        self._stale = False
+        self._latest = app
+        self._count += 1
+        off = self._fixed_off
+        if off is None:
+            off = self._fixed_off = InputMap.detect_fixed_out(app)
+        if len(app) >= off + 2:
+            word = app[off] | (app[off + 1] << 8)
+            if word != self._word or not self._have_word:
+                old = self._word if self._have_word else ~word
+                self._word, self._have_word = word, True
+                self._waiters.on_word(old, word)
+        if self._pkt_futs:
+            keep = []
+            for target, f in self._pkt_futs:
+                if self._count >= target:
+                    if not f.done():
+                        f.set_result(True)
+                else:
+                    keep.append((target, f))
+            self._pkt_futs = keep
+
+    async def wait_for(self, bits_set: int = 0, bits_clear: int = 0,
+                       timeout: Optional[float] = None) -> bool:
+        """Await the packet whose Fixed I/O word has `bits_set` on and `bits_clear` off;
+        False on timeout, close, or when the input goes stale."""
+        if self._stale:
+            return False
+        if self._have_word and matches(self._word, bits_set, bits_clear):
+            return True
+        fut = asyncio.get_running_loop().create_future()
+        w = _FutureWaiter(fut)
+        self._waiters.add(bits_set, bits_clear, w)
+        try:
+            word = await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiters.remove(bits_set, bits_clear, w)
+        return word is not None and matches(word, bits_set, bits_clear)
+
+    async def wait_packets(self, n: int = 1, timeout: Optional[float] = None) -> bool:
+        """Await `n` more parsed input packets (False on timeout or stale input)."""
+        if self._stale:
+            return False
+        fut = asyncio.get_running_loop().create_future()
+        self._pkt_futs.append((self._count + max(1, int(n)), fut))
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            return False
+
+__all__ = ["AsyncEnipTransport"]
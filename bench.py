@@ -0,0 +1,342 @@
+# bench.py
+"""Microbenchmarks for the cyclic hot paths, plus an end-to-end loopback run.
+
+Run:
+    python bench.py                                   # microbenchmarks (ns/op)
+    python bench.py --e2e --rpi 1,2,5,10 --drives 1,2,4 --seconds 3
+    python bench.py --e2e --out now.json --baseline base.json --tolerance 0.25
+
+The end-to-end cases start enip_sim.py in a subprocess (so its CPU is not
+charged to the host) and drive the real EnipSender + UdpInputListener (a
+DriveGroup for more than one drive). Per case they report:
+
+- command-to-wire latency: payload publish -> first O→T frame carrying it
+- detect latency: T→O packet with IN-POS arriving -> wait_for() returning
+- RPI jitter: lateness vs. the send grid (p99/max) and missed slots
+- CPU per drive: host process CPU time / wall time / drives
+
+--out writes every result as JSON; with --baseline, a metric worse than the
+baseline by more than the tolerance (plus a small absolute slack for noisy
+metrics) is reported and the run exits with status 1.
+"""
+import argparse, json, os, platform, socket, subprocess, sys, threading, time
+from typing import Callable, Dict, List, Optional
+from enip_sim import SIM_INPUT_MAP
+from enip_transport import EnipSender, IoFrame
+from input_listener import UdpInputListener
+from input_reader import ImplicitInputReader, IN_POS, MOVE
+from o2t_payload import IN_START, IN_STOP
+from types_hex import MOTOR_STOP
+
+def _measure(fn: Callable[[], None], n: int, repeat: int = 3) -> dict:
+    # best of `repeat` runs of n/repeat ops: scheduler noise only ever adds time
+    for _ in range(min(n, 1000)):   # warm-up
+        fn()
+    k = max(1, n // repeat)
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        for _ in range(k):
+            fn()
+        best = min(best, (time.perf_counter_ns() - t0) / k)
+    return {"n": k * repeat, "ns_per_op": best}
+
+def _t2o_packet(seq: int, word: int) -> bytes:
+    # CPF as the simulator sends it: 0x8002 (conn id, seq) + 0x00B1 (CTP seq + 56-byte app)
+    app = bytearray(56)
+    app[4] = word & 0xFF
+    app[12:16] = (1000 + seq).to_bytes(4, "little", signed=True)
+    return (b"\x02\x00" + b"\x02\x80\x08\x00" + (0x20000001).to_bytes(4, "little") + seq.to_bytes(4, "little") +
+            b"\xb1\x00" + (2 + len(app)).to_bytes(2, "little") + (seq & 0xFFFF).to_bytes(2, "little") + bytes(app))
+
+class _NullTransport:
+    """Transport that goes nowhere, for benchmarking DriverAPI-side code."""
+    drive_ip = "bench"
+    def connect(self) -> None: ...
+    def close(self) -> None: ...
+    def send_app(self, app: bytes, mirror_over_tcp: bool = False) -> None: ...
+
+# === microbenchmarks ===
+#Legacy path: pad/slice the app then build the CPF with struct.pack + concatenation
+def bench_o2t_legacy(n: int = 200_000) -> dict:
+    state = {"ctp": 1, "sai": 1}
+    cur, size = MOTOR_STOP, 44
+    def op():
+        app = (cur + b"\x00" * size)[:size]
+        EnipSender._build_udp_io_cpf(0x11223344, state["ctp"], state["sai"], app)
+        state["ctp"] = (state["ctp"] + 1) & 0xFFFF
+        state["sai"] = (state["sai"] + 1) & 0xFFFF
+    return _measure(op, n)
+
+#Preassembled frame: patch the two sequence counters in place
+def bench_o2t_frame(n: int = 200_000) -> dict:
+    fr = IoFrame(0x11223344, 44, MOTOR_STOP)
+    state = [1, 1]
+    def op():
+        fr.stamp(state[0], state[1])
+        state[0] = (state[0] + 1) & 0xFFFF
+        state[1] = (state[1] + 1) & 0xFFFF
+    return _measure(op, n)
+
+#T→O: CPF walk to the 0x00B1 app
+def bench_t2o_extract(n: int = 200_000) -> dict:
+    pkt = _t2o_packet(1, IN_POS)
+    return _measure(lambda: UdpInputListener._extract_app_from_cpf(pkt), n)
+
+#T→O: full listener path (sequence filter, word decode, waiter index, hooks)
+def bench_listener_feed(n: int = 100_000) -> dict:
+    lis = UdpInputListener("bench", passive=True)
+    # one packet per op, sequence always advancing (a repeated sequence would be dropped early)
+    pkts = [_t2o_packet(i + 1, IN_POS if i % 8 else MOVE) for i in range(n + 1000)]
+    it = iter(pkts)
+    return _measure(lambda: lis.feed(next(it)), n)
+
+#T→O: socket drain of a burst of 8 datagrams (recv_into, in-place CPF, newest image published);
+#per burst, including the 8 loopback sendto calls that queue it
+def bench_listener_drain(n: int = 20_000) -> dict:
+    rx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rx.bind(("127.0.0.1", 0))
+    rx.setblocking(False)
+    tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    tx.connect(rx.getsockname())
+    lis = UdpInputListener("bench", udp_socket=rx)
+    lis._rx = rx                        # read in place of start()'s receive thread
+    pkts = [_t2o_packet(i + 1, IN_POS if i % 8 else MOVE) for i in range(8 * (n + 1000))]
+    it = iter(pkts)
+    send = tx.send
+    def op():
+        for _ in range(8):
+            send(next(it))
+        lis._drain()
+    try:
+        return _measure(op, n)
+    finally:
+        tx.close(); rx.close()
+
+#Input decode: update() with a new packet, then the Fixed I/O word
+def bench_input_update(n: int = 200_000) -> dict:
+    rd = ImplicitInputReader()
+    apps = [UdpInputListener._extract_app_from_cpf(_t2o_packet(i, IN_POS)) for i in (1, 2)]
+    state = [0]
+    def op():
+        state[0] ^= 1
+        rd.update(apps[state[0]])
+        rd.fixed_out().raw
+    return _measure(op, n)
+
+#Progress emit with a callback that reads two fields
+def bench_emit_progress(n: int = 100_000) -> dict:
+    from driver_api import DriverAPI
+    apps = [UdpInputListener._extract_app_from_cpf(_t2o_packet(i, IN_POS)) for i in (1, 2)]
+    state = [0]
+    def get_app():
+        state[0] ^= 1
+        return apps[state[0]]
+    drv = DriverAPI("bench", transport=_NullTransport(), get_input_app=get_app,
+                    input_map=SIM_INPUT_MAP)
+    cb = lambda snap: (snap.in_pos, snap["position"])
+    def op():
+        drv._poll_input_once()
+        drv._emit_progress(cb, started=True)
+    return _measure(op, n)
+
+CASES = {
+    "o2t_frame_legacy": bench_o2t_legacy,
+    "o2t_frame_preassembled": bench_o2t_frame,
+    "t2o_extract_cpf": bench_t2o_extract,
+    "t2o_listener_feed": bench_listener_feed,
+    "t2o_listener_drain8": bench_listener_drain,
+    "input_update_fixed_out": bench_input_update,
+    "driver_emit_progress": bench_emit_progress,
+}
+
+# === end-to-end loopback ===
+SIM_BASE = "127.0.0."
+SIM_FIRST = 2
+
+def _pct(xs: List[float], q: float) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+def start_sims(count: int, move_s: float = 0.02, timeout_s: float = 10.0) -> subprocess.Popen:
+    """Run `count` simulators in a child process and wait until they accept TCP."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.Popen([sys.executable, os.path.join(here, "enip_sim.py"), "--ip", f"{SIM_BASE}{SIM_FIRST}",
+                             "--count", str(count), "--move-s", str(move_s)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    end = time.monotonic() + timeout_s
+    for i in range(count):
+        while True:
+            try:
+                socket.create_connection((f"{SIM_BASE}{SIM_FIRST + i}", 44818), timeout=0.2).close()
+                break
+            except OSError:
+                if time.monotonic() > end or proc.poll() is not None:
+                    proc.kill()
+                    raise RuntimeError("simulators did not come up")
+                time.sleep(0.05)
+    return proc
+
+def _drive_moves(api, seconds: float, detect: List[float]) -> int:
+    """Run short moves on one drive for `seconds`; collects packet -> detection latency."""
+    lis = api._listener
+    state = {"armed": False, "t": 0.0}
+    def hook(app, word, now):
+        if state["armed"] and word & IN_POS and not word & MOVE:
+            state["t"] = now
+            state["armed"] = False
+    lis.add_packet_hook(hook)
+    end = time.monotonic() + seconds
+    moves = 0
+    try:
+        while time.monotonic() < end:
+            api._command(op_select=moves % 2, fixed_in=IN_START)
+            api.wait_for(bits_clear=IN_POS, timeout=0.5)
+            state["t"], state["armed"] = 0.0, True
+            ok = api.wait_for(bits_set=IN_POS, bits_clear=MOVE, timeout=2.0)
+            t_seen = time.monotonic()
+            state["armed"] = False
+            if ok and state["t"]:
+                detect.append(t_seen - state["t"])
+                moves += 1
+            api._command(fixed_in=IN_STOP)
+            lis.wait_packets(2, timeout=1.0)
+    finally:
+        lis.remove_packet_hook(hook)
+    return moves
+
+def bench_e2e(rpi_ms: int, drives: int, seconds: float = 2.0) -> dict:
+    """One loopback case against already running simulators (see start_sims)."""
+    from driver_api import DriverAPI
+    from drive_group import DriveGroup
+    ips = [f"{SIM_BASE}{SIM_FIRST + i}" for i in range(drives)]
+    group = None
+    if drives == 1:
+        apis = [DriverAPI(ips[0], rpi_ms=rpi_ms)]
+        for a in apis:
+            a.connect()
+    else:
+        group = DriveGroup()
+        apis = [group.add(ip, rpi_ms=rpi_ms) for ip in ips]
+        report = group.connect_all()
+        if not report.ok:
+            group.close_all()
+            raise RuntimeError(report.summary())
+    try:
+        time.sleep(0.2)
+        for a in apis:
+            a.tx._sched.reset_stats()
+            a.tx.command_latency.reset()
+        detect: List[float] = []
+        moves = [0] * drives
+        def run(i):
+            moves[i] = _drive_moves(apis[i], seconds, detect)
+        threads = [threading.Thread(target=run, args=(i,), daemon=True) for i in range(drives)]
+        w0, c0 = time.monotonic(), time.process_time()
+        for t in threads: t.start()
+        for t in threads: t.join(seconds + 10.0)
+        wall, cpu = time.monotonic() - w0, time.process_time() - c0
+        cyc = [a.cyclic_stats() for a in apis]
+        cmd = [a.command_latency_stats() for a in apis]
+    finally:
+        if group is not None:
+            group.close_all()
+        else:
+            for a in apis:
+                a.close()
+    return {
+        "moves": sum(moves),
+        "cmd_p50_us": max(c["p50_us"] for c in cmd),
+        "cmd_p99_us": max(c["p99_us"] for c in cmd),
+        "detect_p50_us": _pct(detect, 0.5) * 1e6,
+        "detect_p99_us": _pct(detect, 0.99) * 1e6,
+        "late_p99_us": max(c["late_p99_us"] for c in cyc),
+        "late_max_us": max(c["late_max_us"] for c in cyc),
+        "missed": sum(c["missed"] for c in cyc),
+        "cpu_pct_per_drive": 100.0 * cpu / wall / drives,
+    }
+
+# === baseline comparison ===
+# metric -> absolute slack added to the relative tolerance (lower is better for all of them)
+REGRESSION_METRICS = {
+    "ns_per_op": 20.0,
+    "cmd_p50_us": 500.0,
+    "cmd_p99_us": 1000.0,
+    "detect_p50_us": 200.0,
+    "detect_p99_us": 1000.0,
+    "late_p99_us": 500.0,
+    "missed": 5,
+    "cpu_pct_per_drive": 2.0,
+}
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float = 0.25) -> List[str]:
+    """Regressions of `results` against `baseline` as readable lines (empty: none)."""
+    out = []
+    for case, cur in results.items():
+        base = baseline.get(case)
+        if not base:
+            continue
+        for metric, slack in REGRESSION_METRICS.items():
+            if metric not in cur or metric not in base:
+                continue
+            limit = base[metric] * (1.0 + tolerance) + slack
+            if cur[metric] > limit:
+                out.append(f"{case}: {metric} {cur[metric]:.1f} > {limit:.1f} (baseline {base[metric]:.1f})")
+    return out
+
+def _ints(s: str) -> List[int]:
+    return [int(x) for x in s.split(",") if x]
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Hot-path and end-to-end benchmarks")
+    ap.add_argument("--e2e", action="store_true", help="also run the loopback cases")
+    ap.add_argument("--no-micro", action="store_true", help="skip the microbenchmarks")
+    ap.add_argument("--rpi", default="1,2,5,10", help="RPIs (ms) for --e2e")
+    ap.add_argument("--drives", default="1,2", help="drive counts for --e2e")
+    ap.add_argument("--seconds", type=float, default=2.0, help="duration of each --e2e case")
+    ap.add_argument("--out", help="write results as JSON")
+    ap.add_argument("--baseline", help="JSON from an earlier --out; regressions fail the run")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    a = ap.parse_args(argv)
+
+    results: Dict[str, dict] = {}
+    if not a.no_micro:
+        for name, fn in CASES.items():
+            r = results[f"micro/{name}"] = fn()
+            print(f"{name:28s} {r['ns_per_op']:9.1f} ns/op")
+    if a.e2e:
+        counts = _ints(a.drives)
+        sims = start_sims(max(counts))
+        try:
+            print(f"{'case':18s} {'moves':>5s} {'cmd p50':>8s} {'p99':>8s} {'detect p50':>10s} {'p99':>8s} "
+                  f"{'late p99':>8s} {'max':>8s} {'missed':>6s} {'cpu%/drv':>8s}")
+            for rpi in _ints(a.rpi):
+                for n in counts:
+                    name = f"rpi{rpi}ms_drives{n}"
+                    r = results[f"e2e/{name}"] = bench_e2e(rpi, n, a.seconds)
+                    print(f"{name:18s} {r['moves']:5d} {r['cmd_p50_us']:8.0f} {r['cmd_p99_us']:8.0f} "
+                          f"{r['detect_p50_us']:10.0f} {r['detect_p99_us']:8.0f} {r['late_p99_us']:8.0f} "
+                          f"{r['late_max_us']:8.0f} {r['missed']:6d} {r['cpu_pct_per_drive']:8.1f}")
+        finally:
+            sims.terminate()
+            sims.wait(5.0)
+    if a.out:
+        meta = {"python": platform.python_version(), "platform": platform.platform(),
+                "cpus": os.cpu_count(), "time": time.time()}
+        with open(a.out, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=1, sort_keys=True)
+    if a.baseline:
+        with open(a.baseline) as f:
+            base = json.load(f)["results"]
+        bad = compare(results, base, a.tolerance)
+        for line in bad:
+            print("REGRESSION", line)
+        if bad:
+            return 1
+        print(f"no regressions vs {a.baseline} (tolerance {a.tolerance:.0%})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
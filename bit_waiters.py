@@ -0,0 +1,100 @@
+# bit_waiters.py
+"""Bitmask-indexed waiters on a 16-bit status word (e.g. Fixed I/O OUT).
+
+A waiter asks for `bits_set` all on and `bits_clear` all off. Waiters with
+the same (set, clear) pair share one group, and groups are indexed by the
+bits they watch, so a word change only re-checks the groups touching the
+bits that actually flipped instead of scanning every waiter.
+
+Waiters are any object with `resolve(word: int) -> None`; the caller picks
+the wake-up mechanism (threading.Event, asyncio future, ...).
+"""
+from typing import Dict, List, Set, Tuple
+
+Key = Tuple[int, int]
+
+def matches(word: int, bits_set: int, bits_clear: int) -> bool:
+    return (word & bits_set) == bits_set and not (word & bits_clear)
+
+class BitWaiterIndex:
+    def __init__(self):
+        self._groups: Dict[Key, List[object]] = {}
+        self._by_bit: Dict[int, Set[Key]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(g) for g in self._groups.values())
+
+    def add(self, bits_set: int, bits_clear: int, waiter) -> None:
+        key = (bits_set & 0xFFFF, bits_clear & 0xFFFF)
+        grp = self._groups.get(key)
+        if grp is None:
+            grp = self._groups[key] = []
+            mask = key[0] | key[1]
+            if not mask:    # unconditional: candidate on any change
+                self._by_bit.setdefault(-1, set()).add(key)
+            b = 0
+            while mask:
+                if mask & 1:
+                    self._by_bit.setdefault(b, set()).add(key)
+                mask >>= 1; b += 1
+        grp.append(waiter)
+
+    def remove(self, bits_set: int, bits_clear: int, waiter) -> None:
+        key = (bits_set & 0xFFFF, bits_clear & 0xFFFF)
+        grp = self._groups.get(key)
+        if not grp:
+            return
+        try:
+            grp.remove(waiter)
+        except ValueError:
+            return
+        if not grp:
+            self._drop(key)
+
+    def on_word(self, old: int, new: int) -> None:
+        """Resolve (and remove) every waiter satisfied by an edge old→new."""
+        changed = (old ^ new) & 0xFFFF
+        if not changed or not self._groups:
+            return
+        keys: Set[Key] = set(self._by_bit.get(-1, ()))
+        b = 0
+        while changed:
+            if changed & 1:
+                ks = self._by_bit.get(b)
+                if ks:
+                    keys |= ks
+            changed >>= 1; b += 1
+        for key in keys:
+            if matches(new, key[0], key[1]):
+                for w in self._groups[key]:
+                    w.resolve(new)
+                self._drop(key)
+
+    def resolve_all(self, word: int) -> None:
+        """Wake every waiter regardless of its condition (e.g. on shutdown)."""
+        for grp in self._groups.values():
+            for w in grp:
+                w.resolve(word)
+        self._groups.clear()
+        self._by_bit.clear()
+
+    def _drop(self, key: Key) -> None:
+        del self._groups[key]
+        mask = key[0] | key[1]
+        if not mask:
+            ks = self._by_bit.get(-1)
+            if ks is not None:
+                ks.discard(key)
+                if not ks:
+                    del self._by_bit[-1]
+        b = 0
+        while mask:
+            if mask & 1:
+                ks = self._by_bit.get(b)
+                if ks is not None:
+                    ks.discard(key)
+                    if not ks:
+                        del self._by_bit[b]
+            mask >>= 1; b += 1
+
+__all__ = ["BitWaiterIndex", "matches"]
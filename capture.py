@@ -0,0 +1,338 @@
+# capture.py
+"""Binary capture / replay of the cyclic I/O stream.
+
+File layout (little-endian, append-only):
+
+    header  "ENIPCAP1", version, header size, wall start, monotonic start, label
+    chunk*  "CHNK", record count, payload bytes, first t, last t
+            record*  t (monotonic f64), direction, flags, length, bytes
+
+CaptureWriter copies each frame into a preallocated buffer under a short
+lock. A background thread writes full buffers (and, every
+`flush_interval_s`, the partial one) as chunks. When no buffer is free the
+record is dropped and counted, so the sending and receiving threads never
+wait on the disk.
+
+CaptureReader maps the file and yields memoryview slices of the map (no
+copies). Chunk headers carry their time range, so time-window reads skip
+whole chunks of a multi-GB capture.
+
+Replayer feeds a capture back at recorded, accelerated (speed > 1) or
+maximum (speed=0) pace into a sink: a UdpInputListener (DriverAPI logic,
+waiters, history), an ImplicitInputReader, or a SimAdapter's O→T input.
+
+    cap = drv.start_capture("run.cap"); ...; drv.stop_capture()
+    with CaptureReader("run.cap") as r:
+        Replayer(r, speed=4.0).run(listener_sink(lis))
+"""
+import collections, mmap, os, struct, threading, time
+from typing import Callable, Iterator, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:         # optional: only needed for CaptureReader.index()
+    np = None
+
+O2T = 0
+T2O = 1
+FLAG_APP_ONLY = 0x01        # T→O app image without CPF framing (e.g. from io_process)
+
+MAGIC = b"ENIPCAP1"
+VERSION = 1
+_HDR = struct.Struct("<8sHHdd32s")
+_CHUNK = struct.Struct("<4sIIdd")
+_REC = struct.Struct("<dBBH")
+CHUNK_MAGIC = b"CHNK"
+O2T_APP_OFF = 20            # app offset in an O→T CPF frame (see enip_transport.IoFrame)
+
+Record = Tuple[float, int, int, memoryview]     # t, direction, flags, data
+
+class CaptureWriter:
+    def __init__(self, path: str, label: str = "", buffer_size: int = 1 << 20, buffers: int = 4,
+                 flush_interval_s: float = 0.5):
+        self.path = path
+        self._f = open(path, "wb")
+        self._f.write(_HDR.pack(MAGIC, VERSION, _HDR.size, time.time(), time.monotonic(),
+                                label.encode()[:32]))
+        self.buffer_size = max(4096, int(buffer_size))
+        self._free = collections.deque(bytearray(self.buffer_size) for _ in range(max(2, int(buffers)) - 1))
+        self._full: collections.deque = collections.deque()
+        self._cur: Optional[bytearray] = bytearray(self.buffer_size)
+        self._pos = 0
+        self._nrec = 0
+        self._t_first = 0.0
+        self._t_last = 0.0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.flush_interval_s = max(0.01, float(flush_interval_s))
+        self.records = 0
+        self.dropped = 0
+        self.bytes_written = _HDR.size
+        self._thr = threading.Thread(target=self._run, name="enip-capture", daemon=True)
+        self._thr.start()
+
+    # === producers (cyclic sender, receive thread) ===
+    def record(self, direction: int, data, t: Optional[float] = None, flags: int = 0) -> bool:
+        """Append one frame; False if it was dropped (no free buffer or oversized)."""
+        if t is None:
+            t = time.monotonic()
+        n = len(data)
+        need = _REC.size + n
+        with self._lock:
+            buf = self._cur
+            if buf is None or self._pos + need > len(buf):
+                if buf is not None and self._nrec:
+                    self._swap_locked()
+                buf = self._cur
+                if buf is None or need > len(buf):
+                    self.dropped += 1
+                    return False
+            p = self._pos
+            _REC.pack_into(buf, p, t, direction, flags, n)
+            buf[p + _REC.size:p + need] = data
+            self._pos = p + need
+            if not self._nrec:
+                self._t_first = t
+            self._t_last = t
+            self._nrec += 1
+            self.records += 1
+        return True
+
+    def _swap_locked(self) -> None:
+        self._full.append((self._cur, self._pos, self._nrec, self._t_first, self._t_last))
+        self._cur = self._free.popleft() if self._free else None
+        self._pos = 0
+        self._nrec = 0
+        self._wake.set()
+
+    # === background flush ===
+    def _run(self) -> None:
+        while True:
+            woke = self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            stopping = self._stop.is_set()
+            if not woke or stopping:
+                with self._lock:
+                    if self._nrec and self._cur is not None:
+                        self._swap_locked()
+                    if self._cur is None and self._free:
+                        self._cur = self._free.popleft()
+            self._write_full()
+            if stopping:
+                return
+
+    def _write_full(self) -> None:
+        while self._full:
+            buf, n, nrec, tf, tl = self._full.popleft()
+            try:
+                self._f.write(_CHUNK.pack(CHUNK_MAGIC, nrec, n, tf, tl))
+                self._f.write(memoryview(buf)[:n])
+                self.bytes_written += _CHUNK.size + n
+            finally:
+                with self._lock:
+                    if self._cur is None:
+                        self._cur = buf         # producers were dropping: resume at once
+                    else:
+                        self._free.append(buf)
+        self._f.flush()
+
+    def close(self) -> None:
+        """Flush everything recorded so far and close the file."""
+        if self._thr is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thr.join()
+        self._thr = None
+        self._f.close()
+
+    def stats(self) -> dict:
+        return {"records": self.records, "dropped": self.dropped, "bytes_written": self.bytes_written}
+
+    def __enter__(self) -> "CaptureWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class CaptureReader:
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "rb")
+        size = os.fstat(self._f.fileno()).st_size
+        if size < _HDR.size:
+            self._f.close()
+            raise ValueError(f"{path}: not a capture file")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mv = memoryview(self._mm)
+        magic, ver, hsize, self.wall_start, self.mono_start, label = _HDR.unpack_from(self._mv, 0)
+        if magic != MAGIC or ver > VERSION:
+            self.close()
+            raise ValueError(f"{path}: not a capture file (or newer version {ver})")
+        self.label = label.rstrip(b"\x00").decode(errors="replace")
+        self._data_off = hsize
+
+    def chunks(self) -> Iterator[Tuple[int, int, int, float, float]]:
+        """(offset of first record, record count, bytes, first t, last t) per complete chunk."""
+        mv, off, end = self._mv, self._data_off, len(self._mv)
+        while off + _CHUNK.size <= end:
+            magic, nrec, n, tf, tl = _CHUNK.unpack_from(mv, off)
+            off += _CHUNK.size
+            if magic != CHUNK_MAGIC or off + n > end:
+                return                  # truncated tail (capture still running or crashed)
+            yield off, nrec, n, tf, tl
+            off += n
+
+    def records(self, t0: Optional[float] = None, t1: Optional[float] = None,
+                direction: Optional[int] = None) -> Iterator[Record]:
+        """Yield (t, direction, flags, data) with t0 <= t < t1; `data` is a view into the map."""
+        mv = self._mv
+        unpack = _REC.unpack_from
+        hs = _REC.size
+        for off, nrec, n, tf, tl in self.chunks():
+            if (t0 is not None and tl < t0) or (t1 is not None and tf >= t1):
+                continue
+            end = off + n
+            while off < end:
+                t, d, fl, ln = unpack(mv, off)
+                off += hs
+                if (direction is None or d == direction) and (t0 is None or t >= t0) and \
+                        (t1 is None or t < t1):
+                    yield t, d, fl, mv[off:off + ln]
+                off += ln
+
+    __iter__ = records
+
+    def count(self) -> int:
+        return sum(c[1] for c in self.chunks())
+
+    def time_range(self) -> Tuple[float, float]:
+        first = last = None
+        for _off, _nrec, _n, tf, tl in self.chunks():
+            if first is None:
+                first = tf
+            last = tl
+        return (first or 0.0, last or 0.0)
+
+    def index(self, direction: Optional[int] = None):
+        """NumPy arrays (t, direction, offset, length) of every record, for vector analysis."""
+        if np is None:
+            raise RuntimeError("CaptureReader.index() needs NumPy")
+        n = self.count()
+        t = np.empty(n, "<f8"); d = np.empty(n, "u1"); o = np.empty(n, "<i8"); ln = np.empty(n, "<u2")
+        mv, unpack, hs, i = self._mv, _REC.unpack_from, _REC.size, 0
+        for off, nrec, nb, _tf, _tl in self.chunks():
+            end = off + nb
+            while off < end:
+                t[i], d[i], _fl, ln[i] = unpack(mv, off)
+                o[i] = off + hs
+                off += hs + ln[i]
+                i += 1
+        if direction is not None:
+            m = d == direction
+            return t[m], d[m], o[m], ln[m]
+        return t, d, o, ln
+
+    def data(self, offset: int, length: int) -> memoryview:
+        return self._mv[offset:offset + length]
+
+    def close(self) -> None:
+        try:
+            self._mv.release()
+            self._mm.close()
+        except (BufferError, ValueError):
+            pass                        # record views still alive; the map goes with them
+        self._f.close()
+
+    def __enter__(self) -> "CaptureReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+# === replay ===
+Sink = Callable[[float, int, int, memoryview], None]
+
+class Replayer:
+    def __init__(self, reader: CaptureReader, speed: float = 1.0, t0: Optional[float] = None,
+                 t1: Optional[float] = None, direction: Optional[int] = None):
+        """speed: 1.0 real time, >1 faster, 0 as fast as possible."""
+        self.reader = reader
+        self.speed = max(0.0, float(speed))
+        self.t0, self.t1, self.direction = t0, t1, direction
+        self._stop = threading.Event()
+        self._thr: Optional[threading.Thread] = None
+        self.replayed = 0
+        self.late_max_s = 0.0
+
+    def run(self, sink: Sink) -> dict:
+        """Replay into `sink(t, direction, flags, data)` on the calling thread."""
+        base_rec = base_wall = None
+        for t, d, fl, data in self.reader.records(self.t0, self.t1, self.direction):
+            if self._stop.is_set():
+                break
+            if self.speed:
+                if base_rec is None:
+                    base_rec, base_wall = t, time.monotonic()
+                due = base_wall + (t - base_rec) / self.speed
+                now = time.monotonic()
+                if due - now > 0.002 and self._stop.wait(due - now - 0.001):
+                    break
+                while time.monotonic() < due:
+                    pass
+                late = time.monotonic() - due
+                if late > self.late_max_s:
+                    self.late_max_s = late
+            sink(t, d, fl, data)
+            self.replayed += 1
+        return {"replayed": self.replayed, "late_max_us": self.late_max_s * 1e6}
+
+    def start(self, sink: Sink) -> "Replayer":
+        self._thr = threading.Thread(target=self.run, args=(sink,), name="enip-replay", daemon=True)
+        self._thr.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        if self._thr is not None:
+            self._thr.join(timeout)
+            return not self._thr.is_alive()
+        return True
+
+# --- sinks ---
+def listener_sink(listener) -> Sink:
+    """T→O records into a UdpInputListener (passive=True), driving DriverAPI waits/hooks."""
+    def sink(t, d, fl, data):
+        if d != T2O:
+            return
+        if fl & FLAG_APP_ONLY:
+            listener.feed_app(bytes(data))
+        else:
+            listener.feed(bytes(data))
+    return sink
+
+def reader_sink(reader) -> Sink:
+    """T→O records into an ImplicitInputReader."""
+    from input_listener import UdpInputListener
+    def sink(t, d, fl, data):
+        if d != T2O:
+            return
+        app = bytes(data) if fl & FLAG_APP_ONLY else UdpInputListener._extract_app_from_cpf(bytes(data))
+        if app:
+            reader.update(app)
+    return sink
+
+def sim_sink(sim) -> Sink:
+    """O→T records into a SimAdapter's input model (see SimAdapter.feed_o2t)."""
+    def sink(t, d, fl, data):
+        if d == O2T and len(data) > O2T_APP_OFF:
+            sim.feed_o2t(bytes(data[O2T_APP_OFF:]))
+    return sink
+
+__all__ = [
+    "CaptureWriter", "CaptureReader", "Replayer", "listener_sink", "reader_sink", "sim_sink",
+    "O2T", "T2O", "FLAG_APP_ONLY",
+]
@@ -0,0 +1,218 @@
+# cyclic_scheduler.py
+"""Deadline-based period scheduler for the cyclic O→T stream.
+
+Aims at absolute monotonic deadlines (start + n*period) instead of sleeping
+a fixed period after each send, so send time and stalls do not accumulate
+into drift. Missed slots are either caught up or skipped, and per-cycle
+lateness is recorded for jitter statistics.
+
+With a `wake` event, wait_next() also returns early for a change of state
+(EVENT): the caller sends the new payload right away, at most once per
+`min_gap_s`, and the grid either re-phases to the event or keeps going.
+"""
+import threading, time
+from array import array
+from typing import Optional
+
+POLICY_SKIP = "skip"        # late by >= 1 period: jump to the next future slot
+POLICY_CATCHUP = "catchup"  # late: fire missed slots back-to-back (bounded)
+
+SLOT = 1                    # wait_next(): a periodic deadline fired
+EVENT = 2                   # wait_next(): woken for an immediate (change-of-state) send
+
+class DeadlineScheduler:
+    def __init__(self, period_s: float, policy: str = POLICY_SKIP, spin_s: float = 0.0,
+                 max_catchup: int = 3, history: int = 4096, min_gap_s: float = 0.001,
+                 rephase_on_event: bool = True):
+        if policy not in (POLICY_SKIP, POLICY_CATCHUP):
+            raise ValueError("policy must be 'skip' or 'catchup'")
+        self.period_s = max(1e-6, float(period_s))
+        self.policy = policy
+        self.spin_s = max(0.0, float(spin_s))   # hybrid mode: sleep, then busy-wait the last spin_s
+        self.max_catchup = max(0, int(max_catchup))
+        self.min_gap_s = max(0.0, float(min_gap_s))     # event sends: spacing after the previous frame
+        self.rephase_on_event = bool(rephase_on_event)  # next slot one period after an event send
+        self._next = 0.0
+        self._behind = 0
+        self._last_fire = float("-inf")
+
+        # lateness ring (seconds), preallocated so recording never allocates
+        self._hist = array("d", bytes(8 * max(1, int(history))))
+        self._hist_i = 0
+        self._hist_n = 0
+        self.reset_stats()
+
+    def start(self, now: Optional[float] = None) -> None:
+        """Anchor slot 0 at `now` (monotonic); the first wait returns immediately."""
+        self._next = time.monotonic() if now is None else now
+        self._behind = 0
+
+    def rephase(self) -> None:
+        """Re-anchor the grid at the current time (e.g. after a reconnect stall)."""
+        self.start()
+
+    def wait_next(self, stop: threading.Event, wake: Optional[threading.Event] = None) -> int:
+        """Block until the next slot's deadline. Returns SLOT, or False if `stop` was set.
+
+        With `wake`, also returns EVENT once `wake` is set and `min_gap_s` has passed
+        since the previous send (set `wake` after `stop` to interrupt the wait).
+        """
+        if wake is None:
+            deadline = self._next
+            now = time.monotonic()
+            remaining = deadline - now - self.spin_s
+            if remaining > 0:
+                if stop.wait(remaining):
+                    return False
+            elif stop.is_set():
+                return False
+            self._spin_until(deadline)
+            return SLOT
+        while True:
+            now = time.monotonic()
+            if stop.is_set():
+                return False
+            deadline = self._next
+            if wake.is_set():
+                due = self.event_due
+                if due < deadline:
+                    if due > now:
+                        stop.wait(due - now)    # hold the change back to min_gap_s
+                        continue
+                    wake.clear()
+                    self.event_fired(now)
+                    return EVENT
+            remaining = deadline - now - self.spin_s
+            if remaining > 0:
+                wake.wait(remaining)
+                continue
+            wake.clear()                # this slot's frame carries any pending change
+            self._spin_until(deadline)
+            return SLOT
+
+    def _spin_until(self, deadline: float) -> None:
+        if self.spin_s:
+            now = time.monotonic()
+            while now < deadline:
+                now = time.monotonic()
+        else:
+            now = time.monotonic()
+        self.fired(now)
+
+    @property
+    def next_deadline(self) -> float:
+        """Monotonic time of the next slot (for timer-driven loops, e.g. loop.call_at)."""
+        return self._next
+
+    def fired(self, now: float) -> None:
+        """Record that the current slot fired at `now` and advance to the next one."""
+        self._record(now - self._next)
+        self._last_fire = now
+        self._advance(now)
+
+    @property
+    def event_due(self) -> float:
+        """Earliest monotonic time an event send may go out (min_gap_s after the last send)."""
+        return self._last_fire + self.min_gap_s
+
+    def event_fired(self, now: float) -> None:
+        """Record an immediate send at `now`; re-phases the grid if rephase_on_event."""
+        self.events += 1
+        self._last_fire = now
+        if self.rephase_on_event:
+            self._next = now + self.period_s
+            self._behind = 0
+
+    def _advance(self, now: float) -> None:
+        nxt = self._next + self.period_s
+        if nxt > now:
+            self._behind = 0
+            self._next = nxt
+            return
+        # we are at least one full slot late
+        late_slots = int((now - nxt) // self.period_s) + 1
+        if self.policy == POLICY_CATCHUP and self._behind < self.max_catchup:
+            self._behind += 1
+            self._next = nxt
+            return
+        self.missed += late_slots
+        self._behind = 0
+        self._next = nxt + late_slots * self.period_s
+
+    def _record(self, late: float) -> None:
+        if late < 0.0:
+            late = 0.0
+        self.cycles += 1
+        self._sum += late
+        if late < self._min: self._min = late
+        if late > self._max: self._max = late
+        self._hist[self._hist_i] = late
+        self._hist_i = (self._hist_i + 1) % len(self._hist)
+        if self._hist_n < len(self._hist):
+            self._hist_n += 1
+
+    # === statistics ===
+    def reset_stats(self) -> None:
+        self.cycles = 0
+        self.missed = 0
+        self.events = 0
+        self._sum = 0.0
+        self._min = float("inf")
+        self._max = 0.0
+        self._hist_i = 0
+        self._hist_n = 0
+
+    def stats(self) -> dict:
+        """Lateness summary in microseconds (p99 over the recent history window)."""
+        n = self.cycles
+        if n == 0:
+            return {"cycles": 0, "missed": self.missed, "events": self.events, "period_us": self.period_s * 1e6,
+                    "late_min_us": 0.0, "late_mean_us": 0.0, "late_p99_us": 0.0, "late_max_us": 0.0}
+        recent = sorted(self._hist[:self._hist_n])
+        p99 = recent[min(len(recent) - 1, int(0.99 * len(recent)))]
+        return {
+            "cycles": n,
+            "missed": self.missed,
+            "events": self.events,
+            "period_us": self.period_s * 1e6,
+            "late_min_us": self._min * 1e6,
+            "late_mean_us": self._sum / n * 1e6,
+            "late_p99_us": p99 * 1e6,
+            "late_max_us": self._max * 1e6,
+        }
+
+class LatencyStats:
+    """Preallocated ring of latency samples (seconds) with a µs summary."""
+
+    def __init__(self, history: int = 1024):
+        self._hist = array("d", bytes(8 * max(1, int(history))))
+        self.reset()
+
+    def reset(self) -> None:
+        self.count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._i = 0
+        self._n = 0
+
+    def record(self, seconds: float) -> None:
+        if seconds < 0.0:
+            seconds = 0.0
+        self.count += 1
+        self._sum += seconds
+        if seconds > self._max: self._max = seconds
+        self._hist[self._i] = seconds
+        self._i = (self._i + 1) % len(self._hist)
+        if self._n < len(self._hist):
+            self._n += 1
+
+    def stats(self) -> dict:
+        """count, mean/p50/p99/max in µs (percentiles over the recent window)."""
+        if self.count == 0:
+            return {"count": 0, "mean_us": 0.0, "p50_us": 0.0, "p99_us": 0.0, "max_us": 0.0}
+        recent = sorted(self._hist[:self._n])
+        pick = lambda q: recent[min(len(recent) - 1, int(q * len(recent)))] * 1e6
+        return {"count": self.count, "mean_us": self._sum / self.count * 1e6,
+                "p50_us": pick(0.5), "p99_us": pick(0.99), "max_us": self._max * 1e6}
+
+__all__ = ["DeadlineScheduler", "LatencyStats", "POLICY_SKIP", "POLICY_CATCHUP", "SLOT", "EVENT"]
@@ -0,0 +1,178 @@
+# direct_data.py
+"""Streaming Direct Data Operation: one setpoint per O→T cycle.
+
+Setpoints are (position, speed, accel, decel, trigger) rows taken from an
+iterator/generator (of tuples or dicts) or a NumPy array. They are packed
+ahead of time into the 18-byte direct-data block (O→T bytes 12..29) and
+the cyclic sender copies one block per cycle into the outgoing frame.
+
+Iterators are drained by a producer thread into a bounded queue: the
+producer blocks when the queue is full (backpressure), and if it falls
+behind the sender repeats the last setpoint and counts an underrun.
+NumPy arrays are converted in one shot, with no per-point Python packing.
+"""
+import collections, struct, threading
+from typing import Any, Dict, Optional
+from o2t_payload import O2TPayload, DD_FIELDS, DD32_OFF
+
+try:
+    import numpy as np
+except ImportError:         # optional: only needed for array sources
+    np = None
+
+FIELDS = ("position", "speed", "accel", "decel", "trigger")
+_ROW = struct.Struct("<iiiiH")      # direct-data block as laid out at DD32_OFF
+ROW_SIZE = _ROW.size
+_DTYPE = [("position", "<i4"), ("speed", "<i4"), ("accel", "<i4"), ("decel", "<i4"), ("trigger", "<u2")]
+
+class DirectDataStream:
+    def __init__(self, source: Any, base: Optional[Dict[str, int]] = None, queue_size: int = 64):
+        """`source`: iterable of tuples (in FIELDS order, may be shorter) or dicts, or an
+        (N, k<=5) / structured NumPy array. Omitted fields come from `base`
+        (usually the payload's current values, see attach()).
+        """
+        self._source = source
+        self._base = dict(base or {})
+        self._queue_size = max(1, int(queue_size))
+        self._q: collections.deque = collections.deque()
+        self._room = threading.Semaphore(self._queue_size)
+        self._rows: Optional[memoryview] = None     # array source: all blocks, packed
+        self._n = 0
+        self._idx = 0
+        self._last: Optional[bytes] = None
+        self._producer_done = False
+        self._done = threading.Event()
+        self._cancel = threading.Event()
+        self._payload: Optional[O2TPayload] = None
+        self._thread: Optional[threading.Thread] = None
+        self.error: Optional[BaseException] = None
+
+        self.sent = 0
+        self.underruns = 0
+
+    # === setup ===
+    def _defaults(self) -> tuple:
+        return tuple(int(self._base.get(f, 0)) for f in FIELDS)
+
+    def _pack(self, pt) -> bytes:
+        d = self._defaults()
+        if isinstance(pt, dict):
+            for k in pt:
+                if k not in DD_FIELDS:
+                    raise ValueError(f"unknown direct-data field {k!r}")
+            vals = tuple(int(pt.get(f, d[i])) for i, f in enumerate(FIELDS))
+        else:
+            pt = tuple(pt)
+            if len(pt) > len(FIELDS):
+                raise ValueError(f"setpoint has {len(pt)} values, at most {len(FIELDS)} allowed")
+            vals = tuple(int(v) for v in pt) + d[len(pt):]
+        return _ROW.pack(vals[0], vals[1], vals[2], vals[3], vals[4] & 0xFFFF)
+
+    def _pack_array(self, arr) -> None:
+        rows = np.zeros(len(arr), dtype=_DTYPE)
+        for f, v in zip(FIELDS, self._defaults()):
+            rows[f] = v
+        if arr.dtype.names:
+            for f in arr.dtype.names:
+                if f not in DD_FIELDS:
+                    raise ValueError(f"unknown direct-data field {f!r}")
+                rows[f] = arr[f]
+        else:
+            a = arr.reshape(len(arr), -1)
+            if a.shape[1] > len(FIELDS):
+                raise ValueError(f"setpoint array has {a.shape[1]} columns, at most {len(FIELDS)} allowed")
+            for i in range(a.shape[1]):
+                rows[FIELDS[i]] = a[:, i]
+        self._rows = memoryview(rows.tobytes())
+        self._n = len(rows)
+
+    def attach(self, payload: O2TPayload) -> "DirectDataStream":
+        """Bind to the payload the sender streams; untouched fields default to its values."""
+        self._payload = payload
+        for f in FIELDS:
+            self._base.setdefault(f, payload.get(f))
+        src = self._source
+        if np is not None and isinstance(src, np.ndarray):
+            self._pack_array(src)
+            self._producer_done = True
+        else:
+            self._thread = threading.Thread(target=self._produce, args=(iter(src),),
+                                            name="enip-dd-producer", daemon=True)
+            self._thread.start()
+        return self
+
+    def _produce(self, it) -> None:
+        try:
+            for pt in it:
+                blk = self._pack(pt)
+                while not self._room.acquire(timeout=0.1):   # queue full: wait for the sender
+                    if self._cancel.is_set():
+                        return
+                if self._cancel.is_set():
+                    return
+                self._q.append(blk)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self._producer_done = True
+
+    # === sender side (called once per cycle with the frame's app slot) ===
+    def on_cycle(self, app) -> None:
+        if self._done.is_set():
+            return
+        blk = None
+        ended = self._cancel.is_set()
+        if ended:
+            pass
+        elif self._rows is not None:
+            i = self._idx
+            if i < self._n:
+                blk = self._rows[i * ROW_SIZE:(i + 1) * ROW_SIZE]
+                self._idx = i + 1
+            else:
+                ended = True
+        else:
+            ended = self._producer_done         # read before the queue: the last block may be in flight
+            if self._q:
+                blk = self._q.popleft()
+                self._room.release()
+        if blk is not None:
+            self._last = blk
+            self.sent += 1
+        elif ended:
+            self._finish()
+        elif self._last is not None:
+            self.underruns += 1         # producer behind: hold the previous setpoint
+        if self._last is not None:
+            app[DD32_OFF:DD32_OFF + ROW_SIZE] = self._last
+
+    def _finish(self) -> None:
+        # keep the final setpoint in the payload so it persists after the stream
+        if self._last is not None and self._payload is not None:
+            vals = _ROW.unpack(bytes(self._last))
+            self._payload.update(**dict(zip(FIELDS, vals)))
+        self._done.set()
+
+    # === control / status ===
+    def cancel(self) -> None:
+        """Stop streaming; the sender ends the stream on its next cycle."""
+        self._cancel.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def stats(self) -> dict:
+        """Setpoints sent, underruns (cycles that repeated the last setpoint), queue depth."""
+        return {
+            "sent": self.sent,
+            "underruns": self.underruns,
+            "queued": (self._n - self._idx) if self._rows is not None else len(self._q),
+            "done": self.done,
+            "error": repr(self.error) if self.error else None,
+        }
+
+__all__ = ["DirectDataStream", "FIELDS", "ROW_SIZE"]
@@ -0,0 +1,235 @@
+# discovery.py
+"""ListIdentity discovery and parallel bring-up of many drives.
+
+list_identity() sends the encapsulation ListIdentity command (0x0063) over
+UDP/44818, either as one broadcast or as a unicast sweep of an address
+list or CIDR block, and collects every reply that arrives within the
+timeout. Each responding adapter yields an Identity (vendor, device type,
+product code, revision, serial, product name, IP).
+
+connect_many() runs RegisterSession/ForwardOpen (DriverAPI.connect) for
+every drive at once, each bounded by its own timeout, and reports per-drive
+success, error and timing instead of stopping at the first dead axis:
+
+    found = list_identity("192.168.0.0/24")
+    group = DriveGroup()
+    for ident in found:
+        group.add(ident.ip, rpi_ms=4)
+    report = group.connect_all(timeout_s=1.0)
+    print(report.summary())
+"""
+import ipaddress, socket, struct, threading, time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Union
+
+LIST_IDENTITY = 0x0063
+ITEM_IDENTITY = 0x000C
+ENIP_PORT = 44818
+
+_ENCAP = struct.Struct("<HHII8sI")
+_ITEM = struct.Struct("<HH")
+# protocol version, sockaddr (big-endian family/port/addr + 8 zero), vendor, device type,
+# product code, revision major/minor, status, serial
+_IDENT = struct.Struct("<H")
+_SOCKADDR = struct.Struct(">hHI8x")
+_IDENT_FIXED = struct.Struct("<HHHBBHI")
+
+@dataclass
+class Identity:
+    ip: str                     # where the reply came from
+    vendor_id: int
+    device_type: int
+    product_code: int
+    revision: str               # "major.minor"
+    status: int
+    serial: int
+    product_name: str
+    state: int = 0xFF
+    encap_version: int = 1
+    sockaddr_ip: str = ""       # address the adapter reports for itself
+    rtt_s: float = 0.0          # request -> reply (sweep: that host's request)
+
+def build_list_identity(context: bytes = b"\x00" * 8) -> bytes:
+    return _ENCAP.pack(LIST_IDENTITY, 0, 0, 0, context[:8].ljust(8, b"\x00"), 0)
+
+def build_identity_item(vendor_id: int, device_type: int, product_code: int, revision: bytes,
+                        status: int, serial: int, product_name: bytes, ip: str, port: int = ENIP_PORT,
+                        state: int = 0x03) -> bytes:
+    """One CPF identity item (type 0x0C), as an adapter sends it."""
+    body = (_IDENT.pack(1) + _SOCKADDR.pack(socket.AF_INET, port, int(ipaddress.IPv4Address(ip)))
+            + _IDENT_FIXED.pack(vendor_id, device_type, product_code, revision[0], revision[1],
+                                status, serial)
+            + bytes([len(product_name)]) + product_name + bytes([state]))
+    return _ITEM.pack(ITEM_IDENTITY, len(body)) + body
+
+def parse_list_identity(data: bytes, src_ip: str = "") -> List[Identity]:
+    """Identity items of one ListIdentity reply; [] if it is not one."""
+    if len(data) < _ENCAP.size + 2:
+        return []
+    cmd, ln, _session, status, _ctx, _opt = _ENCAP.unpack_from(data, 0)
+    if cmd != LIST_IDENTITY or status:
+        return []
+    out: List[Identity] = []
+    p = _ENCAP.size
+    count, = struct.unpack_from("<H", data, p)
+    p += 2
+    for _ in range(count):
+        if p + _ITEM.size > len(data):
+            break
+        typ, n = _ITEM.unpack_from(data, p)
+        p += _ITEM.size
+        item, p = data[p:p + n], p + n
+        if typ != ITEM_IDENTITY or len(item) < 2 + _SOCKADDR.size + _IDENT_FIXED.size + 1:
+            continue
+        ver, = _IDENT.unpack_from(item, 0)
+        _fam, _port, addr = _SOCKADDR.unpack_from(item, 2)
+        q = 2 + _SOCKADDR.size
+        vendor, dtype, code, major, minor, st, serial = _IDENT_FIXED.unpack_from(item, q)
+        q += _IDENT_FIXED.size
+        name = item[q + 1:q + 1 + item[q]].decode("ascii", errors="replace")
+        q += 1 + item[q]
+        state = item[q] if q < len(item) else 0xFF
+        out.append(Identity(ip=src_ip or str(ipaddress.IPv4Address(addr)), vendor_id=vendor,
+                            device_type=dtype, product_code=code, revision=f"{major}.{minor}",
+                            status=st, serial=serial, product_name=name, state=state,
+                            encap_version=ver, sockaddr_ip=str(ipaddress.IPv4Address(addr))))
+    return out
+
+def _targets(targets) -> List[str]:
+    if targets is None:
+        return ["255.255.255.255"]
+    if isinstance(targets, str):
+        if "/" in targets:
+            net = ipaddress.IPv4Network(targets, strict=False)
+            return [str(a) for a in (net.hosts() if net.prefixlen < 31 else net)]
+        return [targets]
+    return [str(t) for t in targets]
+
+def list_identity(targets: Union[None, str, Iterable[str]] = None, timeout_s: float = 1.0,
+                  port: int = ENIP_PORT, bind_ip: str = "") -> List[Identity]:
+    """Discover adapters; sorted by IP, one entry per responding address.
+
+    targets: None broadcasts to 255.255.255.255; a CIDR block ("192.168.0.0/24")
+    or a list of addresses is swept by unicast (also works where broadcast is filtered).
+    Replies are collected until `timeout_s` after the last request went out.
+    """
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        s.bind((bind_ip, 0))
+        req = build_list_identity(b"discover")
+        sent: Dict[str, float] = {}
+        for ip in _targets(targets):
+            try:
+                s.sendto(req, (ip, port))
+                sent[ip] = time.monotonic()
+            except OSError:
+                pass                    # unreachable / not permitted: nobody to hear from
+        first = min(sent.values(), default=time.monotonic())
+        found: Dict[str, Identity] = {}
+        end = time.monotonic() + timeout_s
+        while True:
+            rem = end - time.monotonic()
+            if rem <= 0:
+                break
+            s.settimeout(min(rem, 0.05))
+            try:
+                data, (src, _p) = s.recvfrom(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                continue
+            now = time.monotonic()
+            for ident in parse_list_identity(data, src):
+                ident.rtt_s = now - sent.get(src, first)
+                found.setdefault(src, ident)
+        return sorted(found.values(), key=lambda i: ipaddress.IPv4Address(i.ip))
+    finally:
+        s.close()
+
+# === parallel bring-up ===
+@dataclass
+class ConnectResult:
+    ip: str
+    ok: bool = False
+    error: str = ""
+    connect_s: float = 0.0      # RegisterSession + ForwardOpen + cyclic start
+    timed_out: bool = False     # still handshaking when the deadline passed
+
+@dataclass
+class BringUpReport:
+    results: Dict[str, ConnectResult] = field(default_factory=dict)
+    total_s: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return all(r.ok for r in self.results.values())
+
+    @property
+    def connected(self) -> List[str]:
+        return [ip for ip, r in self.results.items() if r.ok]
+
+    @property
+    def failed(self) -> List[str]:
+        return [ip for ip, r in self.results.items() if not r.ok]
+
+    def summary(self) -> str:
+        lines = [f"{len(self.connected)}/{len(self.results)} drives up in {self.total_s * 1e3:.0f} ms"]
+        for ip, r in self.results.items():
+            state = "ok" if r.ok else ("timeout" if r.timed_out else f"FAILED: {r.error}")
+            lines.append(f"  {ip:<15} {r.connect_s * 1e3:7.1f} ms  {state}")
+        return "\n".join(lines)
+
+def connect_many(apis: Iterable, timeout_s: float = 2.0) -> BringUpReport:
+    """Connect every DriverAPI concurrently, each within `timeout_s`.
+
+    A drive still handshaking at its deadline is reported as timed out; if it
+    comes up later anyway it is closed again, so the report stays true.
+    """
+    apis = list(apis)
+    report = BringUpReport()
+    lock = threading.Lock()     # per drive, the worker's result and the deadline are decided once
+    t0 = time.monotonic()
+    threads = []
+    for api in apis:
+        ip = getattr(api.tx, "drive_ip", "") or getattr(api, "drive_ip", "")
+        res = report.results[ip] = ConnectResult(ip)
+        if hasattr(api.tx, "connect_timeout_s"):
+            api.tx.connect_timeout_s = timeout_s
+
+        def _run(api=api, res=res):
+            t = time.monotonic()
+            err = ""
+            try:
+                api.connect()
+            except Exception as e:
+                err = f"{type(e).__name__}: {e}"
+            with lock:
+                late = res.timed_out
+                if not late:
+                    res.ok, res.error = not err, err
+                    res.connect_s = time.monotonic() - t
+            if late and not err:
+                try:
+                    api.close()     # came up after the report gave up on it
+                except Exception:
+                    pass
+
+        th = threading.Thread(target=_run, name=f"enip-connect-{ip}", daemon=True)
+        th.start()
+        threads.append((th, res))
+    deadline = t0 + timeout_s + 0.1
+    for th, res in threads:
+        th.join(max(0.0, deadline - time.monotonic()))
+        with lock:
+            if not (res.ok or res.error):
+                res.timed_out = True
+                res.error = "timeout"
+                res.connect_s = time.monotonic() - t0
+    report.total_s = time.monotonic() - t0
+    return report
+
+__all__ = [
+    "Identity", "list_identity", "parse_list_identity", "build_list_identity", "build_identity_item",
+    "ConnectResult", "BringUpReport", "connect_many", "LIST_IDENTITY", "ENIP_PORT",
+]
@@ -0,0 +1,442 @@
+# drive_group.py
+"""Many drives behind one UDP/2222 endpoint and one I/O thread.
+
+A single socket bound to the I/O port carries every connection. Incoming
+T→O packets are routed to the right drive by the connection ID in the
+0x8002 sequenced-address item (falling back to the source IP), and all
+O→T frames go out from one loop that services each drive's RPI deadline.
+
+Coordinated commands: stage() edits for several axes, then commit() applies
+them on the I/O loop and sends every staged axis's frame back to back in
+the same tick, off their RPI slots. The CommitResult has each frame's wire
+time and the skew between them. wait_all() completes when every axis
+matches (IN-POS by default) or as soon as any raises ALM-A; move_all() is
+the group form of DriverAPI.Motor_Operation.
+
+    for ip, op in {"192.168.0.20": 1, "192.168.0.21": 3}.items():
+        group.stage(ip, op_select=op - 1, fixed_in=IN_START)
+    res = group.commit()            # res.skew_s: spread of the START frames
+    group.wait_all(timeout=10.0)
+"""
+import collections, selectors, socket, struct, threading, time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Union
+from bit_waiters import matches
+from cyclic_scheduler import LatencyStats
+from discovery import BringUpReport, connect_many
+from driver_api import DriverAPI
+from enip_transport import EnipSender
+from forward_open import ForwardOpenParams
+from input_listener import UdpInputListener
+from input_reader import IN_POS, MOVE, ALM_A
+from o2t_payload import IN_START, IN_STOP
+from rt_tuning import RtConfig, apply_thread
+
+@dataclass
+class CommitResult:
+    t_commit: float                                         # monotonic time commit() was called
+    sent_at: Dict[str, float] = field(default_factory=dict) # ip -> frame handed to the socket
+    failed: Dict[str, str] = field(default_factory=dict)    # ip -> why its frame did not go out
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+    @property
+    def skew_s(self) -> float:
+        """Spread between the first and last frame of the commit."""
+        return max(self.sent_at.values()) - min(self.sent_at.values()) if self.sent_at else 0.0
+
+    @property
+    def latency_s(self) -> float:
+        """commit() call -> last frame sent."""
+        return max(self.sent_at.values()) - self.t_commit if self.sent_at else 0.0
+
+@dataclass
+class GroupWaitResult:
+    ok: bool                                                # every axis matched
+    reached: Dict[str, float] = field(default_factory=dict) # ip -> arrival of the matching packet
+    alarmed: List[str] = field(default_factory=list)        # axes that raised an abort bit
+    lost: List[str] = field(default_factory=list)           # axes whose input went stale
+    elapsed_s: float = 0.0
+
+    @property
+    def skew_s(self) -> float:
+        """Spread between the first and last axis to match."""
+        return max(self.reached.values()) - min(self.reached.values()) if self.reached else 0.0
+
+class _Commit:
+    __slots__ = ("edits", "result", "done")
+
+    def __init__(self, edits, result: CommitResult):
+        self.edits = edits
+        self.result = result
+        self.done = threading.Event()
+
+class DriveGroup:
+    def __init__(self, bind_ip: str = "", udp_port: int = 2222, bufsize: int = 4096,
+                 rt: Optional[RtConfig] = None):
+        self.udp_port = udp_port
+        self.rt = rt                    # affinity/policy for the group I/O thread
+        self.rt_applied: dict = {}
+        self.bufsize = bufsize
+        self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self._udp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        except Exception:
+            pass
+        self._udp.bind((bind_ip, udp_port))
+        self._udp.setblocking(False)
+
+        self.drives: Dict[str, DriverAPI] = {}
+        self._by_ip: Dict[str, UdpInputListener] = {}
+        self._by_conn: Dict[int, UdpInputListener] = {}
+        self._ambiguous: set = set()
+        self._senders: List[EnipSender] = []
+        self._recovering: set = set()
+        self._lock = threading.Lock()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+
+        self._thr: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.unrouted = 0
+
+        self._staged: Dict[str, dict] = {}          # ip -> O→T field edits for the next commit
+        self._commits: collections.deque = collections.deque()
+        self.commit_skew = LatencyStats()           # first -> last frame of each commit
+
+    # === membership ===
+    def add(self, drive_ip: str, rpi_ms: int = 10, fixed_out_offset: Optional[int] = None,
+            fo_params: Optional[ForwardOpenParams] = None, **api_kwargs) -> DriverAPI:
+        """Create a DriverAPI for `drive_ip` whose I/O runs through this group."""
+        if drive_ip in self.drives:
+            raise ValueError(f"drive {drive_ip} already in group")
+        if fo_params is None:
+            fo_params = ForwardOpenParams(o2t_rpi_us=rpi_ms * 1000, t2o_rpi_us=rpi_ms * 1000)
+        tx = EnipSender(drive_ip, udp_port=self.udp_port, udp_socket=self._udp, io_loop=self,
+                        fo_params=fo_params)
+        lis = UdpInputListener(drive_ip, fixed_out_offset=fixed_out_offset, passive=True)
+        api = DriverAPI(drive_ip, rpi_ms=rpi_ms, transport=tx, listener=lis,
+                        fixed_out_offset=fixed_out_offset, **api_kwargs)
+        with self._lock:
+            self.drives[drive_ip] = api
+            self._by_ip[drive_ip] = lis
+        return api
+
+    def connect_all(self, timeout_s: float = 5.0) -> BringUpReport:
+        """Connect every drive concurrently (see discovery.connect_many); a dead
+        axis costs at most `timeout_s` and does not stop the others."""
+        self.start()
+        return connect_many(list(self.drives.values()), timeout_s)
+
+    def close_all(self) -> None:
+        for api in self.drives.values():
+            try:
+                api.close()
+            except Exception:
+                pass
+        self.stop()
+
+    def __getitem__(self, drive_ip: str) -> DriverAPI:
+        return self.drives[drive_ip]
+
+    def _ip(self, drive: Union[str, DriverAPI]) -> str:
+        ip = drive if isinstance(drive, str) else drive.tx.drive_ip
+        if ip not in self.drives:
+            raise KeyError(f"drive {ip} not in group")
+        return ip
+
+    # === coordinated commands ===
+    def stage(self, drive: Union[str, DriverAPI], **fields) -> None:
+        """Queue O→T edits (O2TPayload.update fields) for `drive` until commit();
+        staging the same axis again merges the fields."""
+        ip = self._ip(drive)
+        with self._lock:
+            self._staged.setdefault(ip, {}).update(fields)
+
+    def discard(self) -> None:
+        """Drop everything staged since the last commit."""
+        with self._lock:
+            self._staged.clear()
+
+    def commit(self, timeout_s: float = 1.0) -> CommitResult:
+        """Apply every staged edit and send all those axes' frames in the same I/O tick."""
+        res = CommitResult(time.monotonic())
+        with self._lock:
+            edits, self._staged = self._staged, {}
+        if not edits:
+            return res
+        if not (self._thr and self._thr.is_alive()):
+            raise RuntimeError("group I/O loop is not running (connect_all first)")
+        c = _Commit(edits, res)
+        if threading.current_thread() is self._thr:
+            self._run_commit(c)             # from a packet hook: we are the tick
+        else:
+            self._commits.append(c)
+            self._wake()
+        if not c.done.wait(timeout_s):
+            raise TimeoutError(f"commit not executed within {timeout_s:.3f}s")
+        if len(res.sent_at) > 1:
+            self.commit_skew.record(res.skew_s)
+        return res
+
+    def commit_stats(self) -> dict:
+        """Skew (µs) between the first and last frame of recent multi-axis commits."""
+        return self.commit_skew.stats()
+
+    def wait_all(self, drives: Optional[Iterable[Union[str, DriverAPI]]] = None, bits_set: int = IN_POS,
+                 bits_clear: int = MOVE, abort_bits: int = ALM_A,
+                 timeout: Optional[float] = None) -> GroupWaitResult:
+        """Block until every axis's Fixed I/O (OUT) word matches, or any axis shows
+        `abort_bits` (ALM-A) or loses its input. Decided on the receiving packet."""
+        ips = [self._ip(d) for d in drives] if drives is not None else list(self.drives)
+        cond = threading.Condition()
+        res = GroupWaitResult(False)
+        hooks = []
+        t0 = time.monotonic()
+
+        def _check(ip: str, word: int, now: float) -> None:
+            if word & abort_bits:
+                if ip not in res.alarmed:
+                    res.alarmed.append(ip)
+                    cond.notify_all()
+            elif ip not in res.reached and matches(word, bits_set, bits_clear):
+                res.reached[ip] = now
+                cond.notify_all()
+
+        for ip in ips:
+            lis = self._by_ip[ip]
+
+            def hook(app, word, now, ip=ip):
+                with cond:
+                    _check(ip, word, now)
+
+            lis.add_packet_hook(hook)
+            hooks.append((lis, hook))
+            if lis.get_app():
+                with cond:
+                    _check(ip, lis.fixed_word(), t0)
+        end = None if timeout is None else t0 + max(0.0, timeout)
+        try:
+            with cond:
+                while len(res.reached) < len(ips) and not res.alarmed:
+                    res.lost = [ip for ip in ips if self._by_ip[ip].is_stale()]
+                    if res.lost:
+                        break
+                    rem = None if end is None else end - time.monotonic()
+                    if rem is not None and rem <= 0:
+                        break
+                    cond.wait(0.05 if rem is None else min(rem, 0.05))  # slices: stale has no hook
+                res.ok = len(res.reached) == len(ips) and not res.alarmed and not res.lost
+        finally:
+            for lis, hook in hooks:
+                lis.remove_packet_hook(hook)
+        res.elapsed_s = time.monotonic() - t0
+        return res
+
+    def move_all(self, ops: Dict[Union[str, DriverAPI], int], timeout_s: float = 10.0) -> GroupWaitResult:
+        """Start stored operation n (1..256) on each axis in the same tick and wait until
+        all are IN-POS (or one alarms); every axis is left with STOP asserted.
+
+        Raises RuntimeError (after asserting STOP) if START could not be sent to some axis."""
+        ops = {self._ip(d): int(n) for d, n in ops.items()}
+        for ip, n in ops.items():
+            if not 1 <= n <= 256:
+                raise ValueError("operation number must be 1..256")
+        t0 = time.monotonic()
+        for ip, n in ops.items():
+            self.stage(ip, op_select=n - 1, fixed_in=IN_START)
+        try:
+            # a commit that times out may still be applied by the I/O loop: STOP follows it
+            sent = self.commit()
+            if not sent.ok:
+                raise RuntimeError("START not sent to " +
+                                   ", ".join(f"{ip} ({why})" for ip, why in sent.failed.items()))
+            # let each drive take START: IN-POS drops once motion begins (short moves may finish unseen)
+            for ip in ops:
+                api = self.drives[ip]
+                api.wait_for(bits_clear=IN_POS, timeout=max(0.0, t0 + 3 * api.input_period_s - time.monotonic()))
+            res = self.wait_all(ops, timeout=max(0.0, t0 + timeout_s - time.monotonic()))
+        except BaseException:
+            try:
+                self._stop_all(ops)
+            except Exception:
+                pass        # the first error is the one worth reporting
+            raise
+        self._stop_all(ops)
+        return res
+
+    def _stop_all(self, ips) -> None:
+        for ip in ips:
+            self.stage(ip, fixed_in=IN_STOP)
+        self.commit()
+
+    # === hooks used by EnipSender.start_cyclic/stop_cyclic ===
+    def register(self, sender: EnipSender) -> None:
+        with self._lock:
+            if sender not in self._senders:
+                sender._sched.start()
+                self._senders.append(sender)
+            lis = self._by_ip.get(sender.drive_ip)
+            if lis is not None and sender.t2o_conn_id:
+                for cid in [c for c, l in self._by_conn.items() if l is lis]:
+                    del self._by_conn[cid]
+                cid = sender.t2o_conn_id
+                other = self._by_conn.get(cid)
+                if cid in self._ambiguous or (other is not None and other is not lis):
+                    # two connections share a T→O ID: only the source IP can tell them apart
+                    self._ambiguous.add(cid)
+                    self._by_conn.pop(cid, None)
+                else:
+                    self._by_conn[cid] = lis
+        self._wake()
+
+    def notify(self, sender: EnipSender) -> None:
+        """The sender's payload changed in immediate mode: send it without waiting for the RPI."""
+        self._wake()
+
+    def unregister(self, sender: EnipSender) -> None:
+        with self._lock:
+            if sender in self._senders:
+                self._senders.remove(sender)
+            for cid, lis in list(self._by_conn.items()):
+                if lis is self._by_ip.get(sender.drive_ip):
+                    del self._by_conn[cid]
+
+    # === I/O loop ===
+    def start(self) -> None:
+        if self._thr and self._thr.is_alive():
+            return
+        self._stop.clear()
+        self._thr = threading.Thread(target=self._run, name="enip-group-io", daemon=True)
+        self._thr.start()
+
+    def stop(self, join_timeout: float = 2.0) -> None:
+        self._stop.set()
+        self._wake()
+        if self._thr:
+            self._thr.join(timeout=join_timeout)
+        self._thr = None
+
+    def _wake(self) -> None:
+        try:
+            self._wake_w.send(b"\x00")
+        except Exception:
+            pass
+
+    def _run(self) -> None:
+        self.rt_applied = apply_thread(self.rt)
+        sel = selectors.DefaultSelector()
+        sel.register(self._udp, selectors.EVENT_READ, "udp")
+        sel.register(self._wake_r, selectors.EVENT_READ, "wake")
+        try:
+            while not self._stop.is_set():
+                with self._lock:
+                    senders = list(self._senders)
+                now = time.monotonic()
+                due = min((self._due(s) for s in senders), default=now + 0.1)
+                for key, _ in sel.select(max(0.0, due - now)):
+                    if key.data == "udp":
+                        self._drain()
+                    else:
+                        try:
+                            self._wake_r.recv(4096)
+                        except Exception:
+                            pass
+                while self._commits:
+                    self._run_commit(self._commits.popleft())
+                now = time.monotonic()
+                for s in senders:
+                    sch = s._sched
+                    if sch is None:
+                        continue
+                    if sch.next_deadline <= now:
+                        s._cos_wake.clear()     # the slot's frame carries any pending change
+                        sch.fired(now)
+                    elif s._cos_wake.is_set() and sch.event_due <= now:
+                        s._cos_wake.clear()
+                        sch.event_fired(now)
+                    else:
+                        continue
+                    if s in self._recovering:
+                        continue
+                    try:
+                        s._send_cycle()
+                    except Exception:
+                        self._start_recovery(s)
+        finally:
+            sel.close()
+
+    # Publish every staged payload first, then send the frames back to back
+    def _run_commit(self, c: _Commit) -> None:
+        res = c.result
+        try:
+            for ip, fields in c.edits.items():
+                try:
+                    self.drives[ip]._command(**fields)
+                except Exception as e:
+                    res.failed[ip] = f"{type(e).__name__}: {e}"
+            for ip in c.edits:
+                s = self.drives[ip].tx
+                if ip in res.failed:
+                    continue
+                if s._sched is None or s in self._recovering or not s.conn_id:
+                    res.failed[ip] = "not connected"   # the edit still goes out once it is back
+                    continue
+                try:
+                    s._send_cycle()
+                except Exception as e:
+                    res.failed[ip] = f"{type(e).__name__}: {e}"
+                    self._start_recovery(s)
+                    continue
+                t = time.monotonic()
+                res.sent_at[ip] = t
+                s._cos_wake.clear()
+                s._sched.event_fired(t)
+        finally:
+            c.done.set()
+
+    @staticmethod
+    def _due(s: EnipSender) -> float:
+        sch = s._sched
+        if s._cos_wake.is_set():
+            return min(sch.next_deadline, sch.event_due)
+        return sch.next_deadline
+
+    def _drain(self) -> None:
+        sock = self._udp
+        while True:
+            try:
+                data, (src_ip, _port) = sock.recvfrom(self.bufsize)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return      # e.g. ICMP port unreachable surfaced on recv
+            lis = None
+            if len(data) >= 10 and data[2] == 0x02 and data[3] == 0x80:
+                lis = self._by_conn.get(struct.unpack_from("<I", data, 6)[0])
+            if lis is None:
+                lis = self._by_ip.get(src_ip)
+            if lis is None:
+                self.unrouted += 1
+                continue
+            lis.feed(data)
+
+    # Reconnect off the I/O thread so one dead axis does not stall the others
+    def _start_recovery(self, sender: EnipSender) -> None:
+        self._recovering.add(sender)
+
+        def _work():
+            try:
+                sender._recover(self._stop)
+                if sender.conn_id:
+                    self.register(sender)   # refresh the T→O connection-ID route
+            finally:
+                self._recovering.discard(sender)
+                if sender._sched is not None:
+                    sender._sched.rephase()
+
+        threading.Thread(target=_work, name=f"enip-recover-{sender.drive_ip}", daemon=True).start()
+
+__all__ = ["DriveGroup", "CommitResult", "GroupWaitResult"]
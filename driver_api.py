@@ -4,11 +4,17 @@ import time
 from typing import Optional, Callable, Union
 from interfaces import Transport  # kept for compatibility if you later inject a mock
 from enip_transport import EnipSender
-from input_reader import ImplicitInputReader
+from forward_open import ForwardOpenParams
+from input_reader import ImplicitInputReader, InputMap, IN_POS, MOVE
 from input_listener import UdpInputListener
-from types_hex import MOTOR_JOG, MOTOR_STOP, MOTOR_OP_1, MOTOR_OP_2,ALARM_RESET
+from o2t_payload import O2TPayload, IN_FW_JOG, IN_START, IN_STOP, IN_ALM_RST
+from direct_data import DirectDataStream
+from progress import ProgressSnapshot
+from motion_sequence import Sequence, SequenceRunner, SequenceResult
+from rt_tuning import RtConfig, GcGuard
+from explicit_msg import ExplicitClient
 
-ProgressFn = Callable[[dict], None]
+ProgressFn = Callable[[ProgressSnapshot], None]   # also accepts dict-style access
 
 class DriverAPI:
     def __init__(self, drive_ip: str, rpi_ms: int = 10,
@@ -16,25 +22,82 @@ class DriverAPI:
                  mirror_over_tcp: bool = False,
                  listen_port: int = 2222,             # used only if not sharing socket
                  transport: Optional[Transport] = None,
-                 fixed_out_offset: Optional[int] = None):
+                 fixed_out_offset: Optional[int] = None,
+                 listener: Optional[UdpInputListener] = None,  # injected input (e.g. from a DriveGroup)
+                 fo_params: Optional[ForwardOpenParams] = None,  # ForwardOpen request (RPI from rpi_ms if omitted)
+                 miss_policy: str = "skip",           # cyclic scheduler: "skip" or "catchup"
+                 spin_us: int = 0,                    # hybrid sleep-then-spin before each deadline
+                 input_watchdog: bool = True,         # reconnect when T→O input stops arriving
+                 input_map: Optional[InputMap] = None,    # T→O field offsets (alarm, position, ...)
+                 io_process: bool = False,            # run the cyclic I/O in a separate process
+                 rt: Optional[RtConfig] = None,       # CPU pinning / RT policy / GC handling
+                 immediate_send: bool = False,        # send each command at once, not on the next RPI
+                 history: int = 0,                    # keep the last N T→O packets (InputHistory, needs NumPy)
+                 kernel_timestamps: bool = False):    # stamp T→O arrivals with SO_TIMESTAMPNS (Linux)
         # rely on EnipSender so we can call start_cyclic/update_app
-        self.tx: EnipSender = transport or EnipSender(drive_ip)
-        self.input = ImplicitInputReader(fixed_out_offset=fixed_out_offset)
         self.rpi_ms = max(1, int(rpi_ms))
+        if fo_params is None:
+            fo_params = ForwardOpenParams(o2t_rpi_us=self.rpi_ms * 1000, t2o_rpi_us=self.rpi_ms * 1000)
+        if transport is None and io_process:
+            from io_process import ProcessEnipTransport
+            transport = ProcessEnipTransport(drive_ip, fo_params=fo_params, fixed_out_offset=fixed_out_offset,
+                                             rt=rt)
+        self.tx: EnipSender = transport or EnipSender(drive_ip, fo_params=fo_params)
+        self.input = ImplicitInputReader(fixed_out_offset=fixed_out_offset, input_map=input_map)
         self.mirror = bool(mirror_over_tcp)
+        self.miss_policy = miss_policy
+        self.spin_us = max(0, int(spin_us))
+        if immediate_send and not hasattr(self.tx, "command_latency_stats"):
+            raise ValueError("immediate_send needs a transport with change-of-state support (EnipSender)")
+        self.immediate_send = bool(immediate_send)
+        # O→T image: edited in place and streamed by the cyclic sender
+        self.out: O2TPayload = getattr(self.tx, "payload", None) or O2TPayload()
+        self._push_out = not hasattr(self.tx, "payload")   # plain Transport: hand it full frames
+
+        self._explicit: Optional[ExplicitClient] = None     # created on first use
+        self._capture = None                                 # CaptureWriter (start_capture)
+        self.instr = None                                    # instrument.Instrumentation (command hook)
 
         self._listener: Optional[UdpInputListener] = None
         self._listener_pending = False
+        self._progress = ProgressSnapshot()     # refilled on every progress emit
 
-        if get_input_app is not None:
+        if listener is not None:
+            self._listener = listener
+            self._get_in = listener.get_app
+            self._listener_pending = True
+        elif get_input_app is not None:
             self._get_in = get_input_app
+        elif hasattr(self.tx, "input_listener"):
+            # transport brings its own input path (e.g. io_process.ProcessEnipTransport)
+            self._listener = self.tx.input_listener()
+            self._get_in = self._listener.get_app
+            self._listener_pending = True
         else:
             # Share SAME UDP socket as transport; start after connect()
             shared_sock = self.tx.udp_socket()
-            self._listener = UdpInputListener(drive_ip, port=listen_port, udp_socket=shared_sock)
+            self._listener = UdpInputListener(drive_ip, port=listen_port, udp_socket=shared_sock,
+                                              fixed_out_offset=fixed_out_offset,
+                                              kernel_timestamps=kernel_timestamps)
             self._get_in = self._listener.get_app
             self._listener_pending = True
 
+        if rt is not None:
+            if hasattr(self.tx, "rt"):
+                self.tx.rt = rt
+            if self._listener is not None and listener is None:
+                self._listener.rt = rt.for_listener()
+        self._gc_guard = GcGuard(rt.gc_mode if rt else None)   # entered for the duration of each move
+
+        # ring buffer of input history for post-mortem queries (see input_history)
+        self.history: Optional["InputHistory"] = None
+        if history and self._listener is not None:
+            from input_history import InputHistory
+            self.history = InputHistory(history, input_map=input_map).attach(self._listener)
+
+        if input_watchdog and self._listener and hasattr(self.tx, "attach_input_monitor"):
+            self.tx.attach_input_monitor(self._listener.last_rx_monotonic, self._listener.mark_stale)
+
     # Sends the initial TCP handshake to begin connection and get connection ID then send baseline commands to keep connection active
     def connect(self):
         self.tx.connect()
@@ -42,18 +105,33 @@ class DriverAPI:
             self._listener.start()
             self._listener_pending = False
         # keep the Class-1 connection alive continuously
-        self.tx.update_app(MOTOR_STOP)  # idle baseline
-        self.tx.start_cyclic(rpi_ms=self.rpi_ms, mirror_over_tcp=self.mirror, o2t_size=44)
+        self._command(fixed_in=IN_STOP)  # idle baseline
+        o2t_size = getattr(getattr(self.tx, "fo_params", None), "o2t_size", 44)
+        extra = {"immediate": True} if self.immediate_send else {}
+        self.tx.start_cyclic(rpi_ms=self.rpi_ms, mirror_over_tcp=self.mirror, o2t_size=o2t_size,
+                             miss_policy=self.miss_policy, spin_us=self.spin_us, **extra)
 
     #stops the cyclic sending in order to gracefully close connection
     def close(self):
+        self.stop_capture()
         self.tx.stop_cyclic()
         self.tx.close()
         if self._listener:
             self._listener.stop()
 
+    # Apply O→T field changes together; they go out in the next cyclic frame
+    def _command(self, **fields):
+        self.out.update(**fields)
+        if self._push_out:
+            self.tx.update_app(self.out.snapshot())
+        ins = self.instr
+        if ins is not None:
+            ins.emit("command", time.monotonic(), fields)
+
     # ---- internal: poll input once (from listener/shared socket) ----
     def _poll_input_once(self):
+        if self.input_stale:
+            return      # keep the last good image; don't re-read a dead stream
         try:
             data = self._get_in() or b""
             if data:
@@ -61,63 +139,185 @@ class DriverAPI:
         except Exception:
             pass
 
+    # True while the T→O stream is lost (set by the watchdog, cleared by the next packet)
+    @property
+    def input_stale(self) -> bool:
+        return bool(self._listener and self._listener.is_stale())
+
+    # T→O packet interval the drive granted (falls back to rpi_ms)
+    @property
+    def input_period_s(self) -> float:
+        return getattr(self.tx, "input_period_s", self.rpi_ms / 1000.0)
+
+    # No T→O packet for this long means the drive has dropped the connection
+    @property
+    def input_timeout_s(self) -> float:
+        return getattr(self.tx, "input_timeout_s", 16 * self.rpi_ms / 1000.0)
+
+    # ---- internal: wait for the next input packet (falls back to one RPI sleep) ----
+    def _await_input(self, timeout_s: float):
+        if self._listener:
+            self._listener.wait_packets(1, timeout=timeout_s)
+        else:
+            time.sleep(timeout_s)
+        self._poll_input_once()
+
+    #Block until the Fixed I/O (OUT) word has bits_set on and bits_clear off
+    def wait_for(self, bits_set: int = 0, bits_clear: int = 0, timeout: Optional[float] = None) -> bool:
+        """Event-driven wait on Fixed I/O (OUT) bits (see input_reader.IN_POS, MOVE, ...).
+
+        With the built-in listener this returns on the packet that satisfies the
+        condition; with a custom get_input_app it polls once per RPI.
+        """
+        if self._listener:
+            ok = self._listener.wait_for(bits_set, bits_clear, timeout)
+            self._poll_input_once()
+            return ok
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self._poll_input_once()
+            word = self.input.fixed_out().raw
+            if (word & bits_set) == bits_set and not (word & bits_clear):
+                return True
+            if end is not None and time.monotonic() >= end:
+                return False
+            time.sleep(self.rpi_ms / 1000.0)
+
     # ---- public helpers (set desired app; cyclic sender transmits it) ----
     #Used to jog the motor for a set duration of time
     def Motor_Jog(self, duration_s: float = 1.0, progress: Optional[ProgressFn] = None):
-        self.tx.update_app(MOTOR_JOG)
-        end = time.time() + max(0.0, duration_s)
-        while time.time() < end:
-            time.sleep(self.rpi_ms / 1000.0)
-            self._poll_input_once()
-            if progress:
-                self._emit_progress(progress, started=True)
-        self.Motor_Stop(progress=progress)
+        with self._gc_guard:
+            self._command(fixed_in=IN_FW_JOG)
+            end = time.monotonic() + max(0.0, duration_s)
+            while time.monotonic() < end:
+                self._await_input(min(self.input_period_s, max(0.0, end - time.monotonic())))
+                if progress:
+                    self._emit_progress(progress, started=True)
+            self.Motor_Stop(progress=progress)
 
     #Used to stop the motor without having an overload alarm
     def Motor_Stop(self, progress: Optional[ProgressFn] = None):
-        self.tx.update_app(MOTOR_STOP)
+        self._command(fixed_in=IN_STOP)
         # give it a couple of cycles
         for _ in range(3):
-            time.sleep(self.rpi_ms / 1000.0)
-            self._poll_input_once()
+            self._await_input(self.input_period_s)
             if progress:
                 self._emit_progress(progress)
     
     def Alrm_Rst(self,progress: Optional[ProgressFn]=None):
-        if(self.input.alarm_active):
-            self.tx.update_app(ALARM_RESET)
+        if self.input.alarm_active():
+            self._command(fixed_in=IN_ALM_RST)
             for _ in range(3):
-                time.sleep(self.rpi_ms / 1000.0)
-                self._poll_input_once()
+                self._await_input(self.input_period_s)
                 if progress:
                     self._emit_progress(progress)
     
 
+    #Run stored operation n (1..256, selected through M0-M7); True once IN-POS is reported
+    def Motor_Operation(self, n: int, timeout_s: float = 10.0, progress: Optional[ProgressFn] = None) -> bool:
+        if not 1 <= int(n) <= 256:
+            raise ValueError("operation number must be 1..256")
+        with self._gc_guard:
+            return self._op_until_inpos(int(n), timeout_s, progress=progress)
+
     #First motor operation, to position 1 as marked on the H frame
     def Motor_Operation_1(self, timeout_s: float = 10.0, progress: Optional[ProgressFn] = None) -> bool:
-        return self._op_until_inpos(MOTOR_OP_1, timeout_s, progress=progress)
+        return self.Motor_Operation(1, timeout_s, progress=progress)
 
     #Second motor operation, to position 2 as marked on H frame
     def Motor_Operation_2(self, timeout_s: float = 10.0, progress: Optional[ProgressFn] = None) -> bool:
-        return self._op_until_inpos(MOTOR_OP_2, timeout_s, progress=progress)
+        return self.Motor_Operation(2, timeout_s, progress=progress)
 
     # Hold START in the stream until IN-POS is seen, then STOP once the motor reports in progress
-    def _op_until_inpos(self, payload: bytes, timeout_s: float, progress: Optional[ProgressFn]) -> bool:
-        self.tx.update_app(payload)
-        t0 = time.time()
+    def _op_until_inpos(self, op_no: int, timeout_s: float, progress: Optional[ProgressFn]) -> bool:
+        self._command(op_select=op_no - 1, fixed_in=IN_START)   # select and START in the same frame
+        t0 = time.monotonic()
         deadline = t0 + max(0.0, timeout_s)
-        while time.time() < deadline:
-            time.sleep(self.rpi_ms / 1000.0)
-            self._poll_input_once()
+        rpi_s = self.input_period_s
+        # let the drive take START: IN-POS drops once motion begins (short moves may finish unseen)
+        self.wait_for(bits_clear=IN_POS, timeout=min(3 * rpi_s, max(0.0, deadline - time.monotonic())))
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # wakes on the packet that completes the move; with progress, also once per RPI
+            done = self.wait_for(bits_set=IN_POS, bits_clear=MOVE,
+                                 timeout=min(rpi_s, remaining) if progress else remaining)
             if progress:
                 self._emit_progress(progress, started=True, t0=t0, deadline=deadline)
-            if self.input.in_pos():
+            if done:
                 self.Motor_Stop(progress=progress)
                 return True
+            if self.input_stale:
+                break   # connection lost mid-move: fail now rather than at the deadline
         # timeout safety
         self.Motor_Stop(progress=progress)
         return False
 
+    #Run a multi-step program with transitions decided on the packet that satisfies them
+    def Run_Sequence(self, seq: Sequence, timeout_s: Optional[float] = None, lookahead: bool = True,
+                     progress: Optional[ProgressFn] = None) -> SequenceResult:
+        """Execute `seq` (see motion_sequence) inside the input listener's receive path.
+
+        Returns per-step timings; the motor is left with STOP asserted.
+        """
+        if not (self._listener and hasattr(self.tx, "frames_sent")):
+            raise RuntimeError("sequences need the built-in listener and an EnipSender transport")
+        runner = SequenceRunner(seq, self.out, lambda: self.tx.frames_sent,
+                                self.input_period_s, lookahead=lookahead)
+        runner.start()
+        self._listener.add_packet_hook(runner.on_packet)
+        end = None if timeout_s is None else time.monotonic() + max(0.0, timeout_s)
+        with self._gc_guard:
+            try:
+                while not runner.done:
+                    if self.input_stale:
+                        runner.cancel("input lost")
+                    elif end is not None and time.monotonic() >= end:
+                        runner.cancel("timeout")
+                    elif progress:
+                        self._await_input(self.input_period_s)
+                        self._emit_progress(progress, started=True)
+                    else:
+                        runner.wait(0.05)
+            finally:
+                runner.cancel("interrupted")     # no-op once finished
+                self._listener.remove_packet_hook(runner.on_packet)
+                self._command(fixed_in=IN_STOP)
+        self._poll_input_once()
+        return runner.result
+
+    #Stream host-computed setpoints through the direct-data words, one per cycle
+    def Motor_Stream(self, setpoints, timeout_s: Optional[float] = None,
+                     progress: Optional[ProgressFn] = None, queue_size: int = 64) -> dict:
+        """Direct Data Operation: send one (position, speed, accel, decel, trigger) per RPI.
+
+        `setpoints` is an iterator/generator of tuples or dicts, or a NumPy array
+        (see direct_data.DirectDataStream). Blocks until all points are sent, the
+        timeout expires or input goes stale; returns the stream stats.
+        """
+        if not hasattr(self.tx, "set_cycle_hook"):
+            raise RuntimeError("transport has no per-cycle hook; streaming needs EnipSender")
+        stream = DirectDataStream(setpoints, queue_size=queue_size).attach(self.out)
+        self.tx.set_cycle_hook(stream.on_cycle)
+        end = None if timeout_s is None else time.monotonic() + max(0.0, timeout_s)
+        with self._gc_guard:
+            try:
+                while not stream.done:
+                    if self.input_stale or (end is not None and time.monotonic() >= end):
+                        break
+                    if progress:
+                        self._await_input(self.input_period_s)
+                        self._emit_progress(progress, started=True)
+                    else:
+                        stream.wait(0.05)
+            finally:
+                stream.cancel()
+                # let the sender pick up the cancel and commit the last setpoint before unhooking
+                stream.wait(4 * self.input_period_s)
+                self.tx.set_cycle_hook(None)
+        return stream.stats()
+
     #Allows for a pause function without disrupting the cyclic sender. Can additionally use keep to specify if the motor is stopped or if operation is held
     def Pause(self, seconds: float, keep: Union[str, bytes] = "stop", progress: Optional[ProgressFn] = None):
         """
@@ -129,11 +329,13 @@ class DriverAPI:
         seconds = max(0.0, float(seconds))
 
         if isinstance(keep, (bytes, bytearray)):
-            self.tx.update_app(bytes(keep))
+            self.out.load(bytes(keep))
+            if self._push_out:
+                self.tx.update_app(self.out.snapshot())
         elif isinstance(keep, str):
             k = keep.lower()
             if k == "stop":
-                self.tx.update_app(MOTOR_STOP)
+                self._command(fixed_in=IN_STOP)
             elif k == "hold":
                 pass
             else:
@@ -143,11 +345,15 @@ class DriverAPI:
 
         end = time.monotonic() + seconds
         step = max(self.rpi_ms / 1000.0, 0.005)
+        if not progress:
+            # nothing to report: one sleep instead of polling every step
+            time.sleep(seconds)
+            self._poll_input_once()
+            return
         while time.monotonic() < end:
             self._poll_input_once()
-            if progress:
-                self._emit_progress(progress)
-            time.sleep(step)
+            self._emit_progress(progress)
+            time.sleep(min(step, max(0.0, end - time.monotonic())))
 
     # ===== debugging helpers (peek what the listener/parser sees) =====
     def get_last_input_app(self) -> bytes:
@@ -162,10 +368,68 @@ class DriverAPI:
             return self._listener.get_last_packet()
         return b""
 
+    def cyclic_stats(self) -> dict:
+        """O→T send lateness vs. the RPI grid (see EnipSender.cyclic_stats)."""
+        return self.tx.cyclic_stats()
+
+    # Record both directions of the I/O stream to a capture file (see capture)
+    def start_capture(self, path: str, **kw) -> "CaptureWriter":
+        from capture import CaptureWriter
+        self.stop_capture()
+        self._capture = CaptureWriter(path, label=getattr(self.tx, "drive_ip", ""), **kw)
+        if hasattr(self.tx, "set_capture"):
+            self.tx.set_capture(self._capture)
+        if self._listener is not None:
+            self._listener.set_capture(self._capture)
+        return self._capture
+
+    def stop_capture(self) -> dict:
+        """Detach and close the capture; returns its stats ({} if none was running)."""
+        cap, self._capture = self._capture, None
+        if cap is None:
+            return {}
+        if hasattr(self.tx, "set_capture"):
+            self.tx.set_capture(None)
+        if self._listener is not None:
+            self._listener.set_capture(None)
+        cap.close()
+        return cap.stats()
+
+    # Hook points on the sender, listener and commands (see instrument)
+    def set_instrumentation(self, instr) -> None:
+        """Attach an Instrumentation to this drive's hot paths; None detaches.
+
+        With io_process=True the frames are built and sent in the child process, so
+        only packet/state/command hooks fire.
+        """
+        self.instr = instr
+        if hasattr(self.tx, "set_instrumentation"):
+            self.tx.set_instrumentation(instr)
+        if self._listener is not None and hasattr(self._listener, "set_instrumentation"):
+            self._listener.set_instrumentation(instr)
+
+    # Explicit messaging (parameters, monitors) on the transport's TCP session
+    @property
+    def explicit(self) -> ExplicitClient:
+        """ExplicitClient sharing this drive's session (see explicit_msg)."""
+        if self._explicit is None:
+            if not hasattr(self.tx, "_tcp_lock"):
+                raise RuntimeError("explicit messaging needs an EnipSender transport")
+            self._explicit = ExplicitClient(self.tx)
+        return self._explicit
+
+    def command_latency_stats(self) -> dict:
+        """Command publish -> frame on the wire (µs; see EnipSender.command_latency_stats)."""
+        return self.tx.command_latency_stats() if hasattr(self.tx, "command_latency_stats") else {}
+
+    def link_stats(self) -> dict:
+        """Connection drops and downtime/recovery times (see EnipSender.link_stats)."""
+        return self.tx.link_stats() if hasattr(self.tx, "link_stats") else {}
+
     def debug_input_snapshot(self) -> str:
         """Human-friendly one-liner showing app length, hex, Fixed I/O word and bits."""
         app = self.get_last_input_app()
-        off = getattr(self.input, "_fixed_out_offset", None) or 4
+        off = self.input.fixed_out_offset_bytes()
         word = int.from_bytes(app[off:off+2], "little") if len(app) >= off + 2 else 0
         bits = "".join("1" if word & (1 << i) else "0" for i in range(15, -1, -1))
         return (
@@ -173,29 +437,14 @@ class DriverAPI:
             f"bits(MSB→LSB)={bits} app_hex={app.hex()}"
         )
 
-    # emit a dict to any progress callback
+    # hand the reusable lazy snapshot to a progress callback (see progress.ProgressSnapshot)
     def _emit_progress(self, cb: ProgressFn, started: bool = False,
                        t0: Optional[float] = None, deadline: Optional[float] = None):
-        app = self.get_last_input_app()
-        off = getattr(self.input, "_fixed_out_offset", None) or 4
-        raw = int.from_bytes(app[off:off+2], "little") if len(app) >= off + 2 else 0
-        flags = self.input.fixed_out()
-        now = time.time()
-        payload = {
-            "ts": now,
-            "elapsed_s": (now - t0) if t0 else None,
-            "remaining_s": (deadline - now) if deadline else None,
-            "fixed_out_offset": off,
-            "fixed_out_raw": raw,
-            "in_pos": flags.in_pos,
-            "move": flags.move,
-            "ready": flags.ready,
-            "app_len": len(app),
-            "app_hex": app.hex(),
-            "started": started,
-        }
+        snap = self._progress.fill(self.get_last_input_app(), self.input.snapshot(),
+                                   self.input.fixed_out_offset_bytes(), started,
+                                   time.monotonic(), t0, deadline)
         try:
-            cb(payload)
+            cb(snap)
         except Exception:
             pass
 
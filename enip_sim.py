@@ -0,0 +1,579 @@
+# enip_sim.py
+"""Local EtherNet/IP adapter simulator for loopback testing and load generation.
+
+Stands in for an Oriental Motor drive: answers RegisterSession and
+ForwardOpen/ForwardClose over TCP, consumes O→T implicit I/O on UDP and
+produces T→O frames at the granted RPI whose Fixed I/O (OUT) bits follow
+a simple motion model:
+
+- START (rising edge, READY and no alarm): MOVE on, READY/IN-POS off for the
+  selected operation's duration (M0-M7 select), then IN-POS + READY
+- FW-JOG held: MOVE on until released; STOP aborts any motion
+- inject_alarm(): ALM-A on, READY off; ALM-RST (rising edge) clears it
+
+ListIdentity (0x0063) is answered over UDP and TCP on the encapsulation
+port with the Identity object below, so discovery.list_identity finds it.
+
+Explicit messages (Get/Set_Attribute_Single, Multiple Service Packet) are
+served from an attribute table: the Identity object (class 0x01, read-only),
+live feedback at class 0x64 instance 1 (attr 1 position, attr 2 alarm code)
+and SIM_PARAM_COUNT writable 32-bit parameters at class 0x65 instances 1..N.
+
+Packet loss, delay/jitter and reordering can be injected on the T→O side.
+Bind each instance to its own loopback address (127.0.0.2, 127.0.0.3, ...)
+to run many drives on one Linux box.
+
+Run standalone: python enip_sim.py --ip 127.0.0.2 --count 4
+"""
+import argparse, heapq, random, socket, struct, threading, time
+from typing import Dict, List, Optional, Tuple
+from cyclic_scheduler import DeadlineScheduler
+from discovery import LIST_IDENTITY, build_identity_item
+from input_reader import InputMap, MOVE, IN_POS, START_R, READY, ALM_A
+from o2t_payload import (OP_SELECT_OFF, FIXED_IN_OFF, DD32_OFF, IN_START as _IN_START, IN_STOP as _IN_STOP,
+                         IN_FREE as _IN_FREE, IN_ALM_RST as _IN_ALM_RST, IN_FW_JOG as _IN_FW_JOG)
+
+# T→O app layout produced by the simulator
+SIM_FIXED_OUT_OFF = 4
+SIM_POSITION_OFF = 12
+SIM_SPEED_OFF = 16
+SIM_ALARM_OFF = 28
+# pass to DriverAPI(input_map=...) / InputHistory to decode those fields from the simulator
+SIM_INPUT_MAP = InputMap(fixed_out=SIM_FIXED_OUT_OFF, alarm_code=SIM_ALARM_OFF,
+                         position=SIM_POSITION_OFF, speed=SIM_SPEED_OFF)
+
+# explicit-messaging objects served by the simulator
+SIM_FEEDBACK_CLASS = 0x64       # instance 1: attr 1 position (DINT), attr 2 alarm code (UINT)
+SIM_PARAM_CLASS = 0x65          # instances 1..SIM_PARAM_COUNT, attr 1: writable DINT
+SIM_PARAM_COUNT = 64
+
+_ENCAP = struct.Struct("<HHII8sI")
+
+class MotionProfile:
+    """Per-operation move duration (s) and travel (steps); `default_*` for unlisted ops."""
+    def __init__(self, durations: Optional[Dict[int, float]] = None, default_s: float = 0.2,
+                 travel: Optional[Dict[int, int]] = None, default_travel: int = 1000,
+                 jog_speed: int = 1000):
+        self.durations = dict(durations or {})
+        self.default_s = float(default_s)
+        self.travel = dict(travel or {})
+        self.default_travel = int(default_travel)
+        self.jog_speed = int(jog_speed)
+
+    def duration(self, op: int) -> float:
+        return self.durations.get(op, self.default_s)
+
+    def distance(self, op: int) -> int:
+        return self.travel.get(op, self.default_travel)
+
+class SimAdapter:
+    def __init__(self, ip: str = "127.0.0.2", tcp_port: int = 44818, udp_port: int = 2222,
+                 host_udp_port: int = 2222, profile: Optional[MotionProfile] = None,
+                 t2o_size: int = 56, loss: float = 0.0, delay_s: float = 0.0, jitter_s: float = 0.0,
+                 reorder: float = 0.0, seed: Optional[int] = None):
+        self.ip = ip
+        self.tcp_port = tcp_port
+        self.udp_port = udp_port
+        self.host_udp_port = host_udp_port
+        self.profile = profile or MotionProfile()
+        self.t2o_size = max(SIM_ALARM_OFF + 2, int(t2o_size))
+
+        # impairments on the T→O side
+        self.loss = float(loss)
+        self.delay_s = float(delay_s)
+        self.jitter_s = float(jitter_s)
+        self.reorder = float(reorder)
+        self._rng = random.Random(seed)
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._tcp: Optional[socket.socket] = None
+        self._udp: Optional[socket.socket] = None
+        self._encap_udp: Optional[socket.socket] = None     # ListIdentity on UDP/tcp_port
+
+        # connection state
+        self._next_session = 0x1000
+        self._next_conn = 0x20000001
+        self.o2t_conn_id = 0
+        self.t2o_conn_id = 0
+        self.conn_serial = 0
+        self.t2o_rpi_s = 0.010
+        self.o2t_rpi_s = 0.010
+        self.timeout_mult = 4
+        self._host: Optional[Tuple[str, int]] = None
+        self._last_o2t = 0.0
+        self._t2o_seq = 0
+        self._sched: Optional[DeadlineScheduler] = None
+        self._pending: List[Tuple[float, int, bytes]] = []   # delayed (due, n, pkt)
+        self._held: Optional[bytes] = None                   # packet held back for reordering
+        self._pkt_n = 0
+
+        # drive state
+        self.word = READY | IN_POS
+        self.position = 0
+        self.speed = 0
+        self.alarm_code = 0
+        self._in_word = 0
+        self._op_sel = 0
+        self._move_end = 0.0
+        self._move_from = 0
+        self._move_to = 0
+        self._jogging = False
+
+        # counters
+        self.o2t_packets = 0
+        self.t2o_sent = 0
+        self.t2o_dropped = 0
+        self.forward_opens = 0
+        self.forward_closes = 0
+        self.dd_block = b""             # last direct-data block seen (O→T bytes 12..29)
+        self.dd_updates = 0             # number of times it changed
+        self.explicit_requests = 0      # SendRRData messages other than Forward Open/Close
+        self.list_identity_requests = 0
+
+        # attribute table for explicit messaging: (class, instance, attribute) -> bytes
+        self.attributes: Dict[Tuple[int, int, int], bytes] = {
+            (0x01, 1, 1): struct.pack("<H", 0x00BB),        # vendor
+            (0x01, 1, 2): struct.pack("<H", 0x002B),        # device type
+            (0x01, 1, 3): struct.pack("<H", 0x13E6),        # product code
+            (0x01, 1, 4): bytes([1, 1]),                    # revision
+            (0x01, 1, 5): struct.pack("<H", 0),             # status
+            (0x01, 1, 6): struct.pack("<I", 0x51A0000 | sum(ip.encode())),  # serial
+            (0x01, 1, 7): bytes([13]) + b"SimAdapter/OM",   # product name (SHORT_STRING)
+        }
+        for i in range(1, SIM_PARAM_COUNT + 1):
+            self.attributes[(SIM_PARAM_CLASS, i, 1)] = bytes(4)
+
+    # === lifecycle ===
+    def start(self) -> "SimAdapter":
+        self._stop.clear()
+        t = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        t.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        t.bind((self.ip, self.tcp_port))
+        t.listen(8)
+        t.settimeout(0.2)
+        u = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        u.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        u.bind((self.ip, self.udp_port))
+        u.settimeout(0.2)
+        e = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        e.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        e.bind((self.ip, self.tcp_port))
+        e.settimeout(0.2)
+        self._tcp, self._udp, self._encap_udp = t, u, e
+        for name, fn in (("accept", self._accept_loop), ("o2t", self._rx_loop), ("t2o", self._tx_loop),
+                         ("listid", self._list_identity_loop)):
+            th = threading.Thread(target=fn, name=f"sim-{name}-{self.ip}", daemon=True)
+            th.start()
+            self._threads.append(th)
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        for th in self._threads:
+            th.join(timeout=1.0)
+        self._threads.clear()
+        for s in (self._tcp, self._udp, self._encap_udp):
+            try:
+                if s: s.close()
+            except Exception:
+                pass
+        self._tcp = self._udp = self._encap_udp = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # === fault injection ===
+    def inject_alarm(self, code: int = 0x30) -> None:
+        with self._lock:
+            self.alarm_code = code & 0xFFFF
+            self.word = (self.word | ALM_A) & ~(READY | MOVE)
+            self._move_end = 0.0
+            self._jogging = False
+
+    def drop_connection(self) -> None:
+        """Silently forget the I/O connection (as if the drive timed it out)."""
+        with self._lock:
+            self.o2t_conn_id = 0
+            self._host = None
+
+    # === TCP: encapsulation + connection manager ===
+    def _accept_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                c, addr = self._tcp.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(c, addr[0]), name=f"sim-tcp-{self.ip}",
+                             daemon=True).start()
+
+    @staticmethod
+    def _recv_exact(c: socket.socket, n: int) -> bytes:
+        buf = b""
+        while len(buf) < n:
+            chunk = c.recv(n - len(buf))
+            if not chunk:
+                raise ConnectionError("peer closed")
+            buf += chunk
+        return buf
+
+    def _serve(self, c: socket.socket, peer_ip: str) -> None:
+        c.settimeout(0.5)
+        c.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            while not self._stop.is_set():
+                try:
+                    hdr = self._recv_exact(c, 24)
+                except socket.timeout:
+                    continue
+                cmd, ln, session, _status, ctx, _opt = _ENCAP.unpack(hdr)
+                body = self._recv_exact(c, ln) if ln else b""
+                if cmd == 0x0065:       # RegisterSession
+                    with self._lock:
+                        session = self._next_session; self._next_session += 1
+                    c.sendall(_ENCAP.pack(0x65, 4, session, 0, ctx, 0) + body[:4].ljust(4, b"\x00"))
+                elif cmd == 0x0066:     # UnRegisterSession
+                    return
+                elif cmd == 0x006F:     # SendRRData
+                    reply = self._handle_rr(body, peer_ip)
+                    c.sendall(_ENCAP.pack(0x6F, len(reply), session, 0, ctx, 0) + reply)
+                elif cmd == LIST_IDENTITY:
+                    c.sendall(self._list_identity_reply(ctx))
+                else:
+                    c.sendall(_ENCAP.pack(cmd, 0, session, 0x0001, ctx, 0))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            c.close()
+
+    # === ListIdentity (UDP broadcast/unicast and TCP) ===
+    def _list_identity_reply(self, ctx: bytes) -> bytes:
+        a = self.attributes
+        item = build_identity_item(
+            struct.unpack("<H", a[(0x01, 1, 1)])[0], struct.unpack("<H", a[(0x01, 1, 2)])[0],
+            struct.unpack("<H", a[(0x01, 1, 3)])[0], a[(0x01, 1, 4)], struct.unpack("<H", a[(0x01, 1, 5)])[0],
+            struct.unpack("<I", a[(0x01, 1, 6)])[0], a[(0x01, 1, 7)][1:], self.ip, self.tcp_port)
+        self.list_identity_requests += 1
+        body = struct.pack("<H", 1) + item
+        return _ENCAP.pack(LIST_IDENTITY, len(body), 0, 0, ctx, 0) + body
+
+    def _list_identity_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                data, addr = self._encap_udp.recvfrom(2048)
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            if len(data) < _ENCAP.size:
+                continue
+            cmd, _ln, _session, _status, ctx, _opt = _ENCAP.unpack_from(data, 0)
+            if cmd == LIST_IDENTITY:
+                try:
+                    self._encap_udp.sendto(self._list_identity_reply(ctx), addr)
+                except OSError:
+                    pass
+
+    def _handle_rr(self, body: bytes, peer_ip: str) -> bytes:
+        cip = b""
+        if len(body) >= 8:
+            count = struct.unpack_from("<H", body, 6)[0]
+            off = 8
+            for _ in range(count):
+                typ, l = struct.unpack_from("<HH", body, off); off += 4
+                if typ == 0x00B2:
+                    cip = body[off:off + l]
+                off += l
+        reply = self._handle_cip(cip, peer_ip)
+        return struct.pack("<IHH HH HH", 0, 0, 2, 0, 0, 0x00B2, len(reply)) + reply
+
+    def _handle_cip(self, cip: bytes, peer_ip: str) -> bytes:
+        if len(cip) < 2:
+            return bytes([0x80, 0, 0x08, 0])
+        svc = cip[0]
+        p = 2 + 2 * cip[1]
+        if svc == 0x54 and len(cip) >= p + 35:      # ForwardOpen
+            (_tick, _to, _o2t_id, t2o_id, serial, vendor, orig_serial, mult,
+             o2t_rpi, _o2t_par, t2o_rpi, _t2o_par, _trig) = struct.unpack_from(
+                "<BBIIHHIB3xIHIHB", cip, p)
+            with self._lock:
+                self.o2t_conn_id = self._next_conn; self._next_conn += 1
+                self.t2o_conn_id = t2o_id
+                self.conn_serial = serial
+                self.timeout_mult = 4 << min(mult, 7)
+                self.o2t_rpi_s = max(0.0005, o2t_rpi / 1e6)
+                self.t2o_rpi_s = max(0.0005, t2o_rpi / 1e6)
+                self._host = (peer_ip, self.host_udp_port)
+                self._last_o2t = time.monotonic()
+                self._t2o_seq = 0
+                self._sched = None      # tx loop re-anchors at the new RPI
+                self.forward_opens += 1
+            return bytes([0xD4, 0, 0, 0]) + struct.pack(
+                "<IIHHIIIBB", self.o2t_conn_id, t2o_id, serial, vendor, orig_serial,
+                o2t_rpi, t2o_rpi, 0, 0)
+        if svc == 0x4E and len(cip) >= p + 10:      # ForwardClose
+            _tick, _to, serial, vendor, orig_serial = struct.unpack_from("<BBHHI", cip, p)
+            with self._lock:
+                if serial == self.conn_serial:
+                    self.o2t_conn_id = 0
+                    self._host = None
+                self.forward_closes += 1
+            return bytes([0xCE, 0, 0, 0]) + struct.pack("<HHIBB", serial, vendor, orig_serial, 0, 0)
+        with self._lock:
+            self.explicit_requests += 1
+        return self._handle_service(cip)
+
+    # === explicit messaging ===
+    @staticmethod
+    def _parse_path(path: bytes) -> Optional[Tuple[int, int, Optional[int]]]:
+        ids: Dict[int, int] = {}
+        i = 0
+        while i + 1 < len(path):
+            seg = path[i]
+            kind = seg & 0xFC
+            if kind not in (0x20, 0x24, 0x30):
+                return None
+            if seg & 0x03 == 0:
+                ids[kind] = path[i + 1]; i += 2
+            elif seg & 0x03 == 1 and i + 3 < len(path):
+                ids[kind] = struct.unpack_from("<H", path, i + 2)[0]; i += 4
+            else:
+                return None
+        if 0x20 not in ids or 0x24 not in ids:
+            return None
+        return ids[0x20], ids[0x24], ids.get(0x30)
+
+    def _read_attr(self, key: Tuple[int, int, int]) -> Optional[bytes]:
+        with self._lock:
+            if key == (SIM_FEEDBACK_CLASS, 1, 1):
+                return struct.pack("<i", self.position)
+            if key == (SIM_FEEDBACK_CLASS, 1, 2):
+                return struct.pack("<H", self.alarm_code)
+            return self.attributes.get(key)
+
+    def _handle_service(self, cip: bytes) -> bytes:
+        if len(cip) < 2:
+            return bytes([0x80, 0, 0x13, 0])
+        svc = cip[0]
+        p = 2 + 2 * cip[1]
+        if svc == 0x0A:                                 # Multiple Service Packet
+            body = cip[p:]
+            if len(body) < 2:
+                return bytes([0x8A, 0, 0x13, 0])
+            n = struct.unpack_from("<H", body, 0)[0]
+            if len(body) < 2 + 2 * n:
+                return bytes([0x8A, 0, 0x13, 0])
+            offs = list(struct.unpack_from(f"<{n}H", body, 2)) + [len(body)]
+            reps = [self._handle_service(body[offs[i]:offs[i + 1]]) if offs[i] < offs[i + 1]
+                    else bytes([0x80, 0, 0x13, 0]) for i in range(n)]
+            out, off = [], 2 + 2 * n
+            for r in reps:
+                out.append(off); off += len(r)
+            status = 0x1E if any(r[2] for r in reps) else 0
+            return bytes([0x8A, 0, status, 0]) + struct.pack(f"<H{n}H", n, *out) + b"".join(reps)
+        path = self._parse_path(cip[2:p])
+        if path is None or path[2] is None:
+            return bytes([svc | 0x80, 0, 0x04, 0])      # path segment error
+        key = path
+        if svc == 0x0E:                                 # Get_Attribute_Single
+            val = self._read_attr(key)
+            if val is None:
+                return bytes([0x8E, 0, 0x14, 0])
+            return bytes([0x8E, 0, 0, 0]) + val
+        if svc == 0x10:                                 # Set_Attribute_Single
+            data = cip[p:]
+            with self._lock:
+                if key not in self.attributes:
+                    return bytes([0x90, 0, 0x14, 0])
+                if key[0] != SIM_PARAM_CLASS:
+                    return bytes([0x90, 0, 0x0E, 0])    # attribute not settable
+                if len(data) != len(self.attributes[key]):
+                    return bytes([0x90, 0, 0x13 if len(data) < len(self.attributes[key]) else 0x15, 0])
+                self.attributes[key] = bytes(data)
+            return bytes([0x90, 0, 0, 0])
+        return bytes([svc | 0x80, 0, 0x08, 0])          # service not supported
+
+    # === UDP: O→T consumption ===
+    def _rx_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                pkt, _addr = self._udp.recvfrom(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                if self._stop.is_set():
+                    return
+                continue
+            if len(pkt) < 20 or struct.unpack_from("<H", pkt, 2)[0] != 0x8002:
+                continue
+            conn_id = struct.unpack_from("<I", pkt, 6)[0]
+            with self._lock:
+                if not self.o2t_conn_id or conn_id != self.o2t_conn_id:
+                    continue
+                self.o2t_packets += 1
+                self._last_o2t = time.monotonic()
+                self._consume(pkt[20:], self._last_o2t)
+
+    def feed_o2t(self, app: bytes, now: Optional[float] = None) -> None:
+        """Apply an O→T app image as if it had arrived on the connection (e.g. a replay)."""
+        with self._lock:
+            self._consume(app, time.monotonic() if now is None else now)
+
+    def _consume(self, app: bytes, now: float) -> None:
+        if len(app) >= FIXED_IN_OFF + 2:
+            self._op_sel = app[OP_SELECT_OFF]
+            dd = bytes(app[DD32_OFF:DD32_OFF + 18])
+            if dd != self.dd_block:
+                self.dd_block = dd
+                self.dd_updates += 1
+            self._apply_inputs(app[FIXED_IN_OFF] | (app[FIXED_IN_OFF + 1] << 8), now)
+
+    def _apply_inputs(self, word: int, now: float) -> None:
+        rising = word & ~self._in_word
+        self._in_word = word
+        self.word = (self.word | START_R) if word & _IN_START else (self.word & ~START_R)
+        if rising & _IN_ALM_RST and self.word & ALM_A:
+            self.word = (self.word & ~ALM_A) | READY
+            self.alarm_code = 0
+        if self.word & ALM_A:
+            return
+        if word & (_IN_STOP | _IN_FREE):
+            self._finish_motion()
+            return
+        if word & _IN_FW_JOG:
+            if not self._jogging:
+                self._jogging = True
+                self.word = (self.word | MOVE) & ~(IN_POS | READY)
+                self.speed = self.profile.jog_speed
+            return
+        if self._jogging:
+            self._finish_motion()
+        if rising & _IN_START and self.word & READY:
+            dur = self.profile.duration(self._op_sel)
+            self._move_from = self.position
+            self._move_to = self.position + self.profile.distance(self._op_sel)
+            self._move_end = now + dur
+            self._move_dur = max(1e-6, dur)
+            self.word = (self.word | MOVE) & ~(IN_POS | READY)
+
+    def _finish_motion(self) -> None:
+        self._jogging = False
+        self._move_end = 0.0
+        self.speed = 0
+        self.word = (self.word | IN_POS | READY) & ~MOVE
+
+    def _advance_motion(self, now: float, dt: float) -> None:
+        if self._jogging:
+            self.position += int(self.profile.jog_speed * dt)
+        elif self._move_end:
+            if now >= self._move_end:
+                self.position = self._move_to
+                self._finish_motion()
+            else:
+                frac = 1.0 - (self._move_end - now) / self._move_dur
+                self.position = self._move_from + int((self._move_to - self._move_from) * frac)
+                self.speed = int((self._move_to - self._move_from) / self._move_dur)
+
+    # === UDP: T→O production ===
+    def _build_t2o(self) -> bytes:
+        app = bytearray(self.t2o_size)
+        struct.pack_into("<H", app, SIM_FIXED_OUT_OFF, self.word & 0xFFFF)
+        struct.pack_into("<i", app, SIM_POSITION_OFF, self.position)
+        struct.pack_into("<i", app, SIM_SPEED_OFF, self.speed)
+        struct.pack_into("<H", app, SIM_ALARM_OFF, self.alarm_code)
+        self._t2o_seq = (self._t2o_seq + 1) & 0xFFFFFFFF
+        return (struct.pack("<H HH II HH H", 2, 0x8002, 8, self.t2o_conn_id, self._t2o_seq,
+                            0x00B1, 2 + len(app), self._t2o_seq & 0xFFFF) + bytes(app))
+
+    def _emit(self, pkt: bytes, host: Tuple[str, int], now: float) -> None:
+        if self.loss and self._rng.random() < self.loss:
+            self.t2o_dropped += 1
+            return
+        if self.reorder and self._held is None and self._rng.random() < self.reorder:
+            self._held = pkt            # goes out right after the next packet
+            return
+        delay = self.delay_s + (self._rng.random() * self.jitter_s if self.jitter_s else 0.0)
+        out = [pkt]
+        if self._held is not None:
+            out.append(self._held); self._held = None
+        for p in out:
+            if delay > 0:
+                self._pkt_n += 1
+                heapq.heappush(self._pending, (now + delay, self._pkt_n, p))
+            else:
+                self._send(p, host)
+
+    def _send(self, pkt: bytes, host: Tuple[str, int]) -> None:
+        try:
+            self._udp.sendto(pkt, host)
+            self.t2o_sent += 1
+        except OSError:
+            pass
+
+    def _tx_loop(self) -> None:
+        last = time.monotonic()
+        while not self._stop.is_set():
+            with self._lock:
+                if self._sched is None:
+                    self._sched = DeadlineScheduler(self.t2o_rpi_s)
+                    self._sched.start()
+                sched = self._sched
+            if not sched.wait_next(self._stop):
+                return
+            now = time.monotonic()
+            with self._lock:
+                self._advance_motion(now, now - last)
+                last = now
+                host = self._host
+                if host and self.o2t_conn_id and now - self._last_o2t > self.timeout_mult * self.o2t_rpi_s:
+                    self.o2t_conn_id = 0        # connection timed out, like a real adapter
+                    host = None
+                pkt = self._build_t2o() if host else None
+            if pkt is not None:
+                self._emit(pkt, host, now)
+            while self._pending and self._pending[0][0] <= now:
+                _, _, p = heapq.heappop(self._pending)
+                if host:
+                    self._send(p, host)
+
+def start_many(count: int, base: str = "127.0.0.", first: int = 2, **kwargs) -> List[SimAdapter]:
+    """Start `count` simulators on consecutive loopback addresses (base+first, ...)."""
+    return [SimAdapter(ip=f"{base}{first + i}", **kwargs).start() for i in range(count)]
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="EtherNet/IP drive simulator")
+    ap.add_argument("--ip", default="127.0.0.2", help="first loopback address")
+    ap.add_argument("--count", type=int, default=1)
+    ap.add_argument("--move-s", type=float, default=0.2, help="operation duration")
+    ap.add_argument("--loss", type=float, default=0.0)
+    ap.add_argument("--delay-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--reorder", type=float, default=0.0)
+    a = ap.parse_args()
+    base, first = a.ip.rsplit(".", 1)
+    sims = start_many(a.count, base=base + ".", first=int(first),
+                      profile=MotionProfile(default_s=a.move_s), loss=a.loss,
+                      delay_s=a.delay_ms / 1000.0, jitter_s=a.jitter_ms / 1000.0, reorder=a.reorder)
+    print("simulating:", ", ".join(s.ip for s in sims))
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for s in sims:
+            s.stop()
+
+__all__ = ["SimAdapter", "MotionProfile", "start_many",
+           "SIM_FEEDBACK_CLASS", "SIM_PARAM_CLASS", "SIM_PARAM_COUNT",
+           "SIM_FIXED_OUT_OFF", "SIM_POSITION_OFF", "SIM_SPEED_OFF", "SIM_ALARM_OFF",
+           "SIM_INPUT_MAP"]
+
+if __name__ == "__main__":
+    main()
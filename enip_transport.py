@@ -2,28 +2,101 @@
 """EtherNet/IP encapsulation + UDP/2222 sender (transport)."""
 from __future__ import annotations
 import socket, struct, threading, time
-from typing import Optional
+from typing import Callable, Optional, Tuple
 from hexutil import hx
-from types_hex import REGISTER_SESSION_HEX, FORWARD_OPEN_HEX
+from types_hex import REGISTER_SESSION_HEX
+from forward_open import (ForwardOpenParams, ForwardOpenReply, build_forward_open,
+                          parse_forward_open_reply, build_forward_close, parse_forward_close_reply,
+                          next_connection_ids)
+from cyclic_scheduler import DeadlineScheduler, LatencyStats, POLICY_SKIP
+from o2t_payload import O2TPayload
+from rt_tuning import RtConfig, apply_thread
+
+class InputTimeout(RuntimeError):
+    """No T→O packet within the connection timeout: the adapter has dropped us."""
+
+# Class-1 O→T CPF frame: [count][0x8002 len=8 conn_id seq 0][0x00B1 len seq_ctp app...]
+_IO_HDR = struct.Struct("<H HH I HH HH H")
+_U16 = struct.Struct("<H")
+_SAI_SEQ_OFF = 10
+_CTP_SEQ_OFF = 18
+_FC_CONTEXT = b"FwdClose"          # sender context of our ForwardClose, to find its reply
+
+def _recv_encap(s: socket.socket) -> bytes:
+    """One whole encapsulation frame (header + body) from the TCP stream."""
+    buf = b""
+    need = 24
+    while len(buf) < need:
+        chunk = s.recv(need - len(buf))
+        if not chunk:
+            raise ConnectionError("session closed by peer")
+        buf += chunk
+        if need == 24 and len(buf) == 24:
+            need += _U16.unpack_from(buf, 2)[0]
+    return buf
+
+class IoFrame:
+    """Preassembled O→T frame for one connection.
+
+    Header fields are written once; each cycle only the two sequence
+    counters are patched in place, and `app` is a writable memoryview slot
+    over the payload region, so the cyclic path builds no new bytes objects.
+    """
+    APP_OFF = _IO_HDR.size
+
+    def __init__(self, conn_id: int, app_size: int, app: bytes = b""):
+        self.app_size = max(0, int(app_size))
+        self.buf = bytearray(self.APP_OFF + self.app_size)
+        _IO_HDR.pack_into(self.buf, 0, 2, 0x8002, 8, conn_id & 0xFFFFFFFF, 0, 0,
+                          0x00B1, 2 + self.app_size, 0)
+        self.app = memoryview(self.buf)[self.APP_OFF:]
+        self.set_app(app)
+
+    def stamp(self, seq_ctp: int, seq_sai: int) -> None:
+        _U16.pack_into(self.buf, _SAI_SEQ_OFF, seq_sai & 0xFFFF)
+        _U16.pack_into(self.buf, _CTP_SEQ_OFF, seq_ctp & 0xFFFF)
+
+    def set_app(self, app: bytes) -> None:
+        """Copy `app` into the slot, zero-padded/truncated to the connection size."""
+        n = min(len(app), self.app_size)
+        self.app[:n] = memoryview(app)[:n]
+        if n < self.app_size:
+            self.app[n:] = bytes(self.app_size - n)
 
 class EnipSender:
-    def __init__(self, drive_ip: str, tcp_port: int = 44818, udp_port: int = 2222):
+    def __init__(self, drive_ip: str, tcp_port: int = 44818, udp_port: int = 2222,
+                 udp_socket: Optional[socket.socket] = None, io_loop=None,
+                 fo_params: Optional[ForwardOpenParams] = None):
+        """udp_socket/io_loop: run under a DriveGroup (shared UDP endpoint, shared I/O loop).
+        fo_params: what to request in ForwardOpen (RPI, sizes, timeout multiplier, ...).
+        """
         self.drive_ip = drive_ip
         self.tcp_port = tcp_port
         self.udp_port = udp_port
         self._tcp: Optional[socket.socket] = None
+        self._io_loop = io_loop
 
-        # Create ONE UDP socket for both send and recv, and BIND IT to 2222.
-        self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        try:
-            self._udp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        except Exception:
-            pass
-        self._udp.bind(("", self.udp_port))   # <<< THIS IS THE IMPORTANT LINE
-        self._udp.settimeout(1.0)
+        if udp_socket is not None:
+            # Shared endpoint owned by a DriveGroup: never bind/connect it here
+            self._udp = udp_socket
+            self._udp_shared = True
+        else:
+            # Create ONE UDP socket for both send and recv, and BIND IT to 2222.
+            self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._udp_shared = False
+            try:
+                self._udp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            except Exception:
+                pass
+            self._udp.bind(("", self.udp_port))   # <<< THIS IS THE IMPORTANT LINE
+            self._udp.settimeout(1.0)
 
         self.session = 0
         self.conn_id = 0
+        self.t2o_conn_id = 0
+        self.fo_params = fo_params or ForwardOpenParams()
+        self.connect_timeout_s = 5.0    # whole RegisterSession + ForwardOpen handshake
+        self.granted: Optional[ForwardOpenReply] = None   # what the adapter accepted
         self.seq_ctp = 1
         self.seq_sai = 1
 
@@ -33,42 +106,133 @@ class EnipSender:
         self._rpi_s = 0.010
         self._mirror = False
         self._o2t_size = 44
-        self._current_app = b"\x00" * 44
+        self.payload = O2TPayload()   # edited by callers, read lock-free each cycle
+        self._cycle_hook: Optional[Callable[[memoryview], None]] = None
+        self.frames_sent = 0            # bumped before each cycle copies the payload
+        self.immediate = False          # send payload changes right away (see start_cyclic)
+        self._cos_wake = threading.Event()
+        self._wire_gen = -1             # payload generation in the last frame sent
+        self.command_latency = LatencyStats()   # payload publish -> frame on the wire
+        self._capture = None            # CaptureWriter tapping every O→T frame sent
+        self.instr = None               # instrument.Instrumentation (frame_built/frame_sent/reconnect)
+        self.rt: Optional[RtConfig] = None          # affinity/policy for the cyclic thread
+        self.rt_applied: dict = {}                  # what apply_thread() achieved
         self._lock = threading.Lock()
+        self._tcp_lock = threading.RLock()      # one request/reply exchange on the TCP session at a time
+        self._tcp_wlock = threading.Lock()      # keeps concurrent TCP writes (mirror, explicit) whole
+        self._sched: Optional[DeadlineScheduler] = None
+        self._in_loop = False
+        self._frame: Optional[IoFrame] = None
+        self._peer = (self.drive_ip, self.udp_port)
+        self._conn_serial = 0
+
+        # T→O watchdog (see attach_input_monitor) + reconnect metrics
+        self._in_last_rx: Optional[Callable[[], float]] = None
+        self._in_on_stale: Optional[Callable[[], None]] = None
+        self._connected_at = 0.0
+        self.reconnect_backoff = (0.05, 2.0)    # first delay, cap (s)
+        self._recover_lock = threading.Lock()
+        self._link = {"drops": 0, "input_timeouts": 0, "last_detect_s": 0.0,
+                      "last_recovery_s": 0.0, "last_downtime_s": 0.0, "total_downtime_s": 0.0,
+                      "max_downtime_s": 0.0}
 
     #Function to register initial session 
     def connect(self):
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        deadline = time.monotonic() + self.connect_timeout_s
+        s.settimeout(self.connect_timeout_s)
+        try:
+            s.connect((self.drive_ip, self.tcp_port))
+            try:
+                # pipelined explicit requests must not sit behind Nagle / delayed ACK
+                s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except Exception:
+                pass
+            s.sendall(hx(REGISTER_SESSION_HEX))
+            s.settimeout(max(0.001, deadline - time.monotonic()))
+            reg = s.recv(8192)
+            self.session = int.from_bytes(reg[4:8], "little") if len(reg) >= 8 else 0
+            if self.session == 0:
+                raise RuntimeError("RegisterSession failed")
+            p = self.fo_params
+            serial, t2o_id = next_connection_ids()
+            if p.conn_serial is not None: serial = p.conn_serial
+            if p.t2o_conn_id is not None: t2o_id = p.t2o_conn_id
+            s.sendall(build_forward_open(self.session, p, serial, t2o_id))
+            s.settimeout(max(0.001, deadline - time.monotonic()))
+            rep = s.recv(8192)
+            g = parse_forward_open_reply(rep)
+            if g is None or g.o2t_conn_id == 0:
+                raise RuntimeError("ForwardOpen failed")
+        except BaseException:
+            s.close()       # also ends the session registered on the drive
+            self.session = 0
+            raise
         s.settimeout(5.0)
-        s.connect((self.drive_ip, self.tcp_port))
-        s.sendall(hx(REGISTER_SESSION_HEX))
-        reg = s.recv(8192)
-        self.session = int.from_bytes(reg[4:8], "little") if len(reg) >= 8 else 0
-        if self.session == 0:
-            s.close(); raise RuntimeError("RegisterSession failed")
-        fo = bytearray(hx(FORWARD_OPEN_HEX)); fo[4:8] = self.session.to_bytes(4, "little")
-        s.sendall(bytes(fo))
-        rep = s.recv(8192)
-        self.conn_id = self._parse_forward_open_o2t(rep) or 0
-        if self.conn_id == 0:
-            s.close(); raise RuntimeError("ForwardOpen failed")
+        self.granted = g
+        self._conn_serial = serial
+        self.conn_id, self.t2o_conn_id = g.o2t_conn_id, g.t2o_conn_id
+        self._connected_at = time.monotonic()
+        if g.o2t_api_us:
+            # send at the interval the adapter granted, not just what we asked for
+            self._rpi_s = g.o2t_api_us / 1e6
+            if self._sched is not None:
+                self._sched.period_s = self._rpi_s
+        self._rebuild_frame()
         # Pin UDP to adapter peer so inbound T→O lands on this socket/port
+        if not self._udp_shared:
+            try:
+                self._udp.connect((self.drive_ip, self.udp_port))
+            except Exception:
+                pass
+        self._tcp = s
+
+    #Release the connection on the drive so its slot is free for the next ForwardOpen
+    def forward_close(self, timeout_s: float = 0.5) -> bool:
+        s = self._tcp
+        if not (s and self.session and self._conn_serial):
+            return False
+        # bounded wait: the recovery path must not hang behind a stuck explicit exchange
+        if not self._tcp_lock.acquire(timeout=timeout_s):
+            self._conn_serial = 0
+            return False
         try:
-            self._udp.connect((self.drive_ip, self.udp_port))
+            s.settimeout(timeout_s)
+            with self._tcp_wlock:
+                s.sendall(build_forward_close(self.session, self.fo_params, self._conn_serial,
+                                              context=_FC_CONTEXT))
+            # skip late explicit replies and mirror acks still queued on the session
+            end = time.monotonic() + timeout_s
+            while True:
+                rep = _recv_encap(s)
+                if rep[12:20] == _FC_CONTEXT:
+                    return parse_forward_close_reply(rep)
+                if time.monotonic() >= end:
+                    return False
         except Exception:
-            pass
-        self._tcp = s
+            return False
+        finally:
+            self._conn_serial = 0
+            try:
+                s.settimeout(5.0)
+            except Exception:
+                pass
+            self._tcp_lock.release()
 
     #Used to close connection
     def close(self):
         self.stop_cyclic()
         try:
             if self._tcp:
+                self.forward_close()
                 self._tcp.close()
         finally:
             self._tcp = None
             self.session = 0
             self.conn_id = 0
+            self.t2o_conn_id = 0
+            self.granted = None
+            self._frame = None
 
     # One-shot send to send a packet once if required
     def send_app(self, app: bytes, mirror_over_tcp: bool = False):
@@ -76,61 +240,245 @@ class EnipSender:
             raise RuntimeError("Not connected")
         cpf = self._build_udp_io_cpf(self.conn_id, self.seq_ctp, self.seq_sai, app)
         self._udp.sendto(cpf, (self.drive_ip, self.udp_port))
+        cap = self._capture
+        if cap is not None:
+            cap.record(0, cpf)
+        ins = self.instr
+        if ins is not None:
+            ins.emit("frame_sent", time.monotonic(), len(cpf), self.seq_sai)
         if mirror_over_tcp:
-            self._send_unit_data_over_tcp(self._tcp, self.session, cpf)
+            with self._tcp_wlock:
+                self._send_unit_data_over_tcp(self._tcp, self.session, cpf)
         self.seq_ctp = (self.seq_ctp + 1) & 0xFFFF
         self.seq_sai = (self.seq_sai + 1) & 0xFFFF
 
     # === Cyclic background stream to keep Class-1 alive ===
-    def start_cyclic(self, rpi_ms: int = 10, mirror_over_tcp: bool = False, o2t_size: int = 44):
-        self._rpi_s = max(0.001, rpi_ms / 1000.0)
+    def start_cyclic(self, rpi_ms: int = 10, mirror_over_tcp: bool = False, o2t_size: int = 44,
+                     miss_policy: str = POLICY_SKIP, spin_us: int = 0, immediate: bool = False,
+                     min_gap_us: int = 1000, rephase: bool = True):
+        """Stream the current app every RPI on absolute deadlines.
+
+        miss_policy: "skip" jumps over missed slots, "catchup" sends them back-to-back.
+        spin_us: busy-wait the last N µs before each deadline (sub-ms accuracy, costs CPU).
+        immediate: change-of-state mode; a payload publish wakes the sending loop, which
+            sends the new image at once (no sooner than min_gap_us after the previous
+            frame, so a burst of edits coalesces). rephase=True restarts the RPI grid at
+            that frame, so no duplicate follows it a few ms later; False keeps the grid.
+        """
+        if self.granted and self.granted.o2t_api_us:
+            self._rpi_s = self.granted.o2t_api_us / 1e6     # negotiated in ForwardOpen
+        else:
+            self._rpi_s = max(0.001, rpi_ms / 1000.0)
         self._mirror = bool(mirror_over_tcp)
-        self._o2t_size = max(0, int(o2t_size))
+        o2t_size = max(0, int(o2t_size))
+        if o2t_size != self._o2t_size:
+            self._o2t_size = o2t_size
+            self.payload.resize(o2t_size)
+            self._rebuild_frame()
+        sched = DeadlineScheduler(self._rpi_s, policy=miss_policy, spin_s=max(0, spin_us) / 1e6,
+                                  min_gap_s=max(0, min_gap_us) / 1e6, rephase_on_event=rephase)
+        self.immediate = bool(immediate)
+        self.payload.on_publish = self._on_payload_change if self.immediate else None
+        if self._io_loop is not None:
+            # a DriveGroup's I/O loop owns the timing; just hand it our schedule
+            if not self._in_loop:
+                self._sched = sched
+                self._in_loop = True
+                self._io_loop.register(self)
+            return
         if self._cyc_thread and self._cyc_thread.is_alive():
             return
         self._cyc_stop.clear()
+        self._sched = sched
+
+        wake = self._cos_wake if self.immediate else None
 
         def _run():
-            while not self._cyc_stop.is_set():
+            self.rt_applied = apply_thread(self.rt)
+            sched.start()
+            while sched.wait_next(self._cyc_stop, wake):
                 try:
-                    with self._lock:
-                        app = (self._current_app + b"\x00"*self._o2t_size)[:self._o2t_size]
-                    self.send_app(app, mirror_over_tcp=self._mirror)
+                    self._send_cycle()
                 except Exception:
-                    # Attempt to recover TCP + ForwardOpen (device may have closed us)
-                    try:
-                        if self._tcp:
-                            self._tcp.close()
-                    except Exception:
-                        pass
-                    self._tcp = None
-                    backoff = 0.2
-                    while not self._cyc_stop.is_set():
-                        try:
-                            self.connect()
-                            break
-                        except Exception:
-                            time.sleep(backoff)
-                            backoff = min(2.0, backoff * 2)
-                time.sleep(self._rpi_s)
+                    self._recover(self._cyc_stop)
+                    # the reconnect stall is not scheduling jitter; restart the grid
+                    sched.rephase()
 
         self._cyc_thread = threading.Thread(target=_run, name="enip-cyclic", daemon=True)
         self._cyc_thread.start()
 
+    # Attempt to recover TCP + ForwardOpen (device may have closed us)
+    def _recover(self, stop: threading.Event):
+        if not self._recover_lock.acquire(blocking=False):
+            return      # another thread is already reconnecting
+        try:
+            t_detect = time.monotonic()
+            t_last = self._last_input_time()
+            self._link["drops"] += 1
+            if self._in_on_stale:
+                self._in_on_stale()
+            try:
+                if self._tcp:
+                    self.forward_close(timeout_s=0.2)
+                    self._tcp.close()
+            except Exception:
+                pass
+            self._tcp = None
+            self.session = 0
+            self.conn_id = 0            # the old connection is gone whether or not we get a new one
+            backoff, cap = self.reconnect_backoff
+            ok = False
+            while not stop.is_set():
+                try:
+                    self.connect()
+                    ok = True
+                    break
+                except Exception:
+                    stop.wait(backoff)
+                    backoff = min(cap, backoff * 2)
+            if ok:
+                t_up = time.monotonic()
+                down = t_up - t_last
+                lk = self._link
+                lk["last_detect_s"] = t_detect - t_last
+                lk["last_recovery_s"] = t_up - t_detect
+                lk["last_downtime_s"] = down
+                lk["total_downtime_s"] += down
+                lk["max_downtime_s"] = max(lk["max_downtime_s"], down)
+            ins = self.instr
+            if ins is not None:
+                t = time.monotonic()
+                ins.emit("reconnect", t, t - t_last, ok)
+        finally:
+            self._recover_lock.release()
+
+    # === T→O watchdog ===
+    def attach_input_monitor(self, last_rx: Callable[[], float], on_stale: Callable[[], None]) -> None:
+        """Watch T→O arrivals: `last_rx()` is the monotonic time of the newest packet.
+
+        If nothing arrives within input_timeout_s, the next cycle calls `on_stale()`,
+        sends ForwardClose and reconnects with bounded exponential backoff.
+        """
+        self._in_last_rx = last_rx
+        self._in_on_stale = on_stale
+
+    def _last_input_time(self) -> float:
+        t = self._in_last_rx() if self._in_last_rx else 0.0
+        return max(t, self._connected_at)
+
+    def link_stats(self) -> dict:
+        """Connection drops plus detection / recovery / downtime of the last outage (s)."""
+        return dict(self._link)
+
+    @property
+    def input_period_s(self) -> float:
+        """Expected T→O packet interval: granted API, else the requested RPI."""
+        if self.granted and self.granted.t2o_api_us:
+            return self.granted.t2o_api_us / 1e6
+        return self.fo_params.t2o_rpi_us / 1e6
+
+    @property
+    def input_timeout_s(self) -> float:
+        """Connection timeout the adapter applies: timeout multiplier x T→O API."""
+        return self.fo_params.timeout_factor * self.input_period_s
+
+    def cyclic_stats(self) -> dict:
+        """Per-cycle lateness vs. the RPI grid (min/mean/p99/max µs, missed slots)."""
+        return self._sched.stats() if self._sched else {}
+
     #Used to gracefully halt the cyclic sending in order to close a conenction
     def stop_cyclic(self, join_timeout: float = 2.0):
+        self.payload.on_publish = None
+        if self._in_loop:
+            self._io_loop.unregister(self)
+            self._in_loop = False
         if self._cyc_thread and self._cyc_thread.is_alive():
             self._cyc_stop.set()
+            self._cos_wake.set()
             self._cyc_thread.join(timeout=join_timeout)
         self._cyc_thread = None
         self._cyc_stop.clear()
+        self._cos_wake.clear()
+
+    # payload.on_publish in immediate mode (runs on the writer's thread)
+    def _on_payload_change(self) -> None:
+        self._cos_wake.set()
+        if self._in_loop:
+            self._io_loop.notify(self)
+
+    def command_latency_stats(self) -> dict:
+        """Payload publish -> first frame carrying it on the wire (µs), plus the
+        number of immediate (change-of-state) sends."""
+        out = self.command_latency.stats()
+        out["immediate"] = self.immediate
+        out["events"] = self._sched.events if self._sched else 0
+        return out
+
+    # One cyclic transmission from the preassembled frame (no per-cycle bytes building)
+    def _send_cycle(self):
+        if not (self._tcp and self.conn_id):
+            raise RuntimeError("Not connected")
+        if self._in_last_rx is not None and \
+                time.monotonic() - self._last_input_time() > self.input_timeout_s:
+            self._link["input_timeouts"] += 1
+            raise InputTimeout(f"no T→O input from {self.drive_ip} for {self.input_timeout_s:.3f}s")
+        pl = self.payload
+        with self._lock:
+            fr = self._frame
+            self.frames_sent += 1
+            gen = pl.generation
+            pl.copy_into(fr.app)
+            hook = self._cycle_hook
+            if hook is not None:
+                hook(fr.app)
+            ins = self.instr
+            if ins is not None:
+                ins.emit("frame_built", time.monotonic(), fr.app)
+            fr.stamp(self.seq_ctp, self.seq_sai)
+            self._udp.sendto(fr.buf, self._peer)
+            cap = self._capture
+            if cap is not None:
+                cap.record(0, fr.buf)       # capture.O2T
+            if ins is not None:
+                ins.emit("frame_sent", time.monotonic(), len(fr.buf), self.seq_sai)
+            if self._mirror:
+                with self._tcp_wlock:
+                    self._send_unit_data_over_tcp(self._tcp, self.session, fr.buf)
+        if gen != self._wire_gen:
+            self._wire_gen = gen
+            self.command_latency.record(time.monotonic() - pl.published_at)
+        self.seq_ctp = (self.seq_ctp + 1) & 0xFFFF
+        self.seq_sai = (self.seq_sai + 1) & 0xFFFF
+
+    def _rebuild_frame(self):
+        with self._lock:
+            if self.conn_id:
+                self._frame = IoFrame(self.conn_id, self._o2t_size, self.payload.snapshot())
 
     #Update what the message being sent to driver is with new payload
     def update_app(self, app: bytes):
-        """Update the current O→T payload the cyclic sender transmits."""
-        with self._lock:
-            self._current_app = app or b""
-            
+        """Replace the whole O→T payload the cyclic sender transmits.
+
+        For single-field changes edit `self.payload` (an O2TPayload) directly.
+        """
+        self.payload.load(app)
+
+    #Per-cycle callback that may overwrite parts of the outgoing app (e.g. a DirectDataStream)
+    def set_cycle_hook(self, hook: Optional[Callable[[memoryview], None]]) -> None:
+        """Call `hook(app)` every cycle after the payload is copied into the frame.
+
+        Runs on the sending thread/loop: it must be quick and must not raise.
+        """
+        self._cycle_hook = hook
+
+    #Record every O→T frame sent (see capture.CaptureWriter); None stops
+    def set_capture(self, writer) -> None:
+        self._capture = writer
+
+    #Hook points of this sender (see instrument.Instrumentation); None detaches
+    def set_instrumentation(self, instr) -> None:
+        self.instr = instr
+
     #Returns current UDP socket for input listener
     def udp_socket(self) -> socket.socket:
         """Expose shared UDP socket (for input listener)."""
@@ -151,26 +499,15 @@ class EnipSender:
         encap   = struct.pack("<HHI I 8s I", 0x0070, len(payload), session, 0, b"\x00"*8, 0) + payload
         sock.sendall(encap)
 
+    @classmethod
+    def _parse_forward_open_o2t(cls, encap_reply: bytes) -> Optional[int]:
+        ids = cls._parse_forward_open_ids(encap_reply)
+        return ids[0] if ids else None
+
     @staticmethod
-    def _parse_forward_open_o2t(encap_reply: bytes) -> Optional[int]:
-        if len(encap_reply) < 24: return None
-        _, ln, _, status = struct.unpack_from("<H H I I", encap_reply, 0)
-        if status != 0 or len(encap_reply) < 24 + ln: return None
-        rr = encap_reply[24:24+ln]
-        if len(rr) < 8: return None
-        item_count = struct.unpack_from("<H", rr, 6)[0]
-        off = 8; cip = None
-        for _ in range(item_count):
-            if off + 4 > len(rr): return None
-            typ, l = struct.unpack_from("<H H", rr, off); off += 4
-            if off + l > len(rr): return None
-            data = rr[off:off+l]; off += l
-            if typ in (0x00B2, 0x00B0): cip = data
-        if not cip or len(cip) < 2: return None
-        path_words = cip[1]; pos = 2 + 2*path_words
-        if pos + 2 > len(cip): return None
-        gen = cip[pos]; ext = cip[pos+1]; pos += 2 + 2*ext
-        if gen != 0x00 or pos + 4 > len(cip): return None
-        return struct.unpack_from("<I", cip, pos)[0]
-
-__all__ = ["EnipSender"]
+    def _parse_forward_open_ids(encap_reply: bytes) -> Optional[Tuple[int, int]]:
+        """Return (O→T, T→O) connection IDs from a ForwardOpen reply."""
+        g = parse_forward_open_reply(encap_reply)
+        return (g.o2t_conn_id, g.t2o_conn_id) if g else None
+
+__all__ = ["EnipSender", "IoFrame", "InputTimeout"]
@@ -0,0 +1,352 @@
+# explicit_msg.py
+"""Explicit (unconnected) CIP messaging on the transport's TCP session.
+
+Get_Attribute_Single / Set_Attribute_Single travel in SendRRData on the
+session EnipSender opened for ForwardOpen. Many reads or writes are packed
+into Multiple Service Packet (0x0A) requests. Those packets are pipelined:
+up to `window` are on the wire before the first reply is read, and replies
+are matched by sender context, so dozens of parameters cost about one round
+trip. Reads can be served from a TTL cache for slow-changing parameters.
+
+The cyclic O→T stream is UDP and never waits on this client; the TCP
+socket is shared only with ForwardOpen/ForwardClose (request lock) and
+the optional SendUnitData mirror (per-write lock). A request that times
+out leaves the session (and the I/O connection on it) up; its late reply
+is recognised by context and discarded.
+
+    cli = ExplicitClient(drv.tx, cache_ttl_s=5.0)
+    vendor, = cli.get(0x01, 1, 1, fmt="<H")
+    values = cli.get_many([(0x01, 1, a) for a in range(1, 8)])
+"""
+import socket, struct, time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+GET_ATTRIBUTE_SINGLE = 0x0E
+SET_ATTRIBUTE_SINGLE = 0x10
+MULTIPLE_SERVICE_PACKET = 0x0A
+MESSAGE_ROUTER_PATH = bytes([0x20, 0x02, 0x24, 0x01])
+
+# general status codes seen in replies
+STATUS_EMBEDDED_ERROR = 0x1E        # Multiple Service Packet: some embedded service failed
+STATUS_NAMES = {
+    0x00: "success", 0x04: "path segment error", 0x05: "path destination unknown",
+    0x08: "service not supported", 0x09: "invalid attribute value", 0x0E: "attribute not settable",
+    0x11: "reply data too large", 0x13: "not enough data", 0x14: "attribute not supported",
+    0x15: "too much data", 0x1E: "embedded service error",
+}
+
+_ENCAP = struct.Struct("<HHII8sI")
+_RR_HDR = struct.Struct("<IHH HH HH")     # interface handle, timeout, item count, null item, UCMM item hdr
+
+Attr = Tuple[int, int, int]                 # (class, instance, attribute)
+
+class CipError(RuntimeError):
+    """A CIP service returned a non-zero general status."""
+    def __init__(self, status: int, ext_status: Tuple[int, ...] = (), what: str = ""):
+        self.status = status
+        self.ext_status = tuple(ext_status)
+        name = STATUS_NAMES.get(status, "error")
+        ext = f" ext={[hex(e) for e in self.ext_status]}" if self.ext_status else ""
+        super().__init__(f"{what + ': ' if what else ''}CIP status 0x{status:02X} ({name}){ext}")
+
+# === encoding ===
+def _segment(kind: int, value: int) -> bytes:
+    # logical segment: 8-bit form when it fits, else 16-bit with a pad byte
+    if value <= 0xFF:
+        return bytes([kind, value])
+    return bytes([kind | 0x01, 0]) + struct.pack("<H", value)
+
+def attr_path(cls: int, inst: int, attr: Optional[int] = None) -> bytes:
+    """EPATH to class/instance[/attribute] (0x20/0x24/0x30 logical segments)."""
+    p = _segment(0x20, cls) + _segment(0x24, inst)
+    if attr is not None:
+        p += _segment(0x30, attr)
+    return p
+
+def cip_request(service: int, path: bytes, data: bytes = b"") -> bytes:
+    return bytes([service, len(path) // 2]) + path + data
+
+def multiple_service(requests: Sequence[bytes]) -> bytes:
+    """Wrap embedded requests in a Multiple Service Packet to the Message Router."""
+    n = len(requests)
+    offsets, off = [], 2 + 2 * n
+    for r in requests:
+        offsets.append(off)
+        off += len(r)
+    body = struct.pack(f"<H{n}H", n, *offsets) + b"".join(requests)
+    return cip_request(MULTIPLE_SERVICE_PACKET, MESSAGE_ROUTER_PATH, body)
+
+def build_send_rr_data(session: int, cip: bytes, context: bytes, timeout: int = 0) -> bytes:
+    rr = _RR_HDR.pack(0, timeout, 2, 0, 0, 0x00B2, len(cip)) + cip
+    return _ENCAP.pack(0x006F, len(rr), session, 0, context, 0) + rr
+
+# === decoding ===
+@dataclass
+class CipReply:
+    service: int
+    status: int
+    ext_status: Tuple[int, ...]
+    data: bytes
+
+    def check(self, what: str = "") -> bytes:
+        if self.status:
+            raise CipError(self.status, self.ext_status, what)
+        return self.data
+
+def parse_reply(cip: bytes) -> CipReply:
+    if len(cip) < 4:
+        raise CipError(0x13, (), "short CIP reply")
+    ext_n = cip[3]
+    ext = struct.unpack_from(f"<{ext_n}H", cip, 4) if ext_n else ()
+    return CipReply(cip[0] & 0x7F, cip[2], ext, bytes(cip[4 + 2 * ext_n:]))
+
+def parse_multiple_service(data: bytes) -> List[CipReply]:
+    """Split a Multiple Service Packet reply body into its embedded replies."""
+    if len(data) < 2:
+        return []
+    n = struct.unpack_from("<H", data, 0)[0]
+    offs = list(struct.unpack_from(f"<{n}H", data, 2)) + [len(data)]
+    return [parse_reply(data[offs[i]:offs[i + 1]]) for i in range(n)]
+
+# === client ===
+class ExplicitClient:
+    def __init__(self, transport, timeout_s: float = 2.0, cache_ttl_s: float = 0.0,
+                 max_batch: int = 32, max_request_bytes: int = 480, window: int = 4):
+        """`transport`: a connected EnipSender (its TCP socket and session are reused).
+
+        cache_ttl_s: default lifetime of cached reads (0 disables the cache).
+        max_batch / max_request_bytes: limits per Multiple Service Packet (adapters
+        typically accept ~500-byte unconnected messages).
+        window: Multiple Service Packets in flight before the first reply is read.
+        """
+        self.tx = transport
+        self.timeout_s = float(timeout_s)
+        self.cache_ttl_s = max(0.0, float(cache_ttl_s))
+        self.max_batch = max(1, int(max_batch))
+        self.max_request_bytes = max(64, int(max_request_bytes))
+        self.window = max(1, int(window))
+        self._cache: Dict[Attr, Tuple[float, bytes]] = {}
+        self._ctx = 0
+        self._late: set = set()             # contexts of timed-out requests whose replies may still come
+        self._late_sock = None
+        self._stats = {"requests": 0, "packets": 0, "services": 0, "cache_hits": 0, "errors": 0,
+                       "timeouts": 0, "late_replies": 0}
+
+    # --- single attribute ---
+    def get(self, cls: int, inst: int, attr: int, ttl: Optional[float] = None,
+            fmt: Optional[str] = None) -> Union[bytes, tuple]:
+        """Get_Attribute_Single; raw bytes, or struct-unpacked with `fmt`."""
+        res = self.get_many([(cls, inst, attr)], ttl)[0]
+        if isinstance(res, CipError):
+            raise res
+        return struct.unpack_from(fmt, res) if fmt else res
+
+    def set(self, cls: int, inst: int, attr: int, data: Union[bytes, int], fmt: Optional[str] = None) -> None:
+        """Set_Attribute_Single (`data` packed with `fmt` when given)."""
+        err = self.set_many([(cls, inst, attr, data if fmt is None else struct.pack(fmt, data))])[0]
+        if err is not None:
+            raise err
+
+    # --- batches ---
+    def get_many(self, attrs: Iterable[Attr], ttl: Optional[float] = None) -> List[Union[bytes, CipError]]:
+        """Read many attributes; per-item bytes or CipError, in order.
+
+        Fresh cache entries are returned without touching the wire; the rest go
+        out as pipelined Multiple Service Packets.
+        """
+        attrs = [tuple(a) for a in attrs]
+        ttl = self.cache_ttl_s if ttl is None else ttl
+        now = time.monotonic()
+        out: List[Union[bytes, CipError, None]] = [None] * len(attrs)
+        todo: List[int] = []
+        for i, a in enumerate(attrs):
+            hit = self._cache.get(a) if ttl > 0 else None
+            if hit is not None and hit[0] > now:
+                out[i] = hit[1]
+                self._stats["cache_hits"] += 1
+            else:
+                todo.append(i)
+        if todo:
+            reqs = [cip_request(GET_ATTRIBUTE_SINGLE, attr_path(*attrs[i])) for i in todo]
+            replies = self._execute(reqs)
+            expires = time.monotonic() + ttl
+            for i, rep in zip(todo, replies):
+                if rep.status:
+                    out[i] = CipError(rep.status, rep.ext_status, f"get {attrs[i]}")
+                    self._stats["errors"] += 1
+                else:
+                    out[i] = rep.data
+                    if ttl > 0:
+                        self._cache[attrs[i]] = (expires, rep.data)
+        return out
+
+    def set_many(self, items: Iterable[Tuple[int, int, int, bytes]]) -> List[Optional[CipError]]:
+        """Write many attributes; per-item None or CipError, in order (cache entries dropped)."""
+        items = [tuple(it) for it in items]
+        for it in items:
+            self._cache.pop(it[:3], None)
+        reqs = [cip_request(SET_ATTRIBUTE_SINGLE, attr_path(c, i, a), bytes(d)) for c, i, a, d in items]
+        out: List[Optional[CipError]] = []
+        for it, rep in zip(items, self._execute(reqs)):
+            if rep.status:
+                self._stats["errors"] += 1
+                out.append(CipError(rep.status, rep.ext_status, f"set {it[:3]}"))
+            else:
+                out.append(None)
+        return out
+
+    def invalidate(self, attr: Optional[Attr] = None) -> None:
+        """Drop one cached attribute, or the whole cache."""
+        if attr is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(tuple(attr), None)
+
+    def stats(self) -> dict:
+        """Requests (calls that hit the wire), SendRRData packets, embedded services, cache hits,
+        item errors, timed-out exchanges and late replies discarded after them."""
+        return dict(self._stats)
+
+    # --- wire ---
+    def _batches(self, reqs: List[bytes]) -> List[List[bytes]]:
+        out, cur, size = [], [], 0
+        for r in reqs:
+            cost = len(r) + 2       # request plus its offset entry
+            if cur and (len(cur) >= self.max_batch or size + cost > self.max_request_bytes):
+                out.append(cur); cur, size = [], 0
+            cur.append(r); size += cost
+        if cur:
+            out.append(cur)
+        return out
+
+    def _execute(self, reqs: List[bytes]) -> List[CipReply]:
+        """Send the requests (batched + pipelined) and return one reply per request."""
+        packets = [b[0] if len(b) == 1 else multiple_service(b) for b in self._batches(reqs)]
+        replies = self._exchange(packets)
+        out: List[CipReply] = []
+        for pkt, rep in zip(packets, replies):
+            if pkt[0] != MULTIPLE_SERVICE_PACKET:
+                out.append(rep)
+                continue
+            n = struct.unpack_from("<H", pkt, 2 + 2 * pkt[1])[0]
+            if rep.status not in (0, STATUS_EMBEDDED_ERROR) or not rep.data:
+                out.extend([rep] * n)           # the whole packet failed: same error for each item
+                continue
+            inner = parse_multiple_service(rep.data)
+            if len(inner) != n:
+                raise CipError(0x13, (), f"Multiple Service reply has {len(inner)} of {n} replies")
+            out.extend(inner)
+        self._stats["services"] += len(reqs)
+        self._stats["requests"] += 1
+        return out
+
+    def _exchange(self, packets: List[bytes]) -> List[CipReply]:
+        """Pipeline SendRRData requests on the shared TCP session; replies matched by context."""
+        tx = self.tx
+        with tx._tcp_lock:
+            s, session = tx._tcp, tx.session
+            if not (s and session):
+                raise ConnectionError("explicit messaging needs a connected session")
+            if self._late_sock is not s:
+                self._late.clear()          # new session: nothing late can arrive on it
+                self._late_sock = s
+            pending: Dict[bytes, int] = {}
+            replies: List[Optional[CipReply]] = [None] * len(packets)
+            nxt = 0
+            err: Optional[Exception] = None
+            s.settimeout(self.timeout_s)
+            try:
+                while nxt < len(packets) or pending:
+                    while nxt < len(packets) and len(pending) < self.window:
+                        self._ctx = (self._ctx + 1) & 0xFFFFFFFF
+                        ctx = struct.pack("<II", self._ctx, 0x45584D47)   # "GMXE": ours
+                        pending[ctx] = nxt
+                        with tx._tcp_wlock:
+                            s.sendall(build_send_rr_data(session, packets[nxt], ctx))
+                        self._stats["packets"] += 1
+                        nxt += 1
+                    cmd, status, ctx, body = _read_encap(s)
+                    i = pending.pop(ctx, None)
+                    if cmd != 0x006F or i is None:
+                        if ctx in self._late:
+                            self._late.discard(ctx)     # answer to a request we gave up on
+                            self._stats["late_replies"] += 1
+                        continue            # not ours (e.g. a reply to the SendUnitData mirror)
+                    if status:
+                        # framing is intact: read the rest of the window, then fail
+                        err = err or ConnectionError(f"SendRRData encapsulation status 0x{status:X}")
+                        continue
+                    replies[i] = parse_reply(_rr_cip(body))
+            except socket.timeout:
+                # stream still on a frame boundary: the session (and the I/O connection on it)
+                # stays; replies still owed are recognised by context and skipped later
+                self._late.update(pending)
+                self._stats["timeouts"] += 1
+                raise
+            except BaseException:
+                # half-read frame or broken send: the stream is out of sync, drop the session;
+                # the cyclic sender reconnects
+                self._drop_session(s)
+                raise
+            finally:
+                try:
+                    s.settimeout(5.0)
+                except Exception:
+                    pass
+        if err is not None:
+            raise err
+        return replies
+
+    def _drop_session(self, s) -> None:
+        tx = self.tx
+        if tx._tcp is s:
+            tx._tcp = None
+        try:
+            s.close()
+        except Exception:
+            pass
+
+class _FrameError(ConnectionError):
+    """A reply frame was cut off mid-read; the TCP stream can no longer be parsed."""
+
+def _recv_exact(s, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        try:
+            chunk = s.recv(n - len(buf))
+        except socket.timeout as e:
+            if buf:
+                raise _FrameError("timed out inside a reply frame") from e
+            raise
+        if not chunk:
+            raise ConnectionError("session closed by peer")
+        buf += chunk
+    return bytes(buf)
+
+def _read_encap(s) -> Tuple[int, int, bytes, bytes]:
+    """One encapsulation frame. A timeout before its first byte is re-raised as is
+    (the stream is still in sync); any failure after that raises _FrameError."""
+    cmd, ln, _session, status, ctx, _opt = _ENCAP.unpack(_recv_exact(s, _ENCAP.size))
+    try:
+        return cmd, status, ctx, _recv_exact(s, ln) if ln else b""
+    except socket.timeout as e:
+        raise _FrameError("timed out inside a reply frame") from e
+
+def _rr_cip(rr: bytes) -> bytes:
+    if len(rr) < 8:
+        return b""
+    count = struct.unpack_from("<H", rr, 6)[0]
+    off = 8
+    for _ in range(count):
+        typ, ln = struct.unpack_from("<HH", rr, off); off += 4
+        if typ in (0x00B2, 0x00B1):
+            return rr[off:off + ln]
+        off += ln
+    return b""
+
+__all__ = [
+    "ExplicitClient", "CipError", "CipReply", "attr_path", "cip_request", "multiple_service",
+    "parse_reply", "parse_multiple_service", "build_send_rr_data",
+    "GET_ATTRIBUTE_SINGLE", "SET_ATTRIBUTE_SINGLE", "MULTIPLE_SERVICE_PACKET",
+]
@@ -0,0 +1,131 @@
+# forward_open.py
+"""CIP ForwardOpen request builder and reply parser.
+
+Encodes RPI, connection sizes/parameters, timeout multiplier and the
+connection triad from arguments instead of a fixed hex blob, and decodes
+the actual packet intervals (API) the adapter granted.
+"""
+import itertools, os, struct
+from dataclasses import dataclass, field
+from typing import Optional
+from hexutil import hx
+
+# Electronic key of the drive the original blob was captured from (vendor 0xBB, type 0x2B, product 0x13E6)
+DEFAULT_ELECTRONIC_KEY = hx("3404 bb00 2b00 e613 8101")
+
+# network connection parameters: point-to-point, scheduled priority, fixed size (size added per connection)
+P2P_SCHEDULED_FIXED = 0x4800
+
+# per-process connection serial / T→O connection ID allocation (must differ per connection)
+_ids = itertools.count(int.from_bytes(os.urandom(2), "little") | 1)
+
+def next_connection_ids():
+    """Return a fresh (connection serial, T→O connection ID) pair."""
+    n = next(_ids) & 0xFFFF
+    return n, 0x00010000 | n
+
+@dataclass
+class ForwardOpenParams:
+    o2t_rpi_us: int = 10_000
+    t2o_rpi_us: int = 10_000
+    o2t_size: int = 44                  # app bytes, excluding the 2-byte sequence count
+    t2o_size: int = 56
+    timeout_multiplier: int = 2         # encoded: connection timeout = (4 << n) * RPI
+    priority_tick: int = 0x05
+    timeout_ticks: int = 0x9C
+    o2t_flags: int = P2P_SCHEDULED_FIXED
+    t2o_flags: int = P2P_SCHEDULED_FIXED
+    trigger: int = 0x01                 # class 1, cyclic
+    vendor_id: int = 0x0001
+    originator_serial: int = 0x70941438
+    conn_serial: Optional[int] = None   # None: allocate per connect
+    t2o_conn_id: Optional[int] = None   # None: allocate per connect
+    o2t_assembly: int = 0x65
+    t2o_assembly: int = 0x64
+    electronic_key: bytes = field(default=DEFAULT_ELECTRONIC_KEY)
+
+    @property
+    def timeout_factor(self) -> int:
+        return 4 << min(self.timeout_multiplier, 7)
+
+    def connection_path(self) -> bytes:
+        return self.electronic_key + bytes([0x20, 0x04, 0x2C, self.o2t_assembly, 0x2C, self.t2o_assembly])
+
+@dataclass
+class ForwardOpenReply:
+    o2t_conn_id: int
+    t2o_conn_id: int
+    conn_serial: int
+    vendor_id: int
+    originator_serial: int
+    o2t_api_us: int
+    t2o_api_us: int
+
+def _net_params(flags: int, size: int) -> int:
+    n = size + 2            # CTP sequence count travels with the data
+    if n > 0x1FF:
+        raise ValueError(f"connection size {size} too large for a 16-bit ForwardOpen")
+    return (flags & ~0x1FF) | n
+
+def build_forward_open(session: int, p: ForwardOpenParams, conn_serial: int, t2o_conn_id: int,
+                       context: bytes = b"\x00\x00\x00\x00\x01\x00\x00\x80") -> bytes:
+    """Encapsulated SendRRData carrying a ForwardOpen (0x54) to the Connection Manager."""
+    path = p.connection_path()
+    if len(path) % 2:
+        raise ValueError("connection path must be an even number of bytes")
+    cip = (bytes([0x54, 0x02, 0x20, 0x06, 0x24, 0x01]) +
+           struct.pack("<BBIIHHIB3xIHIHB", p.priority_tick, p.timeout_ticks, 0, t2o_conn_id,
+                       conn_serial & 0xFFFF, p.vendor_id, p.originator_serial, p.timeout_multiplier,
+                       p.o2t_rpi_us, _net_params(p.o2t_flags, p.o2t_size),
+                       p.t2o_rpi_us, _net_params(p.t2o_flags, p.t2o_size), p.trigger) +
+           bytes([len(path) // 2]) + path)
+    rr = struct.pack("<IHH HH HH", 0, 0, 2, 0, 0, 0x00B2, len(cip)) + cip
+    return struct.pack("<HHII8sI", 0x006F, len(rr), session, 0, context, 0) + rr
+
+def build_forward_close(session: int, p: ForwardOpenParams, conn_serial: int,
+                        context: bytes = b"\x00\x00\x00\x00\x02\x00\x00\x80") -> bytes:
+    """Encapsulated SendRRData carrying a ForwardClose (0x4E) for the given connection triad."""
+    path = p.connection_path()
+    cip = (bytes([0x4E, 0x02, 0x20, 0x06, 0x24, 0x01]) +
+           struct.pack("<BBHHIBB", p.priority_tick, p.timeout_ticks, conn_serial & 0xFFFF,
+                       p.vendor_id, p.originator_serial, len(path) // 2, 0) + path)
+    rr = struct.pack("<IHH HH HH", 0, 0, 2, 0, 0, 0x00B2, len(cip)) + cip
+    return struct.pack("<HHII8sI", 0x006F, len(rr), session, 0, context, 0) + rr
+
+def cip_reply_item(encap_reply: bytes) -> Optional[bytes]:
+    """Return the CIP reply from a SendRRData/SendUnitData encapsulation (None if malformed)."""
+    if len(encap_reply) < 24: return None
+    _, ln, _, status = struct.unpack_from("<H H I I", encap_reply, 0)
+    if status != 0 or len(encap_reply) < 24 + ln: return None
+    rr = encap_reply[24:24+ln]
+    if len(rr) < 8: return None
+    item_count = struct.unpack_from("<H", rr, 6)[0]
+    off = 8; cip = None
+    for _ in range(item_count):
+        if off + 4 > len(rr): return None
+        typ, l = struct.unpack_from("<H H", rr, off); off += 4
+        if off + l > len(rr): return None
+        data = rr[off:off+l]; off += l
+        if typ in (0x00B2, 0x00B0): cip = data
+    return cip
+
+def parse_forward_open_reply(encap_reply: bytes) -> Optional[ForwardOpenReply]:
+    """Decode a successful ForwardOpen reply; None on error status or malformed data."""
+    cip = cip_reply_item(encap_reply)
+    if not cip or len(cip) < 4 or cip[0] != 0xD4: return None
+    gen = cip[2]; ext = cip[3]
+    pos = 4 + 2 * ext
+    if gen != 0x00 or pos + 26 > len(cip): return None
+    o2t, t2o, serial, vendor, orig, o2t_api, t2o_api = struct.unpack_from("<IIHHIII", cip, pos)
+    return ForwardOpenReply(o2t, t2o, serial, vendor, orig, o2t_api, t2o_api)
+
+def parse_forward_close_reply(encap_reply: bytes) -> bool:
+    """True if the reply is a successful ForwardClose."""
+    cip = cip_reply_item(encap_reply)
+    return bool(cip) and len(cip) >= 4 and cip[0] == 0xCE and cip[2] == 0x00
+
+__all__ = [
+    "ForwardOpenParams", "ForwardOpenReply", "build_forward_open", "parse_forward_open_reply",
+    "build_forward_close", "parse_forward_close_reply",
+    "cip_reply_item", "next_connection_ids", "DEFAULT_ELECTRONIC_KEY", "P2P_SCHEDULED_FIXED",
+]
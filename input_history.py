@@ -0,0 +1,218 @@
+# input_history.py
+"""Fixed-capacity T→O input history with vectorized queries (needs NumPy).
+
+InputHistory keeps the last `capacity` accepted packets as preallocated
+columns: monotonic arrival time, 32-bit sequence, Fixed I/O (OUT) word
+and, optionally, the leading app bytes needed to decode InputMap fields
+(position, speed, alarm code). The listener's receive thread writes one
+row per packet by index; nothing grows and no per-packet objects are
+kept. Fields are decoded only when queried, one vector op per column.
+
+Queries return NumPy arrays over the recorded window:
+
+    hist = InputHistory(1 << 16).attach(drv._listener)
+    ...
+    hist.move_durations()           # START-R rising -> IN-POS rising (s)
+    hist.edges(READY, rising=False) # READY drop times
+    np.percentile(np.diff(hist.snapshot()["t"]), 99)
+"""
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+from input_reader import InputMap, START_R, IN_POS, MOVE, READY
+
+try:
+    import numpy as np
+except ImportError:         # optional: only needed for the history
+    np = None
+
+DEFAULT_FIELDS = ("position", "speed", "alarm_code")
+
+class InputHistory:
+    def __init__(self, capacity: int = 1 << 16, fields: Optional[Sequence[str]] = None,
+                 input_map: Optional[InputMap] = None):
+        """capacity: packets kept (oldest overwritten). fields: InputMap fields to keep
+        (raw bytes are stored and decoded per query); None keeps those of DEFAULT_FIELDS
+        the map places, () keeps time/seq/word only."""
+        if np is None:
+            raise RuntimeError("InputHistory needs NumPy (pip install numpy)")
+        self.capacity = max(2, int(capacity))
+        self.map = input_map or InputMap()
+        if fields is None:
+            fields = [f for f in DEFAULT_FIELDS if getattr(self.map, f) is not None]
+        self._fields: Dict[str, Tuple[int, str]] = {}
+        for f in fields:
+            self._fields[f] = self._layout(f)
+        self._raw_len = max((off + np.dtype(dt).itemsize for off, dt in self._fields.values()), default=0)
+
+        self._t = np.zeros(self.capacity, dtype="<f8")
+        self._seq = np.zeros(self.capacity, dtype="<u4")
+        self._word = np.zeros(self.capacity, dtype="<u2")
+        self._raw = np.zeros((self.capacity, self._raw_len), dtype=np.uint8) if self._raw_len else None
+        self._raw_mv = memoryview(self._raw).cast("B") if self._raw is not None else None
+        self._n = 0                 # rows ever written; row k lives at k % capacity
+        self._listener = None
+        self._lock = threading.Lock()   # readers only; the writer never blocks
+
+    def _layout(self, name: str) -> Tuple[int, str]:
+        m = self.map
+        if name == "position" and m.position is not None:
+            return m.position, "<i4"
+        if name == "speed" and m.speed is not None:
+            return m.speed, "<i4"
+        if name == "alarm_code" and m.alarm_code is not None:
+            return m.alarm_code, "<u4" if m.alarm_bytes == 4 else "<u2"
+        raise ValueError(f"field {name!r} is not placed by the input map")
+
+    # === writer (receive thread) ===
+    def attach(self, listener) -> "InputHistory":
+        """Record every packet `listener` accepts (see UdpInputListener.add_packet_hook)."""
+        self.detach()
+        self._listener = listener
+        listener.add_packet_hook(self.on_packet)
+        return self
+
+    def detach(self) -> None:
+        if self._listener is not None:
+            self._listener.remove_packet_hook(self.on_packet)
+            self._listener = None
+
+    def on_packet(self, app: bytes, word: int, now: float) -> None:
+        n = self._n
+        i = n % self.capacity
+        self._t[i] = now
+        lis = self._listener
+        self._seq[i] = lis.last_seq if lis is not None else n & 0xFFFFFFFF
+        self._word[i] = word
+        k = self._raw_len
+        if k:
+            m = min(k, len(app))
+            base = i * k
+            self._raw_mv[base:base + m] = app[:m]
+            if m < k:
+                self._raw_mv[base + m:base + k] = bytes(k - m)
+        self._n = n + 1             # publish the row
+
+    # === readers ===
+    def __len__(self) -> int:
+        return min(self._n, self.capacity)
+
+    @property
+    def total(self) -> int:
+        """Packets recorded since creation (including overwritten ones)."""
+        return self._n
+
+    def clear(self) -> None:
+        with self._lock:
+            self._n = 0
+
+    def snapshot(self, t0: Optional[float] = None, t1: Optional[float] = None) -> Dict[str, "np.ndarray"]:
+        """Copy of the window in arrival order: t, seq, word and every kept field,
+        optionally limited to t0 <= t < t1."""
+        with self._lock:
+            n = self._n
+            cap = self.capacity
+            count = min(n, cap)
+            start = n - count
+            idx = (np.arange(start, n) % cap) if n > cap else np.arange(count)
+            cols = {"t": self._t[idx], "seq": self._seq[idx], "word": self._word[idx]}
+            raw = self._raw[idx] if self._raw is not None else None
+            late = self._n - n
+        # the writer does not wait for us: drop the oldest rows whose slots it wrote
+        # (or may be writing) while we copied
+        drop = min(count, max(0, n + late + 1 - cap - start))
+        if drop:
+            cols = {k: v[drop:] for k, v in cols.items()}
+            raw = raw[drop:] if raw is not None else None
+        for name, (off, dt) in self._fields.items():
+            size = np.dtype(dt).itemsize
+            cols[name] = np.ascontiguousarray(raw[:, off:off + size]).view(dt).reshape(-1)
+        if t0 is not None or t1 is not None:
+            t = cols["t"]
+            lo = 0 if t0 is None else int(np.searchsorted(t, t0, "left"))
+            hi = len(t) if t1 is None else int(np.searchsorted(t, t1, "left"))
+            cols = {k: v[lo:hi] for k, v in cols.items()}
+        return cols
+
+    # === vectorized queries ===
+    @staticmethod
+    def _edge_index(word, bit: int, rising: bool):
+        on = (word & bit) != 0
+        if len(on) < 2:
+            return np.zeros(0, dtype=np.intp)
+        ch = (on[1:] & ~on[:-1]) if rising else (~on[1:] & on[:-1])
+        return np.flatnonzero(ch) + 1
+
+    def edges(self, bit: int, rising: bool = True, t0: Optional[float] = None,
+              t1: Optional[float] = None) -> "np.ndarray":
+        """Arrival times of the packets where `bit` turned on (or off)."""
+        s = self.snapshot(t0, t1)
+        return s["t"][self._edge_index(s["word"], bit, rising)]
+
+    @staticmethod
+    def _pair(starts, ends, same_packet: bool = False) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Match each start with the first end after it (or at it, with same_packet),
+        unless another start comes first."""
+        j = np.searchsorted(ends, starts, side="left" if same_packet else "right")
+        ok = j < len(ends)
+        starts, j = starts[ok], j[ok]
+        e = ends[j]
+        nxt = np.append(starts[1:], np.inf)
+        keep = e <= nxt
+        return starts[keep], e[keep]
+
+    def moves(self, start_bit: int = START_R, done_bit: int = IN_POS, t0: Optional[float] = None,
+              t1: Optional[float] = None) -> Tuple["np.ndarray", "np.ndarray"]:
+        """(start times, completion times): `start_bit` rising -> next `done_bit` rising."""
+        s = self.snapshot(t0, t1)
+        t, w = s["t"], s["word"]
+        return self._pair(t[self._edge_index(w, start_bit, True)], t[self._edge_index(w, done_bit, True)])
+
+    def move_durations(self, start_bit: int = START_R, done_bit: int = IN_POS,
+                       t0: Optional[float] = None, t1: Optional[float] = None) -> "np.ndarray":
+        """Seconds from START acknowledged (START-R) to IN-POS, one per completed move."""
+        a, b = self.moves(start_bit, done_bit, t0, t1)
+        return b - a
+
+    def settle_times(self, t0: Optional[float] = None, t1: Optional[float] = None) -> "np.ndarray":
+        """Seconds from MOVE clearing to IN-POS (0 when both change in the same packet)."""
+        s = self.snapshot(t0, t1)
+        t, w = s["t"], s["word"]
+        a, b = self._pair(t[self._edge_index(w, MOVE, False)], t[self._edge_index(w, IN_POS, True)], True)
+        return b - a
+
+    def dropouts(self, bit: int = READY, t0: Optional[float] = None,
+                 t1: Optional[float] = None) -> Tuple["np.ndarray", "np.ndarray"]:
+        """(drop times, durations) of the intervals where `bit` was off (READY by default).
+
+        A dropout still open at the end of the window is reported up to its last packet.
+        """
+        s = self.snapshot(t0, t1)
+        t, w = s["t"], s["word"]
+        if not len(t):
+            return t[:0], t[:0]
+        down = t[self._edge_index(w, bit, False)]
+        up = t[self._edge_index(w, bit, True)]
+        j = np.searchsorted(up, down, side="right")
+        end = np.full(len(down), t[-1])
+        has = j < len(up)
+        end[has] = up[j[has]]
+        return down, end - down
+
+    def intervals(self, t0: Optional[float] = None, t1: Optional[float] = None) -> "np.ndarray":
+        """Inter-arrival times (s) of consecutive recorded packets."""
+        return np.diff(self.snapshot(t0, t1)["t"])
+
+    def seq_gaps(self, t0: Optional[float] = None, t1: Optional[float] = None) -> "np.ndarray":
+        """Sequence-number steps between recorded packets (1 = nothing lost)."""
+        return np.diff(self.snapshot(t0, t1)["seq"].astype(np.int64)) & 0xFFFFFFFF
+
+    def stats(self) -> dict:
+        """Cycle-time summary (µs) over the window, plus counts."""
+        dt = self.intervals() * 1e6
+        if not len(dt):
+            return {"packets": len(self), "total": self._n}
+        return {"packets": len(self), "total": self._n, "mean_us": float(dt.mean()),
+                "p50_us": float(np.percentile(dt, 50)), "p99_us": float(np.percentile(dt, 99)),
+                "max_us": float(dt.max()), "std_us": float(dt.std())}
+
+__all__ = ["InputHistory", "DEFAULT_FIELDS"]
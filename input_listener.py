@@ -5,66 +5,329 @@ Can share the same UDP socket as the transport (recommended),
 or create its own legacy-bound socket if none is provided.
 Parses CPF 0x00B1; falls back to [CTP seq (2B)] + app if CPF is absent.
 
+Decodes the Fixed I/O (OUT) word as each packet arrives and wakes
+waiters on its edges, so `wait_for(bits_set=IN_POS, ...)` returns as soon
+as the satisfying packet lands instead of on the next polling interval.
+
+The receive thread waits on a non-blocking socket with selectors and, per
+wakeup, drains every pending datagram with recv_into into two preallocated
+buffers (the newest accepted one is kept while the next is read). CPF is
+parsed in place. Every accepted packet of a burst goes through edge
+tracking, instrumentation and packet hooks; only get_app()'s image is
+coalesced to the newest one (plus each packet whose Fixed word changed, so
+a woken waiter reads the packet that woke it). coalesce=False publishes
+each in order. kernel_timestamps=True takes arrival times from
+SO_TIMESTAMPNS instead of the thread's wakeup.
+
 Includes simple debugging helpers:
 - get_last_packet(): raw last UDP packet bytes
 - get_stats(): packet count, last length, last timestamp
 """
-import socket, struct, threading, time
-from typing import Optional
+import selectors, socket, struct, sys, threading, time
+from typing import Optional, Tuple
+from bit_waiters import BitWaiterIndex, matches
+from cyclic_scheduler import LatencyStats
+from input_reader import InputMap
+from rt_tuning import RtConfig, apply_thread
+
+# leading CPF: item count, 0x8002 type/len, connection ID, 32-bit encapsulation sequence
+_SAI_HEAD = struct.Struct("<HHHII")
+_HIST_BUCKETS = 24      # log2 µs buckets: [0,1), [1,2), [2,4), ... up to ~8.4 s
+_ITEM = struct.Struct("<HH")
+_U16 = struct.Struct("<H")
+_IO_CPF = struct.Struct("<HHH8xHH")    # count, 0x8002 type/len, (conn id, seq), 0x00B1 type/len
+
+# kernel receive timestamps (Linux): struct timespec in an SCM_TIMESTAMPNS control message
+_SO_TIMESTAMPNS = getattr(socket, "SO_TIMESTAMPNS", 35) if sys.platform.startswith("linux") else None
+_TIMESPEC = struct.Struct("@ll")
+_TS_ANC = socket.CMSG_SPACE(_TIMESPEC.size) if hasattr(socket, "CMSG_SPACE") else 0
+
+class SeqTracker:
+    """Per-connection T→O sequence filter with loss/duplicate/reorder counters.
+
+    Accepts a packet only if its 32-bit sequence is newer than the last
+    accepted one (serial-number arithmetic), and keeps a log2-µs histogram
+    of inter-arrival times of accepted packets.
+    """
+    __slots__ = ("conn_id", "last_seq", "last_t", "accepted", "lost", "duplicates",
+                 "reordered", "hist")
+
+    def __init__(self):
+        self.conn_id = -1
+        self.last_seq = 0
+        self.last_t = 0.0
+        self.accepted = 0
+        self.lost = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.hist = [0] * _HIST_BUCKETS
+
+    def accept(self, conn_id: int, seq: int, now: float) -> bool:
+        if conn_id != self.conn_id:
+            # new connection (e.g. after a reconnect): restart the sequence space
+            self.conn_id = conn_id
+        else:
+            diff = (seq - self.last_seq) & 0xFFFFFFFF
+            if diff == 0:
+                self.duplicates += 1
+                return False
+            if diff & 0x80000000:
+                # older than what we already have: a late packet, not a loss after all
+                self.reordered += 1
+                if self.lost:
+                    self.lost -= 1
+                return False
+            if diff > 1:
+                self.lost += diff - 1
+            dt = int((now - self.last_t) * 1e6)
+            b = dt.bit_length() if dt > 0 else 0
+            self.hist[b if b < _HIST_BUCKETS else _HIST_BUCKETS - 1] += 1
+        self.last_seq = seq
+        self.last_t = now
+        self.accepted += 1
+        return True
+
+    def stats(self) -> dict:
+        return {"accepted": self.accepted, "lost": self.lost,
+                "duplicates": self.duplicates, "reordered": self.reordered}
+
+    def histogram(self) -> dict:
+        """Inter-arrival counts keyed by bucket upper bound in µs."""
+        return {(1 << i): n for i, n in enumerate(self.hist) if n}
+
+class _Waiter:
+    __slots__ = ("event", "word")
+    def __init__(self):
+        self.event = threading.Event()
+        self.word = 0
+    def resolve(self, word: int) -> None:
+        self.word = word
+        self.event.set()
 
 class UdpInputListener:
     def __init__(self, drive_ip: str, port: Optional[int] = None, bufsize: int = 4096,
-                 udp_socket: Optional[socket.socket] = None):
+                 udp_socket: Optional[socket.socket] = None,
+                 fixed_out_offset: Optional[int] = None, passive: bool = False,
+                 coalesce: bool = True, kernel_timestamps: bool = False):
+        """passive=True: no socket/thread of its own; packets arrive via feed() (DriveGroup).
+        coalesce: of a burst drained in one wakeup, copy out only the newest accepted image for
+        get_app() (hooks, edges and instrumentation still see every packet).
+        kernel_timestamps: stamp arrivals with SO_TIMESTAMPNS (Linux); see rx_delay_stats()."""
         self.drive_ip = drive_ip
         self.port = port                 # only used if we create our own socket
         self.bufsize = bufsize
         self._ext_sock = udp_socket is not None
         self._sock: Optional[socket.socket] = udp_socket
+        self._rx: Optional[socket.socket] = None    # non-blocking handle the receive thread reads
+        self._passive = passive
         self._thr: Optional[threading.Thread] = None
         self._stop = threading.Event()
         self._latest = b""
+        self.coalesce = bool(coalesce)
+        self.kernel_timestamps = bool(kernel_timestamps)
+        self._kernel_ts = False                 # SO_TIMESTAMPNS actually enabled
+        self.rx_delay = LatencyStats()          # kernel receive -> receive thread (kernel_timestamps)
+        self._rx_bufs = (bytearray(bufsize), bytearray(bufsize))
+        self._rx_mvs = tuple(memoryview(b) for b in self._rx_bufs)
+
+        # Fixed I/O (OUT) word decoded per packet + edge-triggered waiters
+        self._fixed_off: Optional[int] = fixed_out_offset
+        self._word = 0
+        self._have_word = False
+        self._wlock = threading.Lock()
+        self._waiters = BitWaiterIndex()
+        self._pkt_cond = threading.Condition(self._wlock)
+        self._pkt_waiting = 0
 
         # debug state
         self._last_pkt = b""
         self._last_ts = 0.0
         self._count = 0
 
+        # watchdog state: monotonic arrival of the newest packet, stale after a connection loss
+        self._last_rx = 0.0
+        self._stale = False
+        self._seq = SeqTracker()
+
+        # per-packet callbacks (app, fixed word, monotonic arrival); tuple swapped, never mutated
+        self._pkt_hooks: tuple = ()
+        self._capture = None        # CaptureWriter tapping every datagram (before filtering)
+        self.instr = None           # instrument.Instrumentation (packet_received/parsed, state_edge)
+
+        self.rt: Optional[RtConfig] = None      # affinity/policy for the receive thread
+        self.rt_applied: dict = {}
+
     def start(self) -> None:
         if self._thr and self._thr.is_alive():
             return
         self._stop.clear()
+        if self._passive:
+            return
         if self._sock is None:
             self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self._sock.settimeout(1.0)
             self._sock.bind(("", self.port or 2222))
-        else:
-            self._sock.settimeout(0.5)
+        # a shared socket stays as the transport configured it (its sends wait for buffer
+        # space under a timeout); we read through our own non-blocking handle on the same socket
+        self._rx = self._sock.dup() if self._ext_sock else self._sock
+        self._rx.setblocking(False)
+        self._kernel_ts = False
+        if self.kernel_timestamps and _SO_TIMESTAMPNS is not None and _TS_ANC:
+            try:
+                self._rx.setsockopt(socket.SOL_SOCKET, _SO_TIMESTAMPNS, 1)
+                self._kernel_ts = True
+            except OSError:
+                pass
 
         def _run():
-            while not self._stop.is_set():
-                try:
-                    data, (_src_ip, _src_port) = self._sock.recvfrom(self.bufsize)
-
-                    # record raw packet + simple stats (for debugging)
-                    self._last_pkt = data
-                    self._count += 1
-                    self._last_ts = time.time()
-
-                    # extract application bytes
-                    app = self._extract_app_from_cpf(data)
-                    if app is not None:
-                        self._latest = app
-                except socket.timeout:
-                    continue
-                except Exception:
-                    continue
+            self.rt_applied = apply_thread(self.rt)
+            sel = selectors.DefaultSelector()
+            try:
+                sel.register(self._rx, selectors.EVENT_READ)
+                while not self._stop.is_set():
+                    try:
+                        if sel.select(0.5):
+                            self._drain()
+                    except (OSError, ValueError):
+                        self._stop.wait(0.1)    # socket closed under us (transport closing)
+            finally:
+                sel.close()
 
         self._thr = threading.Thread(target=_run, name="enip-udp-input", daemon=True)
         self._thr.start()
 
+    def _drain(self) -> None:
+        """Read every pending datagram; each accepted one is processed, the newest is published."""
+        sock, mvs, kts = self._rx, self._rx_mvs, self._kernel_ts
+        k = 0                           # buffer the next datagram is read into
+        held = None                     # (buffer, app span, arrival) of the newest accepted one
+        last = None
+        while True:
+            try:
+                if kts:
+                    n, anc, _fl, _addr = sock.recvmsg_into((mvs[k],), _TS_ANC)
+                else:
+                    n = sock.recv_into(mvs[k])
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break                   # e.g. ICMP port unreachable; the next wakeup goes on
+            now = time.monotonic()
+            if kts:
+                now = self._kernel_time(anc, now)
+            pkt = mvs[k][:n]
+            last = (k, n)
+            span = self._filter(pkt, now)
+            if span is None:
+                continue
+            if not self.coalesce:
+                self._accept(bytes(pkt[span[0]:span[1]]), now)
+                continue
+            app = pkt[span[0]:span[1]]
+            # hooks may keep the image; without them it is only looked at in place
+            self._accept(bytes(app) if self._pkt_hooks else app, now, publish=False)
+            held = (k, span, now)
+            k ^= 1                      # keep it; read the next one into the other buffer
+        if last is not None:
+            self._last_pkt = bytes(mvs[last[0]][:last[1]])
+        if held is not None:
+            k, (a, b), _now = held
+            self._latest = bytes(mvs[k][a:b])
+
+    def _kernel_time(self, anc, now: float) -> float:
+        """Monotonic arrival from the SCM_TIMESTAMPNS message (kernel stamps wall-clock time)."""
+        for level, typ, data in anc:
+            if level == socket.SOL_SOCKET and typ == _SO_TIMESTAMPNS and len(data) >= _TIMESPEC.size:
+                sec, nsec = _TIMESPEC.unpack_from(data)
+                delay = max(0.0, time.time() - (sec + nsec * 1e-9))
+                self.rx_delay.record(delay)
+                return now - delay
+        return now
+
+    def feed(self, data: bytes) -> None:
+        """Process one raw T→O datagram (called by the receive thread or a demultiplexer)."""
+        self._last_pkt = data
+        now = time.monotonic()
+        span = self._filter(data, now)
+        if span is not None:
+            self._accept(bytes(data[span[0]:span[1]]), now)
+
+    def _filter(self, data, now: float) -> Optional[Tuple[int, int]]:
+        """Stats, capture and sequence filter for one datagram (bytes or memoryview);
+        returns the app span if it is the newest image so far."""
+        self._count += 1
+        self._last_ts = time.time()
+        self._last_rx = now
+        self._stale = False
+        cap = self._capture
+        if cap is not None:
+            cap.record(1, data, now)        # capture.T2O
+        ins = self.instr
+        if ins is not None:
+            ins.emit("packet_received", now, len(data))
+
+        # drop duplicates and packets older than the newest image we have
+        if len(data) >= 14:
+            _n, typ, ln, cid, seq = _SAI_HEAD.unpack_from(data, 0)
+            if typ == 0x8002 and ln >= 8 and not self._seq.accept(cid, seq, now):
+                return None
+        return self._cpf_app_span(data)
+
+    def feed_app(self, app: bytes, now: Optional[float] = None) -> None:
+        """Process an app image that was already extracted and sequence-filtered
+        elsewhere (e.g. by an out-of-process I/O engine); `now` is its monotonic arrival."""
+        if now is None:
+            now = time.monotonic()
+        self._count += 1
+        self._last_ts = time.time()
+        self._last_rx = now
+        self._stale = False
+        cap = self._capture
+        if cap is not None:
+            cap.record(1, app, now, 0x01)   # capture.T2O, FLAG_APP_ONLY
+        self._accept(app, now)
+
+    def _accept(self, app: bytes, now: float, publish: bool = True) -> None:
+        """Edge tracking, instrumentation and hooks for one accepted packet; publish=False
+        (inside a coalesced burst) leaves get_app() to the drain unless the Fixed word changed."""
+        if publish:
+            self._latest = app
+        self._on_app(app, now, publish)
+        ins = self.instr
+        if ins is not None:
+            ins.emit("packet_parsed", now, self._word, self._seq.last_seq)
+        for hook in self._pkt_hooks:
+            try:
+                hook(app, self._word, now)
+            except Exception:
+                pass
+
+    def add_packet_hook(self, hook) -> None:
+        """Call `hook(app, fixed_word, t_monotonic)` on the receive thread for every accepted packet."""
+        self._pkt_hooks = self._pkt_hooks + (hook,)
+
+    def remove_packet_hook(self, hook) -> None:
+        self._pkt_hooks = tuple(h for h in self._pkt_hooks if h is not hook)
+
+    def set_capture(self, writer) -> None:
+        """Record every received datagram (see capture.CaptureWriter); None stops."""
+        self._capture = writer
+
+    def set_instrumentation(self, instr) -> None:
+        """Emit this listener's hook points (see instrument.Instrumentation); None detaches."""
+        self.instr = instr
+
     def stop(self) -> None:
         self._stop.set()
-        if not self._ext_sock:
+        with self._wlock:
+            self._waiters.resolve_all(self._word)
+            self._pkt_cond.notify_all()
+        if self._ext_sock and self._rx is not None:
+            try:
+                self._rx.close()            # our duplicate only; the transport owns the socket
+            except OSError:
+                pass
+        self._rx = None
+        if not self._ext_sock and not self._passive:
             try:
                 if self._sock:
                     self._sock.close()
@@ -75,38 +338,144 @@ class UdpInputListener:
         """Return last parsed application bytes (post-CTP/CPF extraction)."""
         return self._latest
 
+    # === watchdog hooks (see EnipSender.attach_input_monitor) ===
+    def last_rx_monotonic(self) -> float:
+        return self._last_rx
+
+    def is_stale(self) -> bool:
+        """True after a connection loss until the next packet arrives."""
+        return self._stale
+
+    def mark_stale(self) -> None:
+        """Flag the held input as stale and fail every pending wait now."""
+        self._stale = True
+        with self._wlock:
+            self._waiters.resolve_all(self._word)
+            self._pkt_cond.notify_all()
+
+    @property
+    def last_seq(self) -> int:
+        """32-bit 0x8002 sequence of the newest accepted packet (0 if the stream has none)."""
+        return self._seq.last_seq
+
+    def fixed_word(self) -> int:
+        """Return the Fixed I/O (OUT) word of the latest packet (0 before the first one)."""
+        return self._word
+
+    # === event-driven waits ===
+    def wait_for(self, bits_set: int = 0, bits_clear: int = 0,
+                 timeout: Optional[float] = None) -> bool:
+        """Block until the Fixed I/O word has all `bits_set` on and all `bits_clear` off.
+
+        Returns True on the packet that satisfies the condition, False on timeout
+        or when the listener is stopped.
+        """
+        with self._wlock:
+            if self._stale:
+                return False
+            if self._have_word and matches(self._word, bits_set, bits_clear):
+                return True
+            w = _Waiter()
+            self._waiters.add(bits_set, bits_clear, w)
+        if not w.event.wait(timeout):
+            with self._wlock:
+                self._waiters.remove(bits_set, bits_clear, w)
+            return w.event.is_set() and matches(w.word, bits_set, bits_clear)
+        return matches(w.word, bits_set, bits_clear)
+
+    def wait_packets(self, n: int = 1, timeout: Optional[float] = None) -> bool:
+        """Block until `n` more packets have been parsed. False on timeout/stop."""
+        end = None if timeout is None else time.monotonic() + timeout
+        with self._pkt_cond:
+            target = self._count + max(1, int(n))
+            self._pkt_waiting += 1
+            try:
+                while self._count < target and not self._stop.is_set() and not self._stale:
+                    rem = None if end is None else end - time.monotonic()
+                    if rem is not None and rem <= 0:
+                        return False
+                    self._pkt_cond.wait(rem)
+                return self._count >= target
+            finally:
+                self._pkt_waiting -= 1
+
+    def _on_app(self, app: bytes, now: float, published: bool = True) -> None:
+        off = self._fixed_off
+        if off is None:
+            off = self._fixed_off = InputMap.detect_fixed_out(app)
+        if len(app) < off + 2:
+            return
+        word = app[off] | (app[off + 1] << 8)
+        old = self._word
+        if word != old or not self._have_word:
+            if not published:
+                self._latest = bytes(app)   # a waiter woken by this edge reads this image
+            with self._wlock:
+                self._word = word
+                if not self._have_word:
+                    self._have_word = True
+                    old = ~word     # first packet: treat every bit as an edge
+                self._waiters.on_word(old, word)
+                if self._pkt_waiting:
+                    self._pkt_cond.notify_all()
+            ins = self.instr
+            if ins is not None and old != ~word:
+                ins.emit("state_edge", now, old, word)
+        elif self._pkt_waiting:
+            with self._wlock:
+                self._pkt_cond.notify_all()
+
     # === debugging helpers ===
+    def rx_delay_stats(self) -> dict:
+        """Kernel receive -> receive thread delay (µs); empty unless kernel_timestamps took effect."""
+        return self.rx_delay.stats()
+
     def get_last_packet(self) -> bytes:
         """Return the last raw UDP packet bytes (unparsed)."""
         return self._last_pkt
 
     def get_stats(self) -> dict:
         """Basic counters to verify we're receiving data."""
-        return {
+        st = {
             "packets": self._count,
             "last_len": len(self._last_pkt),
             "last_ts": self._last_ts,
         }
+        st.update(self._seq.stats())
+        return st
+
+    def interarrival_histogram(self) -> dict:
+        """Inter-arrival times of accepted packets: {bucket upper bound µs: count}."""
+        return self._seq.histogram()
+
+    @staticmethod
+    def _cpf_app_span(pkt) -> Optional[Tuple[int, int]]:
+        """(start, end) of the 0x00B1 app (without 2B CTP) in `pkt`; fallback to [2:]."""
+        n = len(pkt)
+        if n >= 20:
+            # the usual Class-1 layout: [0x8002 len 8][0x00B1 len CTP app...]
+            cnt, t1, l1, t2, l2 = _IO_CPF.unpack_from(pkt, 0)
+            if cnt == 2 and t1 == 0x8002 and l1 == 8 and t2 == 0x00B1 and 2 <= l2 <= n - 18:
+                return 20, 18 + l2
+        if n >= 4:
+            item_count = _U16.unpack_from(pkt, 0)[0]
+            off = 2
+            if 0 < item_count <= 8:
+                for _ in range(item_count):
+                    if off + 4 > n: break
+                    typ, ln = _ITEM.unpack_from(pkt, off); off += 4
+                    if off + ln > n: break
+                    if typ == 0x00B1 and ln >= 2:
+                        return off + 2, off + ln
+                    off += ln
+        if n >= 2:
+            return 2, n
+        return None
 
     @staticmethod
     def _extract_app_from_cpf(pkt: bytes) -> Optional[bytes]:
         """Parse CPF and return 0x00B1 app (without 2B CTP). Fallback to pkt[2:]."""
-        try:
-            if len(pkt) >= 4:
-                item_count = struct.unpack_from("<H", pkt, 0)[0]
-                off = 2
-                if 0 < item_count <= 8:
-                    for _ in range(item_count):
-                        if off + 4 > len(pkt): break
-                        typ, ln = struct.unpack_from("<H H", pkt, off); off += 4
-                        if off + ln > len(pkt): break
-                        data = pkt[off:off+ln]; off += ln
-                        if typ == 0x00B1 and ln >= 2:
-                            return data[2:]
-            if len(pkt) >= 2:
-                return pkt[2:]
-            return None
-        except Exception:
-            return None
-
-__all__ = ["UdpInputListener"]
+        span = UdpInputListener._cpf_app_span(pkt)
+        return None if span is None else bytes(pkt[span[0]:span[1]])
+
+__all__ = ["UdpInputListener", "SeqTracker"]
@@ -4,9 +4,25 @@
 Assumes little-endian words. Fixed I/O (OUT) word is usually at bytes 4..5,
 but some firmware places it at 8..9. We accept an explicit offset or
 auto-detect on the first update().
+
+An InputMap places every field of the T→O image (Fixed I/O OUT word, alarm
+code, feedback position/speed, remote I/O words). It compiles to a single
+struct.Struct, so a packet is decoded in one unpack_from into an
+InputSnapshot, and only once: the snapshot is cached until the next packet.
 """
-from dataclasses import dataclass
-from typing import Optional
+import struct
+from dataclasses import dataclass, replace
+from typing import Optional, Tuple
+
+# Fixed I/O (OUT) bit masks
+SEQ_BSY  = 1 << 0
+MOVE     = 1 << 1
+IN_POS   = 1 << 2
+START_R  = 1 << 3
+HOME_END = 1 << 4
+READY    = 1 << 5
+DCMD_RDY = 1 << 6
+ALM_A    = 1 << 7
 
 #These properties come from the Fixed IO output of the Driver
 @dataclass
@@ -29,44 +45,173 @@ class FixedOutBits:
     @property
     def alm_a(self):  return bool(self.raw & (1 << 7))
 
+# Fixed I/O (OUT) offsets tried by auto-detection, in order
+FIXED_OUT_CANDIDATES = (4, 8)
+
+@dataclass(frozen=True)
+class InputMap:
+    """Byte offsets of the T→O app fields; None leaves a field undecoded (reads 0).
+
+    fixed_out=None auto-detects 4 or 8 on the first packet (see detect_fixed_out).
+    """
+    fixed_out: Optional[int] = None
+    alarm_code: Optional[int] = None
+    alarm_bytes: int = 2                # 2 or 4
+    position: Optional[int] = None
+    speed: Optional[int] = None
+    remote_io: Optional[int] = None     # first remote I/O (R-OUT) word
+    remote_io_words: int = 0
+
+    @staticmethod
+    def detect_fixed_out(b: bytes) -> int:
+        # Prefer an offset that shows any of {IN-POS, MOVE, READY}
+        mask = IN_POS | MOVE | READY
+        for off in FIXED_OUT_CANDIDATES:
+            if len(b) >= off + 2:
+                val = b[off] | (b[off + 1] << 8)
+                if val & mask:
+                    return off
+        return FIXED_OUT_CANDIDATES[0]
+
+    def resolve(self, app: bytes) -> "InputMap":
+        """This map with fixed_out filled in from `app` if it was left to auto-detect."""
+        if self.fixed_out is not None:
+            return self
+        return replace(self, fixed_out=self.detect_fixed_out(app))
+
+    def compile(self) -> "_Decoder":
+        if self.fixed_out is None:
+            raise ValueError("resolve() the Fixed I/O (OUT) offset before compiling")
+        if self.alarm_bytes not in (2, 4):
+            raise ValueError("alarm_bytes must be 2 or 4")
+        fields = [("fixed_out", self.fixed_out, "H")]
+        if self.alarm_code is not None:
+            fields.append(("alarm_code", self.alarm_code, "H" if self.alarm_bytes == 2 else "I"))
+        if self.position is not None:
+            fields.append(("position", self.position, "i"))
+        if self.speed is not None:
+            fields.append(("speed", self.speed, "i"))
+        if self.remote_io is not None:
+            fields += [("remote_io", self.remote_io + 2 * i, "H") for i in range(self.remote_io_words)]
+        fields.sort(key=lambda f: f[1])
+        fmt, pos, order = "<", 0, []
+        for name, off, code in fields:
+            if off < pos:
+                raise ValueError(f"input map field {name!r} at {off} overlaps the previous field")
+            if off > pos:
+                fmt += f"{off - pos}x"
+            fmt += code
+            pos = off + struct.calcsize("<" + code)
+            order.append(name)
+        return _Decoder(struct.Struct(fmt), order)
+
+class _Decoder:
+    """Precompiled InputMap: one unpack_from per packet."""
+    __slots__ = ("st", "_fo", "_alm", "_pos", "_spd", "_rio")
+
+    def __init__(self, st: struct.Struct, order):
+        self.st = st
+        idx = lambda n: order.index(n) if n in order else -1
+        self._fo, self._alm, self._pos, self._spd = idx("fixed_out"), idx("alarm_code"), idx("position"), idx("speed")
+        self._rio = tuple(i for i, n in enumerate(order) if n == "remote_io")
+
+    def decode(self, app: bytes) -> "InputSnapshot":
+        st = self.st
+        if len(app) < st.size:
+            app = bytes(app).ljust(st.size, b"\x00")   # short packet: missing fields read 0
+        v = st.unpack_from(app)
+        return InputSnapshot(v[self._fo],
+                             v[self._alm] if self._alm >= 0 else 0,
+                             v[self._pos] if self._pos >= 0 else 0,
+                             v[self._spd] if self._spd >= 0 else 0,
+                             tuple(v[i] for i in self._rio) if self._rio else ())
+
+class InputSnapshot:
+    """One decoded T→O image. Bit properties match FixedOutBits."""
+    __slots__ = ("raw", "alarm_code", "position", "speed", "remote_io")
+
+    def __init__(self, raw: int = 0, alarm_code: int = 0, position: int = 0, speed: int = 0,
+                 remote_io: Tuple[int, ...] = ()):
+        self.raw = raw
+        self.alarm_code = alarm_code
+        self.position = position
+        self.speed = speed
+        self.remote_io = remote_io
+
+    seq_bsy  = property(lambda self: bool(self.raw & SEQ_BSY))
+    move     = property(lambda self: bool(self.raw & MOVE))
+    in_pos   = property(lambda self: bool(self.raw & IN_POS))
+    start_r  = property(lambda self: bool(self.raw & START_R))
+    home_end = property(lambda self: bool(self.raw & HOME_END))
+    ready    = property(lambda self: bool(self.raw & READY))
+    dcmd_rdy = property(lambda self: bool(self.raw & DCMD_RDY))
+    alm_a    = property(lambda self: bool(self.raw & ALM_A))
+
+    def __repr__(self) -> str:
+        return (f"InputSnapshot(raw=0x{self.raw:04X}, alarm_code={self.alarm_code}, "
+                f"position={self.position}, speed={self.speed}, remote_io={self.remote_io})")
+
+_EMPTY = InputSnapshot()
+
 #Class to handle reading of current drive state
 class ImplicitInputReader:
-    def __init__(self, fixed_out_offset: Optional[int] = None):
+    def __init__(self, fixed_out_offset: Optional[int] = None, input_map: Optional[InputMap] = None):
         self._last = b""
-        self._fixed_out_offset: Optional[int] = fixed_out_offset  # 4 or 8
+        if input_map is None:
+            input_map = InputMap(fixed_out=fixed_out_offset)
+        elif fixed_out_offset is not None:
+            input_map = replace(input_map, fixed_out=fixed_out_offset)
+        self.map = input_map
+        self._decoder: Optional[_Decoder] = input_map.compile() if input_map.fixed_out is not None else None
+        self._snap: Optional[InputSnapshot] = _EMPTY
 
     #Updates the last message seen
     def update(self, app: bytes):
-        self._last = app or b""
-        if self._fixed_out_offset is None:
-            self._fixed_out_offset = self._auto_pick_offset(self._last)
-            
+        app = app or b""
+        if app is self._last:
+            return                  # same packet object: keep the cached snapshot
+        self._last = app
+        self._snap = None           # decoded lazily, once
+        if self._decoder is None and app:
+            self.map = self.map.resolve(app)
+            self._decoder = self.map.compile()
+
+    def snapshot(self) -> InputSnapshot:
+        """The decoded last packet (cached until the next update())."""
+        s = self._snap
+        if s is None:
+            s = self._snap = self._decoder.decode(self._last) if self._decoder and self._last else _EMPTY
+        return s
+
+    @property
+    def _fixed_out_offset(self) -> Optional[int]:
+        return self.map.fixed_out
+
     #Used to grab fixed output of message based on first message sent
-    def fixed_out(self) -> FixedOutBits:
-        off = 4 if self._fixed_out_offset is None else self._fixed_out_offset
-        if len(self._last) < off + 2:
-            return FixedOutBits(0)
-        return FixedOutBits(int.from_bytes(self._last[off:off+2], "little"))
+    def fixed_out(self) -> InputSnapshot:
+        """Fixed I/O (OUT) bits of the last packet (.raw plus FixedOutBits properties)."""
+        return self.snapshot()
 
     # convenience flags
-    def in_pos(self) -> bool: return self.fixed_out().in_pos
-    def move(self)   -> bool: return self.fixed_out().move
-    def ready(self)  -> bool: return self.fixed_out().ready
+    def in_pos(self) -> bool: return self.snapshot().in_pos
+    def move(self)   -> bool: return self.snapshot().move
+    def ready(self)  -> bool: return self.snapshot().ready
 
     def alarm_active(self) -> bool:
         """True if the Alarm Active bit in Fixed I/O (OUT) is set."""
-        return self.fixed_out().alm_a
+        return self.snapshot().alm_a
 
     def present_alarm_code(self) -> int:
-        """Return the present alarm code (0 if offset/size is unset or out of range)."""
-        if self._alarm_off is None:
-            return 0
-        if self._alarm_bytes == 2:
-            if len(self._last) < self._alarm_off + 2: return 0
-            return int.from_bytes(self._last[self._alarm_off:self._alarm_off+2], "little", signed=False)
-        else:
-            if len(self._last) < self._alarm_off + 4: return 0
-            return int.from_bytes(self._last[self._alarm_off:self._alarm_off+4], "little", signed=False)
+        """Return the present alarm code (0 if the map has no alarm field or no input yet)."""
+        return self.snapshot().alarm_code
+
+    def position(self) -> int:
+        """Feedback position of the last packet."""
+        return self.snapshot().position
+
+    def speed(self) -> int:
+        """Feedback speed of the last packet."""
+        return self.snapshot().speed
 
     # === debugging helpers ===
     def last_app(self) -> bytes:
@@ -75,18 +220,11 @@ class ImplicitInputReader:
 
     def fixed_out_offset_bytes(self) -> int:
         """Return the chosen Fixed I/O (OUT) offset (4 or 8)."""
-        return self._fixed_out_offset or 4
+        return self.map.fixed_out or FIXED_OUT_CANDIDATES[0]
 
-    @staticmethod
-    def _auto_pick_offset(b: bytes) -> int:
-        # Prefer an offset that shows any of {IN-POS, MOVE, READY}
-        candidates = [4, 8]
-        mask = (1 << 2) | (1 << 1) | (1 << 5)
-        for off in candidates:
-            if len(b) >= off + 2:
-                val = int.from_bytes(b[off:off+2], "little")
-                if val & mask:
-                    return off
-        return 4
+    _auto_pick_offset = staticmethod(InputMap.detect_fixed_out)
 
-__all__ = ["FixedOutBits", "ImplicitInputReader"]
+__all__ = [
+    "FixedOutBits", "ImplicitInputReader", "InputMap", "InputSnapshot", "FIXED_OUT_CANDIDATES",
+    "SEQ_BSY", "MOVE", "IN_POS", "START_R", "HOME_END", "READY", "DCMD_RDY", "ALM_A",
+]
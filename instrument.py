@@ -0,0 +1,258 @@
+# instrument.py
+"""Instrumentation hook points and a metrics collector.
+
+Components carry an `instr` attribute (None by default, so the hot paths
+pay one attribute test). Attaching an Instrumentation turns on these named
+points, each calling its hooks with a monotonic timestamp first:
+
+    frame_built      (t, app)                 O→T app copied into the frame
+    frame_sent       (t, nbytes, seq)         O→T frame handed to the socket
+    packet_received  (t, nbytes)              T→O datagram read
+    packet_parsed    (t, word, seq)           T→O packet accepted (seq: 0x8002 sequence)
+    state_edge       (t, old_word, new_word)  Fixed I/O (OUT) word changed
+    reconnect        (t, downtime_s, ok)      connection recovered (or gave up)
+    command          (t, fields)              DriverAPI published an O→T edit
+
+MetricsCollector keeps per-axis counters and log-linear (HDR-style)
+histograms of send/receive intervals, command -> first state edge reaction
+latency and reconnect downtime. It exports them as Prometheus text or a
+JSON snapshot on demand:
+
+    mc = MetricsCollector()
+    mc.attach(drv, axis="x")
+    print(mc.prometheus())
+"""
+import threading, time
+from array import array
+from typing import Callable, Dict, Optional
+
+FRAME_BUILT = "frame_built"
+FRAME_SENT = "frame_sent"
+PACKET_RECEIVED = "packet_received"
+PACKET_PARSED = "packet_parsed"
+STATE_EDGE = "state_edge"
+RECONNECT = "reconnect"
+COMMAND = "command"
+HOOK_POINTS = (FRAME_BUILT, FRAME_SENT, PACKET_RECEIVED, PACKET_PARSED, STATE_EDGE, RECONNECT, COMMAND)
+
+class Instrumentation:
+    """Hook registry for one axis; a hook that raises is ignored."""
+
+    def __init__(self, axis: str = ""):
+        self.axis = axis
+        self._hooks: Dict[str, tuple] = {p: () for p in HOOK_POINTS}
+
+    def on(self, point: str, fn: Callable) -> None:
+        if point not in self._hooks:
+            raise ValueError(f"unknown hook point {point!r}")
+        self._hooks[point] = self._hooks[point] + (fn,)
+
+    def off(self, point: str, fn: Callable) -> None:
+        self._hooks[point] = tuple(h for h in self._hooks[point] if h is not fn)
+
+    def emit(self, point: str, *args) -> None:
+        for fn in self._hooks[point]:
+            try:
+                fn(*args)
+            except Exception:
+                pass
+
+# === histogram ===
+class HdrHistogram:
+    """Log-linear histogram of non-negative integers (µs): 2**sub_bits linear
+    sub-buckets per power of two, i.e. ~6% relative precision with the default 4.
+    Recording is O(1) and never allocates."""
+
+    def __init__(self, sub_bits: int = 4, max_value: int = 1 << 36):
+        self.sub_bits = sub_bits
+        self._sub = 1 << sub_bits
+        self._max_value = max_value
+        self._counts = array("q", bytes(8 * self._index(max_value) + 8))
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def _index(self, v: int) -> int:
+        if v < self._sub:
+            return v
+        e = v.bit_length() - self.sub_bits - 1
+        return ((e + 1) << self.sub_bits) + ((v >> e) - self._sub)
+
+    def _lower(self, i: int) -> int:
+        if i < self._sub:
+            return i
+        e = (i >> self.sub_bits) - 1
+        return ((i & (self._sub - 1)) + self._sub) << e
+
+    def record(self, v: int) -> None:
+        v = 0 if v < 0 else (self._max_value if v > self._max_value else int(v))
+        self._counts[self._index(v)] += 1
+        if not self.count or v < self.min:
+            self.min = v
+        if v > self.max:
+            self.max = v
+        self.count += 1
+        self.total += v
+
+    def percentile(self, q: float) -> int:
+        """Lower bound of the bucket holding the q-quantile (0 <= q <= 1)."""
+        if not self.count:
+            return 0
+        target = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for i, c in enumerate(self._counts):
+            if c:
+                seen += c
+                if seen >= target:
+                    return min(self.max, max(self.min, self._lower(i)))
+        return self.max
+
+    def buckets(self):
+        """(bound, count of values <= it) at power-of-two bounds, from the first
+        non-empty one up to the one covering the maximum; for export (Prometheus `le`).
+
+        Counts are per sub-bucket: exact below 2**sub_bits, above that the bucket
+        starting at `bound` is counted whole, so values up to bound * (1 + 2**-sub_bits)
+        may be included (~6% with the default 4)."""
+        out, cum, bound, i = [], 0, 1, 0
+        n = len(self._counts)
+        while cum < self.count and i < n:
+            while i < n and self._lower(i) <= bound:
+                cum += self._counts[i]
+                i += 1
+            if cum:
+                out.append((bound, cum))
+            bound <<= 1
+        return out
+
+    def summary(self) -> dict:
+        return {"count": self.count, "mean": self.total / self.count if self.count else 0.0,
+                "min": self.min, "p50": self.percentile(0.5), "p90": self.percentile(0.9),
+                "p99": self.percentile(0.99), "p999": self.percentile(0.999), "max": self.max}
+
+# === collector ===
+COUNTERS = ("frames_sent", "bytes_sent", "packets_received", "bytes_received", "packets_parsed",
+            "lost", "state_edges", "reconnects", "commands")
+HISTOGRAMS = ("send_interval_us", "rx_interval_us", "reaction_us", "downtime_us")
+
+class _Axis:
+    """Counters + histograms of one axis; its bound methods are the hooks."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.t0 = time.monotonic()
+        self.c = dict.fromkeys(COUNTERS, 0)
+        self.h = {k: HdrHistogram() for k in HISTOGRAMS}
+        self._last_sent = 0.0
+        self._last_rx = 0.0
+        self._last_seq = -1
+        self._cmd_t = 0.0
+
+    def frame_sent(self, t: float, nbytes: int, seq: int) -> None:
+        c = self.c
+        c["frames_sent"] += 1
+        c["bytes_sent"] += nbytes
+        if self._last_sent:
+            self.h["send_interval_us"].record(int((t - self._last_sent) * 1e6))
+        self._last_sent = t
+
+    def packet_received(self, t: float, nbytes: int) -> None:
+        self.c["packets_received"] += 1
+        self.c["bytes_received"] += nbytes
+
+    def packet_parsed(self, t: float, word: int, seq: int) -> None:
+        self.c["packets_parsed"] += 1
+        if self._last_rx:
+            self.h["rx_interval_us"].record(int((t - self._last_rx) * 1e6))
+        self._last_rx = t
+        if seq and self._last_seq >= 0:
+            gap = (seq - self._last_seq) & 0xFFFFFFFF
+            if 1 < gap < 0x80000000:
+                self.c["lost"] += gap - 1
+        self._last_seq = seq
+
+    def state_edge(self, t: float, old: int, new: int) -> None:
+        self.c["state_edges"] += 1
+        if self._cmd_t:
+            # first reaction of the drive to the last command (e.g. START -> MOVE/START-R)
+            self.h["reaction_us"].record(int((t - self._cmd_t) * 1e6))
+            self._cmd_t = 0.0
+
+    def reconnect(self, t: float, downtime_s: float, ok: bool) -> None:
+        self.c["reconnects"] += 1
+        self.h["downtime_us"].record(int(downtime_s * 1e6))
+        self._last_seq = -1             # new connection, new sequence space
+
+    def command(self, t: float, fields: dict) -> None:
+        self.c["commands"] += 1
+        self._cmd_t = t
+
+    def snapshot(self) -> dict:
+        el = max(1e-9, time.monotonic() - self.t0)
+        out = dict(self.c)
+        out["send_rate_hz"] = self.c["frames_sent"] / el
+        out["rx_rate_hz"] = self.c["packets_parsed"] / el
+        seen = self.c["packets_parsed"] + self.c["lost"]
+        out["loss_ratio"] = self.c["lost"] / seen if seen else 0.0
+        out.update({k: v.summary() for k, v in self.h.items()})
+        return out
+
+class MetricsCollector:
+    def __init__(self, prefix: str = "enip"):
+        self.prefix = prefix
+        self._axes: Dict[str, _Axis] = {}
+        self._lock = threading.Lock()
+
+    def instrumentation(self, axis: str) -> Instrumentation:
+        """Instrumentation whose hooks feed this collector under `axis`."""
+        with self._lock:
+            ax = self._axes.setdefault(axis, _Axis(axis))
+        ins = Instrumentation(axis)
+        for p in (FRAME_SENT, PACKET_RECEIVED, PACKET_PARSED, STATE_EDGE, RECONNECT, COMMAND):
+            ins.on(p, getattr(ax, p))
+        return ins
+
+    def attach(self, drv, axis: Optional[str] = None) -> Instrumentation:
+        """Instrument a DriverAPI (its sender, listener and commands)."""
+        ins = self.instrumentation(axis or getattr(drv.tx, "drive_ip", "axis"))
+        drv.set_instrumentation(ins)
+        return ins
+
+    def snapshot(self) -> dict:
+        """{axis: counters, rates, loss ratio and histogram summaries (µs)}."""
+        with self._lock:
+            axes = list(self._axes.values())
+        return {ax.name: ax.snapshot() for ax in axes}
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition (counters, rates, histograms in seconds)."""
+        p = self.prefix
+        with self._lock:
+            axes = list(self._axes.values())
+        lines = []
+        for k in COUNTERS:
+            lines.append(f"# TYPE {p}_{k}_total counter")
+            for ax in axes:
+                lines.append(f'{p}_{k}_total{{axis="{ax.name}"}} {ax.c[k]}')
+        snaps = [ax.snapshot() for ax in axes]
+        for k in ("send_rate_hz", "rx_rate_hz", "loss_ratio"):
+            lines.append(f"# TYPE {p}_{k} gauge")
+            for ax, snap in zip(axes, snaps):
+                lines.append(f'{p}_{k}{{axis="{ax.name}"}} {snap[k]:.6g}')
+        for k in HISTOGRAMS:
+            name = f"{p}_{k[:-3]}_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for ax in axes:
+                h = ax.h[k]
+                for bound, cum in h.buckets():
+                    lines.append(f'{name}_bucket{{axis="{ax.name}",le="{bound / 1e6:.6g}"}} {cum}')
+                lines.append(f'{name}_bucket{{axis="{ax.name}",le="+Inf"}} {h.count}')
+                lines.append(f'{name}_sum{{axis="{ax.name}"}} {h.total / 1e6:.6g}')
+                lines.append(f'{name}_count{{axis="{ax.name}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+__all__ = [
+    "Instrumentation", "MetricsCollector", "HdrHistogram", "HOOK_POINTS",
+    "FRAME_BUILT", "FRAME_SENT", "PACKET_RECEIVED", "PACKET_PARSED", "STATE_EDGE", "RECONNECT", "COMMAND",
+]
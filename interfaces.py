@@ -9,4 +9,13 @@ class Transport(Protocol):
     def close(self) -> None: ...
     def send_app(self, app: bytes, mirror_over_tcp: bool = False) -> None: ...
 
-__all__ = ["InputSource", "Transport"]
+class AsyncTransport(Protocol):
+    async def connect(self) -> None: ...
+    async def close(self) -> None: ...
+    def send_app(self, app: bytes) -> None: ...
+    def update_app(self, app: bytes) -> None: ...
+    def start_cyclic(self, rpi_ms: int = 10, o2t_size: int = 44) -> None: ...
+    def stop_cyclic(self) -> None: ...
+    def get_app(self) -> bytes: ...
+
+__all__ = ["InputSource", "Transport", "AsyncTransport"]
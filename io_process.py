@@ -0,0 +1,415 @@
+# io_process.py
+"""Out-of-process cyclic I/O engine.
+
+ProcessEnipTransport runs EnipSender and its input listener in a child
+process, so the O→T send loop, the T→O receive path and the connection
+watchdog no longer share the GIL with application code (callbacks, GC,
+NumPy work). It exposes the EnipSender surface DriverAPI uses:
+
+    drv = DriverAPI(ip, transport=ProcessEnipTransport(ip, fo_params=...))
+
+Data path, one shared-memory block per drive, seqlock-protected:
+  - O→T image: written by the parent's payload on every publish, copied by
+    the child into each outgoing frame;
+  - T→O image: written by the child for every accepted packet, together with
+    its arrival time, packet count and a stale flag.
+Commands (connect, start/stop, stats, close) go over a multiprocessing Pipe,
+tagged with a request id so a reply that arrives after its command timed
+out is discarded instead of answering the next one;
+the child signals "new packet" / "input stale" by writing a raw byte to a
+second, non-blocking pipe that a parent thread drains and feeds into a passive
+UdpInputListener, so wait_for()/wait_packets() work unchanged. If the
+parent falls behind, notifications coalesce to the newest image. When the
+engine reconnects on its own, it publishes the new ForwardOpen grant in
+the block and the parent picks it up (granted, conn_id) with the next event.
+
+The default start method is "spawn": scripts using this must guard their
+entry point with `if __name__ == "__main__":`.
+"""
+import multiprocessing as mp
+import os, struct, threading, time, weakref
+from multiprocessing import shared_memory
+from typing import Callable, Optional
+from forward_open import ForwardOpenParams, ForwardOpenReply
+from input_listener import UdpInputListener
+from o2t_payload import O2TPayload, O2T_SIZE
+from rt_tuning import RtConfig
+
+# shared block layout: header (o2t seq/len, t2o seq/len/count/rx time, frames sent, flags,
+# grant seq/len + ForwardOpen grant), O→T, T→O
+_O2T_SEQ, _O2T_LEN, _T2O_SEQ, _T2O_LEN, _T2O_COUNT, _T2O_RX, _FRAMES, _FLAGS = 0, 4, 8, 12, 16, 24, 32, 40
+_GRANT_SEQ, _GRANT_LEN, _GRANT = 44, 48, 64
+_U32 = struct.Struct("<I")
+_U64 = struct.Struct("<Q")
+_F64 = struct.Struct("<d")
+_GRANT_REC = struct.Struct("<IIHHIII")  # ForwardOpenReply fields, in order
+HDR_SIZE = 128
+MAX_IMAGE = 512                         # ForwardOpen sizes are 9-bit
+O2T_OFF = HDR_SIZE
+T2O_OFF = HDR_SIZE + MAX_IMAGE
+SHM_SIZE = T2O_OFF + MAX_IMAGE
+FLAG_STALE = 1
+
+EV_PACKET = b"\x01"
+EV_STALE = b"\x02"
+
+def _attach_shm(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)      # 3.13+
+    except TypeError:
+        # older Pythons register it again with the (shared) resource tracker; harmless
+        return shared_memory.SharedMemory(name=name)
+
+# === seqlock helpers (one writer per image) ===
+def _seq_write(buf, seq_off: int, len_off: int, data_off: int, data) -> None:
+    s = _U32.unpack_from(buf, seq_off)[0]
+    _U32.pack_into(buf, seq_off, (s + 1) & 0xFFFFFFFF)     # odd: write in progress
+    n = len(data)
+    buf[data_off:data_off + n] = data
+    _U32.pack_into(buf, len_off, n)
+    _U32.pack_into(buf, seq_off, (s + 2) & 0xFFFFFFFF)
+
+_SEQ_SPINS = 64                 # busy retries before yielding the CPU to the writer
+_SEQ_TIMEOUT_S = 0.005          # give up after this: the writer died or stalls mid-write
+
+def _seq_read(buf, seq_off: int, len_off: int, data_off: int) -> Optional[bytes]:
+    """Consistent copy of the image, or None if no stable read within _SEQ_TIMEOUT_S."""
+    tries = 0
+    end = 0.0
+    while True:
+        s1 = _U32.unpack_from(buf, seq_off)[0]
+        if not s1 & 1:
+            n = _U32.unpack_from(buf, len_off)[0]
+            data = bytes(buf[data_off:data_off + min(n, MAX_IMAGE)])
+            if _U32.unpack_from(buf, seq_off)[0] == s1:
+                return data
+        tries += 1
+        if tries >= _SEQ_SPINS:
+            now = time.monotonic()
+            if not end:
+                end = now + _SEQ_TIMEOUT_S
+            elif now >= end:
+                return None
+            time.sleep(0)
+
+class ShmPayload(O2TPayload):
+    """O2TPayload that mirrors every publish into the shared O→T image."""
+    def __init__(self, buf, size: int = O2T_SIZE):
+        self._shm_buf = buf
+        super().__init__(size)
+        self._mirror()
+
+    def _mirror(self) -> None:
+        _seq_write(self._shm_buf, _O2T_SEQ, _O2T_LEN, O2T_OFF, self._bufs[self._front])
+
+    def _publish(self) -> None:
+        super()._publish()
+        self._mirror()
+
+    def resize(self, size: int) -> None:
+        if size > MAX_IMAGE:
+            raise ValueError(f"O→T size {size} exceeds {MAX_IMAGE}")
+        super().resize(size)
+        with self._wlock:
+            self._mirror()
+
+# === child process ===
+def _engine_main(shm_name: str, conn, ev_conn, drive_ip: str, tcp_port: int, udp_port: int,
+                 fo_params: ForwardOpenParams, fixed_out_offset: Optional[int],
+                 rt: Optional[RtConfig]) -> None:
+    from enip_transport import EnipSender
+    shm = _attach_shm(shm_name)
+    buf = shm.buf
+    ev_fd = ev_conn.fileno()
+    os.set_blocking(ev_fd, False)
+    tx = EnipSender(drive_ip, tcp_port, udp_port, fo_params=fo_params)
+    listener = UdpInputListener(drive_ip, udp_socket=tx.udp_socket(), fixed_out_offset=fixed_out_offset)
+    if rt is not None:
+        tx.rt, listener.rt = rt, rt.for_listener()
+    count = 0
+
+    def notify(ev: bytes) -> None:
+        try:
+            os.write(ev_fd, ev)
+        except (BlockingIOError, OSError):
+            pass        # parent is behind: it reads the newest image anyway
+
+    granted = [None]
+
+    def on_packet(app: bytes, word: int, now: float) -> None:
+        nonlocal count
+        g = tx.granted
+        if g is not granted[0] and g is not None:
+            # first packet of a (re)connect: let the parent see the new connection IDs
+            granted[0] = g
+            _seq_write(buf, _GRANT_SEQ, _GRANT_LEN, _GRANT,
+                       _GRANT_REC.pack(g.o2t_conn_id, g.t2o_conn_id, g.conn_serial & 0xFFFF,
+                                       g.vendor_id & 0xFFFF, g.originator_serial, g.o2t_api_us,
+                                       g.t2o_api_us))
+        count += 1
+        _seq_write(buf, _T2O_SEQ, _T2O_LEN, T2O_OFF, app)
+        _U64.pack_into(buf, _T2O_COUNT, count)
+        _F64.pack_into(buf, _T2O_RX, now)
+        _U32.pack_into(buf, _FLAGS, 0)
+        notify(EV_PACKET)
+
+    def on_stale() -> None:
+        listener.mark_stale()
+        _U32.pack_into(buf, _FLAGS, FLAG_STALE)
+        notify(EV_STALE)
+
+    last_img = [b""]
+
+    def on_cycle(app) -> None:
+        # frames_sent first: a parent that sees it advance knows this copy saw its publish
+        _U64.pack_into(buf, _FRAMES, tx.frames_sent)
+        img = _seq_read(buf, _O2T_SEQ, _O2T_LEN, O2T_OFF)
+        if img is None:
+            img = last_img[0]           # parent stuck mid-publish: resend the last good image
+        else:
+            last_img[0] = img
+        n = min(len(img), len(app))
+        app[:n] = img[:n]
+
+    listener.add_packet_hook(on_packet)
+    tx.attach_input_monitor(listener.last_rx_monotonic, on_stale)
+    tx.set_cycle_hook(on_cycle)
+
+    def handle(cmd: str, kw: dict):
+        if cmd == "connect":
+            tx.connect()
+            listener.start()
+            return tx.granted
+        if cmd == "start_cyclic":
+            tx.start_cyclic(**kw)
+            return None
+        if cmd == "stop_cyclic":
+            tx.stop_cyclic()
+            return None
+        if cmd == "close":
+            tx.stop_cyclic()
+            tx.close()
+            return None
+        if cmd == "stats":
+            return {"cyclic": tx.cyclic_stats(), "link": tx.link_stats(), "input": listener.get_stats(),
+                    "rt": {"cyclic": tx.rt_applied, "listener": listener.rt_applied}}
+        raise ValueError(f"unknown engine command {cmd!r}")
+
+    try:
+        while True:
+            try:
+                rid, cmd, kw = conn.recv()
+            except (EOFError, OSError):
+                break       # parent went away
+            if cmd == "exit":
+                conn.send((rid, "ok", None))
+                break
+            try:
+                conn.send((rid, "ok", handle(cmd, kw)))
+            except Exception as e:
+                conn.send((rid, "err", f"{type(e).__name__}: {e}"))
+    finally:
+        try:
+            tx.stop_cyclic()
+            tx.close()
+        except Exception:
+            pass
+        listener.stop()
+        buf = None
+        try:
+            shm.close()
+        except Exception:
+            pass
+
+def _cleanup(shm: shared_memory.SharedMemory, box: list) -> None:
+    p = box[0]
+    if p is not None and p.is_alive():
+        p.terminate()
+    try:
+        shm.close()
+        shm.unlink()
+    except Exception:
+        pass
+
+# === parent facade ===
+class ProcessEnipTransport:
+    def __init__(self, drive_ip: str, tcp_port: int = 44818, udp_port: int = 2222,
+                 fo_params: Optional[ForwardOpenParams] = None, fixed_out_offset: Optional[int] = None,
+                 start_method: str = "spawn", command_timeout_s: float = 10.0,
+                 rt: Optional[RtConfig] = None):
+        self.drive_ip = drive_ip
+        self.tcp_port = tcp_port
+        self.udp_port = udp_port
+        self.fo_params = fo_params or ForwardOpenParams()
+        self.fixed_out_offset = fixed_out_offset
+        self.command_timeout_s = command_timeout_s
+        self.rt = rt            # applied to the engine's threads (takes effect at the next connect)
+        self.granted: Optional[ForwardOpenReply] = None
+        self.conn_id = 0
+        self.t2o_conn_id = 0
+
+        self._ctx = mp.get_context(start_method)
+        self._shm = shared_memory.SharedMemory(create=True, size=SHM_SIZE)
+        self._buf = self._shm.buf
+        self._buf[:HDR_SIZE] = bytes(HDR_SIZE)
+        self.payload = ShmPayload(self._buf, self.fo_params.o2t_size)
+        self._box = [None]              # current engine process (shared with the finalizer)
+        self._conn = None
+        self._cmd_lock = threading.Lock()
+        self._rid = 0                   # id of the last command sent to the engine
+        self._ev_r = None
+        self._ev_thread: Optional[threading.Thread] = None
+        self._listener = UdpInputListener(drive_ip, passive=True, fixed_out_offset=fixed_out_offset)
+        self._finalizer = weakref.finalize(self, _cleanup, self._shm, self._box)
+
+    @property
+    def _proc(self):
+        return self._box[0]
+
+    # === engine lifecycle ===
+    def _spawn(self) -> None:
+        if self._proc is not None and self._proc.is_alive():
+            return
+        parent, child = self._ctx.Pipe()
+        ev_r, ev_w = self._ctx.Pipe(duplex=False)     # carries raw event bytes, not pickles
+        p = self._ctx.Process(
+            target=_engine_main, name=f"enip-io-{self.drive_ip}", daemon=True,
+            args=(self._shm.name, child, ev_w, self.drive_ip, self.tcp_port, self.udp_port,
+                  self.fo_params, self.fixed_out_offset, self.rt))
+        p.start()
+        self._box[0] = p
+        child.close()
+        ev_w.close()
+        self._conn = parent
+        self._ev_r = ev_r
+        self._ev_thread = threading.Thread(target=self._events, args=(ev_r,),
+                                           name="enip-proc-input", daemon=True)
+        self._ev_thread.start()
+
+    def _call(self, cmd: str, **kw):
+        with self._cmd_lock:
+            if self._conn is None:
+                raise RuntimeError("I/O engine not running")
+            self._rid = rid = (self._rid + 1) & 0xFFFFFFFF
+            self._conn.send((rid, cmd, kw))
+            end = time.monotonic() + self.command_timeout_s
+            while True:
+                rem = end - time.monotonic()
+                if rem <= 0 or not self._conn.poll(rem):
+                    raise RuntimeError(f"I/O engine did not answer {cmd!r}")
+                got, status, res = self._conn.recv()
+                if got == rid:
+                    break       # else: the late reply to a command that already timed out
+        if status != "ok":
+            raise RuntimeError(f"I/O engine {cmd!r} failed: {res}")
+        return res
+
+    def _events(self, ev_conn) -> None:
+        buf = self._buf
+        fd = ev_conn.fileno()
+        seen = 0
+        grant_seq = _U32.unpack_from(buf, _GRANT_SEQ)[0]
+        while True:
+            try:
+                ev = os.read(fd, 4096)
+            except OSError:
+                break
+            if not ev:
+                break       # engine exited
+            if EV_STALE in ev and _U32.unpack_from(buf, _FLAGS)[0] & FLAG_STALE:
+                self._listener.mark_stale()
+            gs = _U32.unpack_from(buf, _GRANT_SEQ)[0]
+            if gs != grant_seq:
+                rec = _seq_read(buf, _GRANT_SEQ, _GRANT_LEN, _GRANT)
+                if rec is not None and len(rec) == _GRANT_REC.size:
+                    grant_seq = gs
+                    self._set_granted(ForwardOpenReply(*_GRANT_REC.unpack(rec)))
+            n = _U64.unpack_from(buf, _T2O_COUNT)[0]
+            if n != seen and not _U32.unpack_from(buf, _FLAGS)[0] & FLAG_STALE:
+                rx = _F64.unpack_from(buf, _T2O_RX)[0]
+                img = _seq_read(buf, _T2O_SEQ, _T2O_LEN, T2O_OFF)
+                if img is not None:     # else the engine died mid-write; keep the last image
+                    seen = n
+                    self._listener.feed_app(img, rx)
+        ev_conn.close()
+
+    # === EnipSender surface ===
+    def connect(self) -> None:
+        self._spawn()
+        self._set_granted(self._call("connect"))
+
+    def _set_granted(self, g: ForwardOpenReply) -> None:
+        self.granted = g
+        self.conn_id, self.t2o_conn_id = g.o2t_conn_id, g.t2o_conn_id
+
+    def start_cyclic(self, rpi_ms: int = 10, mirror_over_tcp: bool = False, o2t_size: int = 44,
+                     miss_policy: str = "skip", spin_us: int = 0) -> None:
+        if o2t_size != self.payload.size:
+            self.payload.resize(o2t_size)
+        self._call("start_cyclic", rpi_ms=rpi_ms, mirror_over_tcp=mirror_over_tcp, o2t_size=o2t_size,
+                   miss_policy=miss_policy, spin_us=spin_us)
+
+    def stop_cyclic(self, join_timeout: float = 2.0) -> None:
+        if self._proc is not None and self._proc.is_alive():
+            self._call("stop_cyclic")
+
+    def close(self) -> None:
+        """ForwardClose, then stop the engine process (connect() starts a new one)."""
+        p, self._box[0] = self._proc, None
+        if p is not None and p.is_alive():
+            try:
+                self._call("close")
+                self._call("exit")
+            except Exception:
+                pass
+            p.join(timeout=2.0)
+            if p.is_alive():
+                p.terminate()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        self.conn_id = 0
+        self.t2o_conn_id = 0
+
+    def shutdown(self) -> None:
+        """close() and release the shared-memory block; the transport is unusable afterwards."""
+        self.close()
+        self._buf = None
+        self.payload._shm_buf = None
+        self._finalizer()
+
+    def update_app(self, app: bytes) -> None:
+        self.payload.load(app)
+
+    def input_listener(self) -> UdpInputListener:
+        """Passive listener fed from the shared T→O image (DriverAPI uses it as its listener)."""
+        return self._listener
+
+    def attach_input_monitor(self, last_rx: Callable[[], float], on_stale: Callable[[], None]) -> None:
+        """No-op: the connection watchdog runs inside the engine process."""
+
+    @property
+    def frames_sent(self) -> int:
+        return _U64.unpack_from(self._buf, _FRAMES)[0]
+
+    @property
+    def input_period_s(self) -> float:
+        if self.granted and self.granted.t2o_api_us:
+            return self.granted.t2o_api_us / 1e6
+        return self.fo_params.t2o_rpi_us / 1e6
+
+    @property
+    def input_timeout_s(self) -> float:
+        return self.fo_params.timeout_factor * self.input_period_s
+
+    def engine_stats(self) -> dict:
+        """Cyclic, link and input stats as measured inside the engine process."""
+        return self._call("stats")
+
+    def cyclic_stats(self) -> dict:
+        return self.engine_stats()["cyclic"]
+
+    def link_stats(self) -> dict:
+        return self.engine_stats()["link"]
+
+__all__ = ["ProcessEnipTransport", "ShmPayload"]
@@ -0,0 +1,312 @@
+# motion_sequence.py
+"""Declarative motion sequences evaluated packet by packet.
+
+A Sequence is a list of steps (Op, Dwell, Jog, Stop, AlarmReset, OnAlarm,
+Goto). SequenceRunner advances it from the input listener's receive
+thread: every transition is decided on the T→O packet that satisfies it,
+and the resulting O→T edits are published to the payload for the next
+cyclic frame, so there is no Python-side polling or sleep between steps.
+
+Lookahead publishes the next Op's operation select while a Dwell holds
+or a Jog decelerates, so when that step ends START goes out on the next
+frame with no separate select frame. Between two Ops (or after Stop and
+AlarmReset) there is nothing to save: START must be seen low for a frame
+before it rises again, and that frame already carries the next select.
+
+    seq = Sequence([Op(2), Dwell(5, stop=True), Op(1)])
+    result = drv.Run_Sequence(seq)
+    for t in result.steps: print(t.kind, t.duration_s)
+"""
+import threading, time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from input_reader import IN_POS, MOVE, ALM_A
+from o2t_payload import O2TPayload, IN_START, IN_STOP, IN_FW_JOG, IN_ALM_RST
+
+# === steps ===
+@dataclass
+class Op:
+    """Select stored operation n (1..256), START, wait for IN-POS."""
+    n: int
+    timeout_s: float = 10.0
+    label: Optional[str] = None
+
+@dataclass
+class Dwell:
+    """Hold for `seconds` with START released (stop=True asserts STOP)."""
+    seconds: float
+    stop: bool = False
+    label: Optional[str] = None
+
+@dataclass
+class Jog:
+    """FW-JOG for `seconds`, then release and wait up to `decel_timeout_s` for MOVE to clear."""
+    seconds: float
+    decel_timeout_s: float = 1.0
+    label: Optional[str] = None
+
+@dataclass
+class Stop:
+    """Assert STOP until MOVE is clear."""
+    timeout_s: float = 1.0
+    label: Optional[str] = None
+
+@dataclass
+class AlarmReset:
+    """Pulse ALM-RST until the alarm bit clears."""
+    timeout_s: float = 1.0
+    label: Optional[str] = None
+
+@dataclass
+class OnAlarm:
+    """Jump to `goto` if the alarm bit is set now, else fall through."""
+    goto: str
+    label: Optional[str] = None
+
+@dataclass
+class Goto:
+    """Jump to `target`; with `times`, only that many times, then fall through."""
+    target: str
+    times: Optional[int] = None
+    label: Optional[str] = None
+
+@dataclass
+class Sequence:
+    steps: List[object]
+    on_alarm: Optional[str] = None      # label to jump to when ALM-A appears during Op/Jog; None aborts
+
+    def __post_init__(self):
+        if not self.steps:
+            raise ValueError("sequence has no steps")
+        self.labels: Dict[str, int] = {}
+        for i, st in enumerate(self.steps):
+            if st.label:
+                if st.label in self.labels:
+                    raise ValueError(f"duplicate step label {st.label!r}")
+                self.labels[st.label] = i
+            if isinstance(st, Op) and not 1 <= int(st.n) <= 256:
+                raise ValueError("operation number must be 1..256")
+        for st in self.steps:
+            tgt = st.goto if isinstance(st, OnAlarm) else st.target if isinstance(st, Goto) else None
+            if tgt is not None and tgt not in self.labels:
+                raise ValueError(f"unknown step label {tgt!r}")
+        if self.on_alarm is not None and self.on_alarm not in self.labels:
+            raise ValueError(f"unknown step label {self.on_alarm!r}")
+
+# === results ===
+@dataclass
+class StepTiming:
+    index: int
+    kind: str
+    label: Optional[str]
+    start_s: float          # relative to the sequence start
+    duration_s: float
+    outcome: str            # "ok", "timeout", "alarm", "jump", "cancelled"
+
+@dataclass
+class SequenceResult:
+    ok: bool
+    reason: str
+    total_s: float
+    steps: List[StepTiming] = field(default_factory=list)
+
+# === runner ===
+class SequenceRunner:
+    """Runs a Sequence from per-packet callbacks (see UdpInputListener.add_packet_hook).
+
+    `frames_sent()` must return a counter the sender bumps before copying the
+    payload into each frame; it is used to make sure an edit has gone out
+    (e.g. START low) before the next edge is published.
+    """
+    MAX_TRANSITIONS = 256       # per packet; guards Goto loops with no waiting step
+
+    def __init__(self, seq: Sequence, payload: O2TPayload, frames_sent: Callable[[], int],
+                 period_s: float, lookahead: bool = True):
+        self.seq = seq
+        self.payload = payload
+        self._frames = frames_sent
+        self.period_s = period_s
+        self.lookahead = lookahead
+        self.result: Optional[SequenceResult] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()     # packet hook vs. cancel(); uncontended per packet
+
+        self._i = -1
+        self._phase = ""
+        self._t0 = 0.0
+        self._step_t = 0.0
+        self._phase_t = 0.0
+        self._pub_frame = 0
+        self._goto_left: Dict[int, int] = {}
+        self._timings: List[StepTiming] = []
+
+    # --- control ---
+    def start(self) -> None:
+        self._t0 = time.monotonic()
+        self._enter(0, self._t0)
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """End the sequence now (from any thread); the current step is marked cancelled."""
+        with self._lock:
+            if not self._done.is_set():
+                now = time.monotonic()
+                self._end_step(now, "cancelled")
+                self._finish(False, reason, now)
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    # --- packet hook ---
+    def on_packet(self, app: bytes, word: int, now: float) -> None:
+        with self._lock:
+            if self._done.is_set():
+                return
+            for _ in range(self.MAX_TRANSITIONS):
+                out = self._poll(self.seq.steps[self._i], word, now)
+                if out is None:
+                    return
+                if not self._transition(out, word, now):
+                    return
+            self._finish(False, "too many transitions in one packet (Goto loop?)", now)
+
+    # --- internals ---
+    def _publish(self, **fields) -> None:
+        self.payload.update(**fields)
+        self._pub_frame = self._frames()
+
+    def _sent(self) -> bool:
+        """True once a frame carrying the last publish has been sent."""
+        return self._frames() > self._pub_frame
+
+    def _next_select(self, i: int) -> Optional[int]:
+        if self.lookahead and i + 1 < len(self.seq.steps):
+            nxt = self.seq.steps[i + 1]
+            if isinstance(nxt, Op):
+                return int(nxt.n) - 1
+        return None
+
+    def _enter(self, i: int, now: float) -> None:
+        self._i = i
+        self._step_t = self._phase_t = now
+        st = self.seq.steps[i]
+        if isinstance(st, Op):
+            sel = int(st.n) - 1
+            if self.payload.op_select == sel and not self.payload.fixed_in and self._sent():
+                self._phase = "start"       # preloaded by lookahead and already on the wire
+            else:
+                self._publish(op_select=sel, fixed_in=0)
+                self._phase = "select"
+        elif isinstance(st, Dwell):
+            self._publish(fixed_in=IN_STOP if st.stop else 0, **self._select_kw(i))
+            self._phase = "dwell"
+        elif isinstance(st, Jog):
+            self._publish(fixed_in=IN_FW_JOG)
+            self._phase = "jog"
+        elif isinstance(st, Stop):
+            self._publish(fixed_in=IN_STOP)
+            self._phase = "stop"
+        elif isinstance(st, AlarmReset):
+            self._publish(fixed_in=IN_ALM_RST)
+            self._phase = "reset"
+        else:
+            self._phase = "instant"
+
+    def _select_kw(self, i: int) -> dict:
+        sel = self._next_select(i)
+        return {} if sel is None else {"op_select": sel}
+
+    def _poll(self, st, word: int, now: float) -> Optional[str]:
+        """Advance the current step on this packet; returns its outcome once it ends."""
+        if isinstance(st, (Op, Jog)) and word & ALM_A:
+            return "alarm"
+        ph = self._phase
+        if isinstance(st, Op):
+            if ph == "select":
+                if not self._sent():
+                    return None
+                ph = "start"
+            if ph == "start":
+                self._publish(fixed_in=IN_START)
+                self._phase, self._phase_t = "accept", now
+                return None
+            if now - self._step_t > st.timeout_s:
+                return "timeout"
+            if ph == "accept":
+                # IN-POS drops once motion begins; short moves may finish before we see it
+                if word & IN_POS and now - self._phase_t < 3 * self.period_s:
+                    return None
+                self._phase = "run"
+            if word & IN_POS and not word & MOVE:
+                self._publish(fixed_in=0, **self._select_kw(self._i))
+                return "ok"
+            return None
+        if isinstance(st, Dwell):
+            return "ok" if now - self._step_t >= st.seconds else None
+        if isinstance(st, Jog):
+            if ph == "jog":
+                if now - self._step_t < st.seconds:
+                    return None
+                self._publish(fixed_in=0, **self._select_kw(self._i))
+                self._phase, self._phase_t = "decel", now
+                return None
+            if self._sent() and not word & MOVE:
+                return "ok"
+            return "timeout" if now - self._phase_t > st.decel_timeout_s else None
+        if isinstance(st, Stop):
+            if self._sent() and not word & MOVE:
+                self._publish(fixed_in=0, **self._select_kw(self._i))
+                return "ok"
+            return "timeout" if now - self._step_t > st.timeout_s else None
+        if isinstance(st, AlarmReset):
+            if self._sent() and not word & ALM_A:
+                self._publish(fixed_in=0, **self._select_kw(self._i))
+                return "ok"
+            return "timeout" if now - self._step_t > st.timeout_s else None
+        if isinstance(st, OnAlarm):
+            return "jump" if word & ALM_A else "ok"
+        if isinstance(st, Goto):
+            left = self._goto_left.get(self._i, st.times)
+            if left is None or left > 0:
+                if left is not None:
+                    self._goto_left[self._i] = left - 1
+                return "jump"
+            self._goto_left.pop(self._i, None)      # re-arm for an enclosing loop
+            return "ok"
+        raise TypeError(f"unknown step type {type(st).__name__}")
+
+    def _end_step(self, now: float, outcome: str) -> None:
+        st = self.seq.steps[self._i]
+        self._timings.append(StepTiming(self._i, type(st).__name__, st.label,
+                                        self._step_t - self._t0, now - self._step_t, outcome))
+
+    def _transition(self, outcome: str, word: int, now: float) -> bool:
+        """Record the step and move on; False when the sequence is over."""
+        st = self.seq.steps[self._i]
+        self._end_step(now, outcome)
+        if outcome == "jump":
+            nxt = self.seq.labels[st.goto if isinstance(st, OnAlarm) else st.target]
+        elif outcome == "alarm" and self.seq.on_alarm is not None:
+            nxt = self.seq.labels[self.seq.on_alarm]
+        elif outcome != "ok":
+            self._finish(False, f"{outcome} in step {self._i} ({type(st).__name__})", now)
+            return False
+        else:
+            nxt = self._i + 1
+        if nxt >= len(self.seq.steps):
+            self._finish(True, "completed", now)
+            return False
+        self._enter(nxt, now)
+        return True
+
+    def _finish(self, ok: bool, reason: str, now: float) -> None:
+        self.result = SequenceResult(ok, reason, now - self._t0, self._timings)
+        self._done.set()
+
+__all__ = [
+    "Sequence", "SequenceRunner", "SequenceResult", "StepTiming",
+    "Op", "Dwell", "Jog", "Stop", "AlarmReset", "OnAlarm", "Goto",
+]
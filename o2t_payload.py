@@ -0,0 +1,174 @@
+# o2t_payload.py
+"""Structured O→T payload (scanner → drive output image).
+
+Replaces the hand-written 44-byte frames in types_hex with named fields:
+
+  0..3   run/idle header (0x00000001 = run)
+  6..7   operation select, M0-M7 (stored operation number 0..255)
+  8..9   Fixed I/O (IN) bits: FW-JOG, START, STOP, FREE, ALM-RST, ...
+  12..27 direct-data 32-bit words: position, speed, accel, decel
+  28..43 direct-data 16-bit words: trigger, ...
+
+Writers edit a back buffer and publish it by flipping an index (double
+buffer); the cyclic sender copies the front buffer without taking a lock
+and retries only if two publishes raced its copy.
+"""
+import struct, threading, time
+from typing import Callable, Dict, Optional, Tuple
+
+O2T_SIZE = 44
+RUN_HEADER = 0x00000001
+
+OP_SELECT_OFF = 6
+FIXED_IN_OFF = 8
+
+# Fixed I/O (IN) bit masks
+IN_FW_JOG  = 1 << 0
+IN_START   = 1 << 3
+IN_STOP    = 1 << 5
+IN_FREE    = 1 << 6
+IN_ALM_RST = 1 << 7
+
+# direct-data fields: name -> (struct, offset); 32-bit words from 12, 16-bit words from 28
+DD_FIELDS: Dict[str, Tuple[struct.Struct, int]] = {
+    "position": (struct.Struct("<i"), 12),
+    "speed":    (struct.Struct("<i"), 16),
+    "accel":    (struct.Struct("<i"), 20),
+    "decel":    (struct.Struct("<i"), 24),
+    "trigger":  (struct.Struct("<H"), 28),
+}
+DD32_OFF, DD32_COUNT = 12, 4
+DD16_OFF, DD16_COUNT = 28, 8
+
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_I32 = struct.Struct("<i")
+
+class O2TPayload:
+    def __init__(self, size: int = O2T_SIZE, app: Optional[bytes] = None):
+        self._wlock = threading.Lock()
+        self._gen = 0
+        self.published_at = 0.0         # monotonic time of the last publish (command latency)
+        self.on_publish: Optional[Callable[[], None]] = None   # e.g. wake the sender for an immediate send
+        self._front = 0
+        self._alloc(size)
+        if app is None:
+            _U32.pack_into(self._bufs[0], 0, RUN_HEADER)
+        else:
+            self._bufs[0][:] = self._fit(app)
+
+    def _alloc(self, size: int) -> None:
+        self.size = max(0, int(size))
+        self._bufs = (bytearray(self.size), bytearray(self.size))
+
+    def _fit(self, app: bytes) -> bytes:
+        return bytes(app[:self.size]).ljust(self.size, b"\x00")
+
+    # === reader side (cyclic sender, lock-free) ===
+    def copy_into(self, dst) -> None:
+        """Copy the published image into `dst` (same size, e.g. IoFrame.app)."""
+        while True:
+            g = self._gen
+            dst[:] = self._bufs[self._front]
+            # each publish is two steps (edit, flip): finishing the edit in progress
+            # (or one whole publish) is harmless; the next edit reuses our buffer
+            if self._gen - (g | 1) < 2:
+                return
+
+    def snapshot(self) -> bytes:
+        """Return the published image as bytes."""
+        buf = bytearray(self.size)
+        self.copy_into(buf)
+        return bytes(buf)
+
+    # === writer side ===
+    def _edit(self):
+        """Start an edit: returns the back buffer pre-filled with the current image."""
+        self._gen += 1                  # odd: a back buffer is being written
+        front = self._bufs[self._front]
+        back = self._bufs[1 - self._front]
+        back[:] = front
+        return back
+
+    def _publish(self) -> None:
+        self._front = 1 - self._front
+        self.published_at = time.monotonic()
+        self._gen += 1
+        cb = self.on_publish
+        if cb is not None:
+            cb()
+
+    def update(self, op_select: Optional[int] = None, fixed_in: Optional[int] = None,
+               set_bits: int = 0, clear_bits: int = 0, **direct_data: int) -> None:
+        """Apply several field changes atomically (all land in the same frame).
+
+        fixed_in replaces the whole Fixed I/O (IN) word; set_bits/clear_bits edit it.
+        direct_data: any of DD_FIELDS (position, speed, accel, decel, trigger).
+        """
+        for name in direct_data:
+            if name not in DD_FIELDS:
+                raise ValueError(f"unknown direct-data field {name!r}")
+        if op_select is not None and not 0 <= op_select <= 0xFF:
+            raise ValueError("op_select must be 0..255 (M0-M7)")
+        with self._wlock:
+            b = self._edit()
+            if op_select is not None:
+                b[OP_SELECT_OFF] = op_select
+            if fixed_in is not None or set_bits or clear_bits:
+                w = _U16.unpack_from(b, FIXED_IN_OFF)[0] if fixed_in is None else fixed_in
+                _U16.pack_into(b, FIXED_IN_OFF, ((w | set_bits) & ~clear_bits) & 0xFFFF)
+            for name, v in direct_data.items():
+                st, off = DD_FIELDS[name]
+                st.pack_into(b, off, v)
+            self._publish()
+
+    def load(self, app: bytes) -> None:
+        """Replace the whole image (zero-padded/truncated to size)."""
+        with self._wlock:
+            b = self._edit()
+            b[:] = self._fit(app or b"")
+            self._publish()
+
+    def resize(self, size: int) -> None:
+        with self._wlock:
+            cur = bytes(self._bufs[self._front])
+            self._gen += 1
+            self._alloc(size)
+            self._front = 0
+            self._bufs[0][:] = self._fit(cur)
+            self._gen += 1
+
+    def set_dd32(self, index: int, value: int) -> None:
+        if not 0 <= index < DD32_COUNT: raise IndexError(index)
+        with self._wlock:
+            _I32.pack_into(self._edit(), DD32_OFF + 4 * index, value)
+            self._publish()
+
+    def set_dd16(self, index: int, value: int) -> None:
+        if not 0 <= index < DD16_COUNT: raise IndexError(index)
+        with self._wlock:
+            _U16.pack_into(self._edit(), DD16_OFF + 2 * index, value & 0xFFFF)
+            self._publish()
+
+    # === read-back of the published image ===
+    @property
+    def generation(self) -> int:
+        """Changes on every publish (odd while an edit is in progress)."""
+        return self._gen
+
+    @property
+    def op_select(self) -> int:
+        return self._bufs[self._front][OP_SELECT_OFF]
+
+    @property
+    def fixed_in(self) -> int:
+        return _U16.unpack_from(self._bufs[self._front], FIXED_IN_OFF)[0]
+
+    def get(self, name: str) -> int:
+        st, off = DD_FIELDS[name]
+        return st.unpack_from(self._bufs[self._front], off)[0]
+
+__all__ = [
+    "O2TPayload", "O2T_SIZE", "DD_FIELDS", "OP_SELECT_OFF", "FIXED_IN_OFF",
+    "IN_FW_JOG", "IN_START", "IN_STOP", "IN_FREE", "IN_ALM_RST",
+]
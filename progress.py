@@ -0,0 +1,122 @@
+# progress.py
+"""Progress callback plumbing for DriverAPI.
+
+Callbacks receive one reusable ProgressSnapshot per DriverAPI. Its fields
+are computed only when read (app_hex, elapsed_s, ts, ...), and it supports
+the dict-style access older callbacks use (snap["in_pos"], snap.get(...)).
+The object is refilled on the next emit: call to_dict() to keep a copy.
+
+progress_filter() wraps a callback so it fires only when selected Fixed
+I/O (OUT) bits change and/or once per `min_interval_s`.
+"""
+import time
+from typing import Callable, Optional
+from input_reader import InputSnapshot
+
+KEYS = ("ts", "elapsed_s", "remaining_s", "fixed_out_offset", "fixed_out_raw", "in_pos", "move",
+        "ready", "alarm_code", "position", "speed", "app_len", "app_hex", "started")
+
+class ProgressSnapshot:
+    __slots__ = ("_app", "_in", "fixed_out_offset", "started", "mono", "_wall", "_t0", "_deadline")
+
+    def __init__(self):
+        self.fill(b"", InputSnapshot(), 0, False, 0.0, None, None)
+
+    def fill(self, app: bytes, snap: InputSnapshot, off: int, started: bool, mono: float,
+             t0: Optional[float], deadline: Optional[float]) -> "ProgressSnapshot":
+        self._app = app
+        self._in = snap
+        self.fixed_out_offset = off
+        self.started = started
+        self.mono = mono
+        self._wall = time.time()    # `ts` stays real wall time even if the clock is stepped
+        self._t0 = t0
+        self._deadline = deadline
+        return self
+
+    # --- cheap fields (already decoded, see ImplicitInputReader.snapshot) ---
+    fixed_out_raw = property(lambda self: self._in.raw)
+    in_pos        = property(lambda self: self._in.in_pos)
+    move          = property(lambda self: self._in.move)
+    ready         = property(lambda self: self._in.ready)
+    alarm_code    = property(lambda self: self._in.alarm_code)
+    position      = property(lambda self: self._in.position)
+    speed         = property(lambda self: self._in.speed)
+    app_len       = property(lambda self: len(self._app))
+
+    # --- computed on access ---
+    @property
+    def ts(self) -> float:
+        """Wall-clock time of the emit; use `mono` for intervals."""
+        return self._wall
+
+    @property
+    def elapsed_s(self) -> Optional[float]:
+        return (self.mono - self._t0) if self._t0 is not None else None
+
+    @property
+    def remaining_s(self) -> Optional[float]:
+        return (self._deadline - self.mono) if self._deadline is not None else None
+
+    @property
+    def app_hex(self) -> str:
+        return self._app.hex()
+
+    @property
+    def app(self) -> bytes:
+        return self._app
+
+    # --- dict compatibility ---
+    def __getitem__(self, key: str):
+        if key not in KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in KEYS else default
+
+    def __contains__(self, key: str) -> bool:
+        return key in KEYS
+
+    def keys(self):
+        return KEYS
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in KEYS}
+
+    def __repr__(self) -> str:
+        return f"ProgressSnapshot(raw=0x{self.fixed_out_raw:04X}, started={self.started}, mono={self.mono:.6f})"
+
+class ProgressFilter:
+    """Callable wrapper: forwards a snapshot when `bits` change or `min_interval_s` has passed."""
+    __slots__ = ("cb", "bits", "min_interval_s", "_last_bits", "_last_t")
+
+    def __init__(self, cb: Callable[[ProgressSnapshot], None], bits: int = 0, min_interval_s: float = 0.0):
+        self.cb = cb
+        self.bits = int(bits)
+        self.min_interval_s = max(0.0, float(min_interval_s))
+        self._last_bits = -1
+        self._last_t = float("-inf")
+
+    def __call__(self, snap: ProgressSnapshot) -> None:
+        fire = not (self.bits or self.min_interval_s)
+        if self.bits:
+            b = snap.fixed_out_raw & self.bits
+            if b != self._last_bits:
+                self._last_bits = b
+                fire = True
+        if self.min_interval_s and snap.mono - self._last_t >= self.min_interval_s:
+            fire = True
+        if fire:
+            self._last_t = snap.mono
+            self.cb(snap)
+
+def progress_filter(cb: Callable[[ProgressSnapshot], None], bits: int = 0,
+                    min_interval_s: float = 0.0) -> ProgressFilter:
+    """Fire `cb` when any of `bits` (e.g. IN_POS | MOVE) changes, and/or once every
+    `min_interval_s` (with bits too, this is a heartbeat between changes).
+    With neither set, every emit is forwarded.
+    """
+    return ProgressFilter(cb, bits, min_interval_s)
+
+__all__ = ["ProgressSnapshot", "ProgressFilter", "progress_filter"]
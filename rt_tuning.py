@@ -0,0 +1,222 @@
+# rt_tuning.py
+"""Real-time knobs for the I/O threads (Linux; degrades to no-ops elsewhere).
+
+RtConfig describes CPU pinning, scheduling policy/priority, the GIL switch
+interval and GC handling.
+apply_thread() applies the per-thread part to the *calling* thread;
+EnipSender, the input listener and the DriveGroup loop call it when their
+thread starts, and record what actually took effect (e.g. SCHED_FIFO needs
+CAP_SYS_NICE or an rtprio limit; without it the policy falls back to the
+default one).
+
+The GIL switch interval is interpreter-wide, so apply_thread() leaves it
+alone: the application sets it once with set_switch_interval(), which
+returns the previous value for restoring.
+
+GcGuard freezes or defers the cyclic garbage collector while a move is
+active, so a collection in the host app cannot stall the I/O threads.
+
+jitter_report() runs the cyclic scheduler under each configuration (with
+an optional GIL/allocation load) and tabulates lateness, to show the effect
+of a configuration before rolling it out:
+
+    python rt_tuning.py --period-ms 2 --seconds 3 --cpus 1
+"""
+import gc, os, sys, threading, time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from cyclic_scheduler import DeadlineScheduler
+
+POLICIES = {
+    "other": getattr(os, "SCHED_OTHER", None),
+    "fifo": getattr(os, "SCHED_FIFO", None),
+    "rr": getattr(os, "SCHED_RR", None),
+}
+GC_MODES = (None, "defer", "freeze")
+
+@dataclass
+class RtConfig:
+    cpus: Optional[Tuple[int, ...]] = None              # cyclic sender / group loop thread
+    listener_cpus: Optional[Tuple[int, ...]] = None     # input thread (None: same as cpus)
+    policy: str = "other"                               # "other", "fifo" or "rr"
+    priority: int = 50                                  # 1..99 for fifo/rr
+    gc_mode: Optional[str] = None                       # None, "defer" (disable during moves) or "freeze"
+    switch_interval_s: Optional[float] = None           # GIL hand-off interval (process-wide, see set_switch_interval)
+
+    def __post_init__(self):
+        if self.policy not in POLICIES:
+            raise ValueError("policy must be 'other', 'fifo' or 'rr'")
+        if self.gc_mode not in GC_MODES:
+            raise ValueError("gc_mode must be None, 'defer' or 'freeze'")
+
+    def for_listener(self) -> "RtConfig":
+        if self.listener_cpus is None:
+            return self
+        return RtConfig(self.listener_cpus, None, self.policy, self.priority, self.gc_mode,
+                        self.switch_interval_s)
+
+def set_switch_interval(seconds: Optional[float]) -> float:
+    """Set the interpreter-wide GIL switch interval; returns the previous one.
+
+    A busy host thread holds the GIL for up to this long before an I/O thread
+    gets it. None leaves it unchanged. This is process state: call it once at
+    start-up (or restore the returned value), not from a per-thread config.
+    """
+    prev = sys.getswitchinterval()
+    if seconds is not None:
+        sys.setswitchinterval(seconds)
+    return prev
+
+def apply_thread(cfg: Optional[RtConfig]) -> dict:
+    """Apply `cfg` to the calling thread; returns what took effect (errors as strings).
+
+    Only thread-scoped settings are applied; switch_interval_s is not (see
+    set_switch_interval).
+    """
+    res = {"affinity": None, "policy": "other"}
+    if cfg is None:
+        return res
+    if cfg.cpus is not None:
+        try:
+            os.sched_setaffinity(0, set(cfg.cpus))      # pid 0: this thread on Linux
+            res["affinity"] = sorted(os.sched_getaffinity(0))
+        except (AttributeError, OSError, ValueError) as e:
+            res["affinity"] = f"unavailable: {type(e).__name__}: {e}"
+    if cfg.policy != "other":
+        pol = POLICIES[cfg.policy]
+        try:
+            if pol is None:
+                raise AttributeError("scheduling policies not supported on this platform")
+            prio = max(os.sched_get_priority_min(pol), min(os.sched_get_priority_max(pol), cfg.priority))
+            os.sched_setscheduler(0, pol, os.sched_param(prio))
+            res["policy"] = f"{cfg.policy}:{prio}"
+        except (AttributeError, OSError) as e:
+            res["policy"] = f"other (fallback: {type(e).__name__}: {e})"
+    return res
+
+class GcGuard:
+    """Context manager: defer (disable) or freeze the cyclic GC while moves run.
+
+    Nesting-safe across threads and axes: the collector is restored when the
+    last active move ends. "freeze" moves existing objects to the permanent
+    generation first, so the collections that still happen are cheap.
+    """
+    _lock = threading.Lock()
+    _active = 0
+    _mode: Optional[str] = None       # mode of the outermost active guard
+    _was_enabled = True
+
+    def __init__(self, mode: Optional[str]):
+        if mode not in GC_MODES:
+            raise ValueError("gc_mode must be None, 'defer' or 'freeze'")
+        self.mode = mode
+
+    def __enter__(self) -> "GcGuard":
+        if self.mode is None:
+            return self
+        cls = GcGuard
+        with cls._lock:
+            if cls._active == 0:
+                cls._mode = self.mode
+                cls._was_enabled = gc.isenabled()
+                if self.mode == "freeze":
+                    gc.freeze()
+                else:
+                    gc.disable()
+            cls._active += 1
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.mode is None:
+            return
+        cls = GcGuard
+        with cls._lock:
+            cls._active -= 1
+            if cls._active == 0:
+                if cls._mode == "freeze":
+                    gc.unfreeze()
+                elif cls._was_enabled:
+                    gc.enable()
+
+# === jitter report ===
+def _load(stop: threading.Event) -> None:
+    # host-app stand-in: pure-Python work plus cyclic garbage for the collector
+    while not stop.is_set():
+        junk = []
+        for i in range(2000):
+            a = [i]; a.append(a); junk.append(a)
+        del junk
+
+def measure_jitter(cfg: Optional[RtConfig], period_s: float = 0.002, duration_s: float = 2.0,
+                   load: bool = True) -> dict:
+    """Run a DeadlineScheduler thread configured like the cyclic sender; returns its stats."""
+    sched = DeadlineScheduler(period_s)
+    stop = threading.Event()
+    applied: Dict[str, object] = {}
+
+    def _run():
+        applied.update(apply_thread(cfg))
+        sched.start()
+        end = time.monotonic() + duration_s
+        while sched.wait_next(stop):
+            if time.monotonic() >= end:
+                break
+
+    loaders = [threading.Thread(target=_load, args=(stop,), daemon=True)] if load else []
+    switch = set_switch_interval(cfg.switch_interval_s if cfg else None)
+    try:
+        with GcGuard(cfg.gc_mode if cfg else None):
+            for t in loaders: t.start()
+            th = threading.Thread(target=_run, name="enip-jitter", daemon=True)
+            th.start()
+            th.join(duration_s + 5.0)
+            stop.set()
+            for t in loaders: t.join(1.0)
+    finally:
+        sys.setswitchinterval(switch)   # each configuration starts from the same interpreter state
+    if cfg is not None and cfg.switch_interval_s is not None:
+        applied["switch_interval_s"] = cfg.switch_interval_s
+    out = sched.stats()
+    out["applied"] = applied
+    return out
+
+def jitter_report(configs: Dict[str, Optional[RtConfig]], period_s: float = 0.002,
+                  duration_s: float = 2.0, load: bool = True) -> str:
+    """Measure every configuration and return a comparison table (µs)."""
+    rows: List[str] = [f"{'config':16s} {'cycles':>7s} {'missed':>6s} {'mean':>8s} {'p99':>8s} {'max':>8s}  applied"]
+    for name, cfg in configs.items():
+        r = measure_jitter(cfg, period_s, duration_s, load)
+        rows.append(f"{name:16s} {r['cycles']:7d} {r['missed']:6d} {r['late_mean_us']:8.1f} "
+                    f"{r['late_p99_us']:8.1f} {r['late_max_us']:8.1f}  {r['applied']}")
+    return "\n".join(rows)
+
+def _parse_cpus(s: Optional[str]) -> Optional[Tuple[int, ...]]:
+    return tuple(int(c) for c in s.split(",")) if s else None
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+    import argparse
+    ap = argparse.ArgumentParser(description="Compare cyclic lateness under RT configurations")
+    ap.add_argument("--period-ms", type=float, default=2.0)
+    ap.add_argument("--seconds", type=float, default=2.0)
+    ap.add_argument("--cpus", default=None, help="comma-separated CPU list to pin to")
+    ap.add_argument("--priority", type=int, default=50)
+    ap.add_argument("--no-load", action="store_true", help="measure without background load")
+    a = ap.parse_args(argv)
+    cpus = _parse_cpus(a.cpus)
+    configs = {
+        "baseline": None,
+        "gc-defer": RtConfig(gc_mode="defer"),
+        "pinned": RtConfig(cpus=cpus) if cpus else None,
+        "fifo": RtConfig(policy="fifo", priority=a.priority),
+        "switch-0.5ms": RtConfig(switch_interval_s=0.0005),
+        "pinned+fifo+gc": RtConfig(cpus=cpus, policy="fifo", priority=a.priority, gc_mode="freeze",
+                                   switch_interval_s=0.0005),
+    }
+    if not cpus:
+        del configs["pinned"]
+    print(jitter_report(configs, a.period_ms / 1000.0, a.seconds, load=not a.no_load))
+
+__all__ = ["RtConfig", "apply_thread", "set_switch_interval", "GcGuard", "measure_jitter", "jitter_report"]
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# tests/conftest.py
+"""Shared fixtures: a loopback simulator and a DriverAPI connected to it."""
+import os, sys, time
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from driver_api import DriverAPI
+from enip_sim import SimAdapter, MotionProfile, SIM_INPUT_MAP
+
+SIM_IP = "127.0.0.2"
+
+def wait_until(cond, timeout: float = 2.0, step: float = 0.005) -> bool:
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if cond():
+            return True
+        time.sleep(step)
+    return cond()
+
+def close_api(d: DriverAPI) -> None:
+    """close() plus the sender's own UDP/2222 socket, which EnipSender keeps for a reconnect;
+    left open, it is connected to the drive and would take that drive's packets from later tests."""
+    d.close()
+    sock = d.tx.udp_socket() if hasattr(d.tx, "udp_socket") else None
+    if sock is not None and not getattr(d.tx, "_udp_shared", True):
+        sock.close()
+
+@pytest.fixture
+def sim():
+    s = SimAdapter(SIM_IP, profile=MotionProfile(default_s=0.05)).start()
+    try:
+        yield s
+    finally:
+        s.stop()
+
+@pytest.fixture
+def drv(sim):
+    d = DriverAPI(sim.ip, rpi_ms=2, input_map=SIM_INPUT_MAP)
+    d.connect()
+    try:
+        yield d
+    finally:
+        close_api(d)
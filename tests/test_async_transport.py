@@ -0,0 +1,67 @@
+# tests/test_async_transport.py
+"""AsyncEnipTransport: shared I/O endpoint, operations and the input watchdog."""
+import asyncio
+import pytest
+from async_driver_api import AsyncDriverAPI
+from async_transport import _ENDPOINTS
+from enip_sim import MotionProfile, start_many
+from forward_open import ForwardOpenParams
+
+@pytest.fixture
+def sims():
+    ss = start_many(2, first=2, profile=MotionProfile(default_s=0.05))
+    try:
+        yield ss
+    finally:
+        for s in ss:
+            s.stop()
+
+def _api(ip: str, **kw) -> AsyncDriverAPI:
+    return AsyncDriverAPI(ip, rpi_ms=2, fo_params=ForwardOpenParams(o2t_rpi_us=2000, t2o_rpi_us=2000, **kw))
+
+def test_drives_share_one_endpoint(sims):
+    async def main():
+        a, b = _api(sims[0].ip), _api(sims[1].ip)
+        await a.connect()
+        await b.connect()
+        try:
+            assert a.tx._ep is b.tx._ep and a.tx._ep.users == 2
+            ok = await asyncio.gather(a.motor_operation(1, timeout_s=2.0), b.motor_operation(2, timeout_s=2.0))
+            assert ok == [True, True]
+            assert a.tx._ep.unrouted == 0
+        finally:
+            await a.close()
+            await b.close()
+        assert not _ENDPOINTS.get(asyncio.get_running_loop())
+    asyncio.run(main())
+
+def test_o2t_size_and_forward_close(sims):
+    async def main():
+        a = _api(sims[0].ip, o2t_size=40)
+        await a.connect()
+        assert a.tx._o2t_size == 40 and len(a.tx.payload.snapshot()) == 40
+        await a.close()
+        assert sims[0].forward_closes == 1 and sims[0].o2t_conn_id == 0
+    asyncio.run(main())
+
+def test_wait_fails_on_dead_drive_and_reconnects(sims):
+    async def main():
+        a = _api(sims[0].ip)
+        await a.connect()
+        try:
+            old = a.tx.conn_id
+            sims[0].drop_connection()
+            t = asyncio.get_running_loop().time()
+            # never satisfied: must fail once the input times out, not at the 10 s deadline
+            assert not await a.tx.wait_for(bits_set=1 << 15, timeout=10.0)
+            assert asyncio.get_running_loop().time() - t < 2.0
+            assert a.tx.link_stats()["drops"] == 1
+            for _ in range(200):
+                if a.tx.conn_id not in (0, old) and not a.input_stale:
+                    break
+                await asyncio.sleep(0.01)
+            assert a.tx.conn_id not in (0, old) and not a.input_stale
+            assert await a.motor_operation(1, timeout_s=2.0)
+        finally:
+            await a.close()
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+# tests/test_bit_waiters.py
+"""BitWaiterIndex: only the waiters whose bits flipped into their condition resolve."""
+from bit_waiters import BitWaiterIndex, matches
+from input_reader import ALM_A, IN_POS, MOVE, READY
+
+class W:
+    def __init__(self):
+        self.words = []
+    def resolve(self, word: int) -> None:
+        self.words.append(word)
+
+def test_matches():
+    assert matches(IN_POS | READY, IN_POS, MOVE)
+    assert not matches(IN_POS | MOVE, IN_POS, MOVE)
+    assert not matches(READY, IN_POS, 0)
+
+def test_resolves_on_edge_and_removes():
+    idx = BitWaiterIndex()
+    in_pos, stopped, alarm = W(), W(), W()
+    idx.add(IN_POS, 0, in_pos)
+    idx.add(IN_POS, MOVE, stopped)
+    idx.add(ALM_A, 0, alarm)
+    assert len(idx) == 3
+    idx.on_word(0, MOVE | IN_POS)           # IN_POS on, but still moving
+    assert (in_pos.words, stopped.words) == ([MOVE | IN_POS], [])
+    idx.on_word(MOVE | IN_POS, IN_POS)      # MOVE off
+    assert stopped.words == [IN_POS]
+    assert alarm.words == [] and len(idx) == 1
+    idx.on_word(IN_POS, IN_POS)             # no change: nothing re-checked
+    idx.on_word(IN_POS, IN_POS | ALM_A)
+    assert alarm.words == [IN_POS | ALM_A] and len(idx) == 0
+
+def test_condition_already_true_waits_for_a_touching_edge():
+    idx = BitWaiterIndex()
+    w = W()
+    idx.add(IN_POS, 0, w)
+    idx.on_word(IN_POS, IN_POS | READY)     # IN_POS did not flip: caller checks the current word itself
+    assert w.words == []
+    idx.on_word(IN_POS | READY, READY)
+    idx.on_word(READY, READY | IN_POS)
+    assert w.words == [READY | IN_POS]
+
+def test_shared_group_and_remove():
+    idx = BitWaiterIndex()
+    a, b, c = W(), W(), W()
+    idx.add(MOVE, 0, a)
+    idx.add(MOVE, 0, b)
+    idx.add(MOVE, 0, c)
+    idx.remove(MOVE, 0, b)
+    idx.remove(MOVE, 0, W())                # unknown waiter: ignored
+    idx.on_word(0, MOVE)
+    assert (a.words, b.words, c.words) == ([MOVE], [], [MOVE])
+    idx.remove(MOVE, 0, a)                  # already resolved: ignored
+    assert len(idx) == 0 and not idx._by_bit
+
+def test_unconditional_waiter_and_resolve_all():
+    idx = BitWaiterIndex()
+    any_change, never = W(), W()
+    idx.add(0, 0, any_change)
+    idx.add(ALM_A, 0, never)
+    idx.on_word(0, READY)
+    assert any_change.words == [READY]
+    idx.resolve_all(0)
+    assert never.words == [0] and len(idx) == 0
@@ -0,0 +1,73 @@
+# tests/test_capture.py
+"""Capture file round trip: CaptureWriter -> CaptureReader -> Replayer sinks."""
+import time
+import pytest
+from capture import (FLAG_APP_ONLY, O2T, T2O, CaptureReader, CaptureWriter, Replayer, listener_sink,
+                     reader_sink)
+from input_listener import UdpInputListener
+from input_reader import IN_POS, MOVE, READY, ImplicitInputReader
+from test_input_listener import t2o_packet
+
+def _app(word: int) -> bytes:
+    return bytes(4) + word.to_bytes(2, "little") + bytes(50)
+
+def _write(path, n: int = 300, **kw) -> CaptureWriter:
+    # small buffers so the records span several chunks; enough of them that none is dropped
+    with CaptureWriter(str(path), label="bench A", buffer_size=4096, buffers=32, **kw) as w:
+        for k in range(n):
+            assert w.record(O2T, bytes([k & 0xFF]) * 44, t=k * 0.001)
+            assert w.record(T2O, _app(k), t=k * 0.001 + 0.0005, flags=FLAG_APP_ONLY)
+    return w
+
+def test_round_trip(tmp_path):
+    w = _write(tmp_path / "run.cap")
+    assert w.stats()["records"] == 600 and w.stats()["dropped"] == 0
+    with CaptureReader(str(tmp_path / "run.cap")) as r:
+        assert r.label == "bench A"
+        assert len(list(r.chunks())) > 1
+        assert r.count() == 600
+        assert r.time_range() == (0.0, pytest.approx(0.2995))
+        recs = [(t, d, fl, bytes(data)) for t, d, fl, data in r.records()]
+        assert recs[0] == (0.0, O2T, 0, bytes(44))
+        assert recs[3] == (0.0015, T2O, FLAG_APP_ONLY, _app(1))
+        win = [int.from_bytes(bytes(data)[4:6], "little") for _, _, _, data in r.records(0.1, 0.105, T2O)]
+        assert win == [100, 101, 102, 103, 104]
+        t, d, off, ln = r.index(direction=O2T)
+        assert len(t) == 300 and set(ln) == {44}
+        assert bytes(r.data(int(off[7]), 44)) == bytes([7]) * 44
+
+def test_truncated_tail_and_bad_file(tmp_path):
+    p = tmp_path / "run.cap"
+    _write(p, 50)
+    with open(p, "ab") as f:
+        f.write(b"CHNK" + bytes(10))            # a chunk header cut short
+    with CaptureReader(str(p)) as r:
+        assert r.count() == 100
+    (tmp_path / "x.cap").write_bytes(b"not a capture" * 10)
+    with pytest.raises(ValueError):
+        CaptureReader(str(tmp_path / "x.cap"))
+
+def test_oversized_record_is_dropped(tmp_path):
+    with CaptureWriter(str(tmp_path / "run.cap"), buffer_size=4096) as w:
+        assert not w.record(T2O, bytes(5000))
+    assert w.stats()["dropped"] == 1
+
+def test_replay_into_reader_and_listener(tmp_path):
+    p = tmp_path / "run.cap"
+    with CaptureWriter(str(p)) as w:
+        w.record(T2O, t2o_packet(1, READY), t=1.0)
+        w.record(T2O, _app(READY | MOVE), t=1.01, flags=FLAG_APP_ONLY)
+        w.record(O2T, bytes(64), t=1.02)
+        w.record(T2O, t2o_packet(2, READY | IN_POS), t=1.04)
+    rd = ImplicitInputReader(fixed_out_offset=4)
+    lis = UdpInputListener("127.0.0.1", fixed_out_offset=4, passive=True)
+    words = []
+    lis.add_packet_hook(lambda app, word, now: words.append(word))
+    with CaptureReader(str(p)) as r:
+        t0 = time.monotonic()
+        res = Replayer(r, speed=1.0).run(reader_sink(rd))
+        assert time.monotonic() - t0 >= 0.035   # recorded pace
+        assert res["replayed"] == 4
+        assert rd.in_pos() and rd.ready()
+        assert Replayer(r, speed=0, direction=T2O).run(listener_sink(lis))["replayed"] == 3
+    assert words == [READY, READY | MOVE, READY | IN_POS]
@@ -0,0 +1,67 @@
+# tests/test_cyclic_scheduler.py
+"""DeadlineScheduler slot grid, late-slot policies and event sends."""
+import threading, time
+import pytest
+from cyclic_scheduler import DeadlineScheduler, EVENT, POLICY_CATCHUP, SLOT
+
+def test_grid_does_not_drift_with_send_time():
+    s = DeadlineScheduler(1.0)
+    s.start(0.0)
+    for n in range(5):
+        s.fired(n + 0.4)                # every send 0.4 periods late
+    assert s.next_deadline == 5.0       # still start + n*period
+    assert s.missed == 0
+    assert s.stats()["late_max_us"] == pytest.approx(0.4e6)
+
+def test_skip_jumps_to_next_future_slot():
+    s = DeadlineScheduler(1.0)
+    s.start(0.0)
+    s.fired(0.0)
+    s.fired(3.5)                        # slot 1 fired 2.5 periods late: slots 2 and 3 are gone
+    assert s.missed == 2
+    assert s.next_deadline == 4.0
+
+def test_catchup_fires_missed_slots_then_skips_the_rest():
+    s = DeadlineScheduler(1.0, policy=POLICY_CATCHUP, max_catchup=2)
+    s.start(0.0)
+    s.fired(0.0)
+    s.fired(10.5)
+    assert s.next_deadline == 2.0       # back-to-back catch-up slot
+    s.fired(10.5)
+    assert s.next_deadline == 3.0
+    s.fired(10.5)                       # bound reached: skip to the next future slot
+    assert s.missed == 7
+    assert s.next_deadline == 11.0
+    s.fired(11.0)
+    assert s.next_deadline == 12.0
+
+def test_bad_policy():
+    with pytest.raises(ValueError):
+        DeadlineScheduler(1.0, policy="late")
+
+def test_event_rephases_grid():
+    s = DeadlineScheduler(1.0, min_gap_s=0.25)
+    s.start(0.0)
+    s.fired(0.0)
+    assert s.event_due == 0.25
+    s.event_fired(0.5)
+    assert s.events == 1
+    assert s.next_deadline == 1.5
+    keep = DeadlineScheduler(1.0, rephase_on_event=False)
+    keep.start(0.0)
+    keep.fired(0.0)
+    keep.event_fired(0.5)
+    assert keep.next_deadline == 1.0
+
+def test_wait_next_event_respects_min_gap():
+    s = DeadlineScheduler(10.0, min_gap_s=0.02)
+    stop, wake = threading.Event(), threading.Event()
+    s.start()
+    assert s.wait_next(stop, wake) == SLOT          # slot 0 is due at once
+    t0 = time.monotonic()
+    wake.set()
+    assert s.wait_next(stop, wake) == EVENT
+    assert time.monotonic() - t0 >= 0.02 - 1e-3     # held back to min_gap_s after the slot
+    assert not wake.is_set()
+    stop.set()
+    assert s.wait_next(stop, wake) is False
@@ -0,0 +1,55 @@
+# tests/test_discovery.py
+"""ListIdentity discovery and connect_many bring-up reports."""
+import threading, time
+from discovery import build_identity_item, connect_many, list_identity, parse_list_identity, LIST_IDENTITY
+from conftest import close_api
+from driver_api import DriverAPI
+
+def test_identity_item_round_trip():
+    item = build_identity_item(0x1AB, 0x2B, 0x55, b"\x02\x07", 0x30, 0x12345678, b"AZD-KD", "10.0.0.5")
+    reply = (LIST_IDENTITY.to_bytes(2, "little") + (2 + len(item)).to_bytes(2, "little") + bytes(20)
+             + (1).to_bytes(2, "little") + item)
+    ident, = parse_list_identity(reply)
+    assert (ident.vendor_id, ident.device_type, ident.product_code) == (0x1AB, 0x2B, 0x55)
+    assert ident.revision == "2.7" and ident.serial == 0x12345678 and ident.product_name == "AZD-KD"
+    assert ident.ip == ident.sockaddr_ip == "10.0.0.5" and ident.state == 0x03
+
+def test_list_identity_finds_simulator(sim):
+    found = list_identity([sim.ip, "127.0.0.9"], timeout_s=0.3)
+    assert [i.ip for i in found] == [sim.ip]
+
+def test_connect_many_reports_each_drive(sim):
+    apis = [DriverAPI(sim.ip, rpi_ms=2), DriverAPI("127.0.0.9", rpi_ms=2)]
+    try:
+        rep = connect_many(apis, timeout_s=1.0)
+        assert rep.connected == [sim.ip] and rep.failed == ["127.0.0.9"]
+        assert not rep.results["127.0.0.9"].timed_out and rep.results["127.0.0.9"].error
+    finally:
+        for a in apis:
+            close_api(a)
+
+class _SlowApi:
+    """Finishes connect() only after `release` is set, i.e. after the deadline."""
+    def __init__(self, ip: str):
+        self.tx = type("Tx", (), {"drive_ip": ip})()
+        self.release = threading.Event()
+        self.connected = False
+        self.closed = threading.Event()
+
+    def connect(self):
+        self.release.wait(5.0)
+        self.connected = True
+
+    def close(self):
+        self.connected = False
+        self.closed.set()
+
+def test_connect_many_closes_a_drive_that_comes_up_late():
+    api = _SlowApi("10.0.0.7")
+    rep = connect_many([api], timeout_s=0.05)
+    res = rep.results["10.0.0.7"]
+    assert res.timed_out and not res.ok
+    api.release.set()
+    assert api.closed.wait(2.0) and not api.connected
+    time.sleep(0.01)
+    assert not res.ok and res.error == "timeout"
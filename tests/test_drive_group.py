@@ -0,0 +1,56 @@
+# tests/test_drive_group.py
+"""DriveGroup coordinated commands against loopback simulators."""
+import pytest
+from drive_group import DriveGroup
+from enip_sim import MotionProfile, start_many
+from o2t_payload import IN_STOP
+
+@pytest.fixture
+def group():
+    sims = start_many(2, first=2, profile=MotionProfile(default_s=0.05))
+    g = DriveGroup()
+    for s in sims:
+        g.add(s.ip, rpi_ms=2)
+    try:
+        assert g.connect_all(timeout_s=2.0).ok
+        yield g, [s.ip for s in sims]
+    finally:
+        g.close_all()
+        for s in sims:
+            s.stop()
+
+def _stopped(g, ips) -> bool:
+    return all(g[ip].out.fixed_in == IN_STOP for ip in ips)
+
+def test_move_all_reaches_in_pos_and_stops(group):
+    g, ips = group
+    res = g.move_all({ips[0]: 1, ips[1]: 2}, timeout_s=2.0)
+    assert res.ok and set(res.reached) == set(ips)
+    assert _stopped(g, ips)
+
+def test_move_all_raises_when_start_not_sent(group):
+    g, ips = group
+    g._recovering.add(g[ips[1]].tx)     # the I/O loop treats this axis as reconnecting
+    try:
+        with pytest.raises(RuntimeError, match=ips[1]):
+            g.move_all({ips[0]: 1, ips[1]: 1}, timeout_s=2.0)
+    finally:
+        g._recovering.discard(g[ips[1]].tx)
+    assert _stopped(g, ips)
+
+def test_move_all_stops_when_start_commit_times_out(group, monkeypatch):
+    g, ips = group
+    real = g.commit
+    calls = []
+
+    def commit(timeout_s=1.0):
+        calls.append(1)
+        res = real(timeout_s)
+        if len(calls) == 1:
+            raise TimeoutError("commit not executed")   # START applied late by the loop
+        return res
+
+    monkeypatch.setattr(g, "commit", commit)
+    with pytest.raises(TimeoutError):
+        g.move_all({ips[0]: 1, ips[1]: 1}, timeout_s=2.0)
+    assert len(calls) == 2 and _stopped(g, ips)
@@ -0,0 +1,67 @@
+# tests/test_input_history.py
+"""InputHistory ring and its vectorized queries, fed packet by packet."""
+import struct
+import pytest
+from input_reader import IN_POS, MOVE, READY, START_R, InputMap
+
+np = pytest.importorskip("numpy")
+from input_history import InputHistory
+
+MAP = InputMap(fixed_out=4, position=8)
+
+# one packet per ms: two moves (START-R -> IN-POS), a READY dropout, an open dropout at the end
+WORDS = [READY | IN_POS, READY | START_R, READY | MOVE | START_R, READY | MOVE, READY | IN_POS,
+         IN_POS, READY | IN_POS, READY | START_R, READY | MOVE, READY, READY | IN_POS, 0]
+
+def _app(word: int, pos: int) -> bytes:
+    return struct.pack("<4xHxxi", word, pos)
+
+@pytest.fixture
+def hist():
+    h = InputHistory(64, input_map=MAP)
+    for k, w in enumerate(WORDS):
+        h.on_packet(_app(w, 10 * k), w, k / 1000)
+    return h
+
+def test_snapshot_columns(hist):
+    s = hist.snapshot()
+    assert len(hist) == hist.total == len(WORDS)
+    assert list(s["word"]) == WORDS
+    assert list(s["position"]) == [10 * k for k in range(len(WORDS))]
+    assert list(s["seq"]) == list(range(len(WORDS)))
+    w = hist.snapshot(0.002, 0.005)
+    assert list(w["t"]) == pytest.approx([0.002, 0.003, 0.004])
+
+def test_moves_and_settle(hist):
+    start, done = hist.moves()
+    assert start == pytest.approx([0.001, 0.007]) and done == pytest.approx([0.004, 0.010])
+    assert hist.move_durations() == pytest.approx([0.003, 0.003])
+    assert hist.settle_times() == pytest.approx([0.0, 0.001])
+    assert hist.edges(MOVE, rising=False) == pytest.approx([0.004, 0.009])
+
+def test_dropouts(hist):
+    down, dur = hist.dropouts()
+    assert down == pytest.approx([0.005, 0.011])
+    assert dur == pytest.approx([0.001, 0.0])   # the last one is still open: up to the last packet
+
+def test_ring_keeps_the_newest_rows():
+    h = InputHistory(4, fields=())
+    for k in range(6):
+        h.on_packet(b"", READY, k / 1000)
+    s = h.snapshot()
+    assert len(h) == 4 and h.total == 6
+    # once wrapped, the oldest slot is the next one the writer fills: it is left out
+    assert list(s["seq"]) == [3, 4, 5] and s["t"] == pytest.approx([0.003, 0.004, 0.005])
+    assert list(h.seq_gaps()) == [1, 1]
+    assert h.intervals() == pytest.approx([0.001] * 2)
+    h.clear()
+    assert len(h) == 0 and h.stats() == {"packets": 0, "total": 0}
+
+def test_short_packet_fields_read_zero():
+    h = InputHistory(8, input_map=MAP)
+    h.on_packet(struct.pack("<4xH", READY), READY, 0.0)
+    assert list(h.snapshot()["position"]) == [0]
+
+def test_field_not_in_map():
+    with pytest.raises(ValueError):
+        InputHistory(8, fields=("speed",), input_map=MAP)
@@ -0,0 +1,101 @@
+# tests/test_input_listener.py
+"""UdpInputListener: sequence filtering, and burst draining (every accepted packet is seen, only get_app() coalesces)."""
+import socket, threading, time
+import pytest
+from input_listener import SeqTracker, UdpInputListener
+from input_reader import IN_POS, MOVE, READY
+from instrument import MetricsCollector
+
+def t2o_packet(seq: int, word: int, conn_id: int = 0x20000001) -> bytes:
+    # CPF as the simulator sends it: 0x8002 (conn id, seq) + 0x00B1 (CTP seq + 56-byte app)
+    app = bytearray(56)
+    app[4:6] = word.to_bytes(2, "little")
+    app[12:16] = seq.to_bytes(4, "little")
+    return (b"\x02\x00" + b"\x02\x80\x08\x00" + conn_id.to_bytes(4, "little") + seq.to_bytes(4, "little") +
+            b"\xb1\x00" + (2 + len(app)).to_bytes(2, "little") + (seq & 0xFFFF).to_bytes(2, "little") + bytes(app))
+
+@pytest.fixture
+def burst():
+    """Listener reading a loopback socket; send(pkts) queues datagrams, then one _drain() reads them."""
+    rx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rx.bind(("127.0.0.1", 0))
+    rx.setblocking(False)
+    tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    lis = UdpInputListener("127.0.0.1", udp_socket=rx, fixed_out_offset=4)
+    lis._rx = rx
+
+    def send(pkts):
+        for p in pkts:
+            tx.sendto(p, rx.getsockname())
+        lis._drain()
+    try:
+        yield lis, send
+    finally:
+        tx.close()
+        rx.close()
+
+def test_hook_sees_every_packet_of_a_burst(burst):
+    lis, send = burst
+    seen = []
+    lis.add_packet_hook(lambda app, word, now: seen.append((int.from_bytes(app[12:16], "little"), word)))
+    words = [READY | IN_POS] * 3 + [READY | MOVE] + [READY | IN_POS] * 4
+    send([t2o_packet(i + 1, w) for i, w in enumerate(words)])
+    assert seen == [(i + 1, w) for i, w in enumerate(words)]
+    assert lis.get_app() == UdpInputListener._extract_app_from_cpf(t2o_packet(len(words), words[-1]))
+    assert lis.fixed_word() == READY | IN_POS
+
+def test_pulse_inside_a_burst_wakes_waiter_and_counts_edges(burst):
+    lis, send = burst
+    mc = MetricsCollector()
+    lis.set_instrumentation(mc.instrumentation("x"))
+    send([t2o_packet(1, READY | IN_POS)])
+    got = []
+    th = threading.Thread(target=lambda: got.append(lis.wait_for(bits_set=MOVE, timeout=2.0)))
+    th.start()
+    time.sleep(0.05)
+    send([t2o_packet(2, READY | MOVE), t2o_packet(3, READY | IN_POS), t2o_packet(5, READY | IN_POS)])
+    th.join()
+    assert got == [True]
+    snap = mc.snapshot()["x"]
+    assert snap["packets_parsed"] == 4
+    assert snap["state_edges"] == 2         # MOVE on, then back to IN-POS
+    assert snap["lost"] == 1                # seq 4 only, not the coalesced ones
+
+def test_coalesce_off_publishes_each(burst):
+    lis, send = burst
+    lis.coalesce = False
+    apps = []
+    lis.add_packet_hook(lambda app, word, now: apps.append(lis.get_app() == app))
+    send([t2o_packet(i, READY) for i in range(1, 5)])
+    assert apps == [True] * 4
+
+def test_seq_tracker_counts_loss_duplicates_and_reorder():
+    t = SeqTracker()
+    assert t.accept(1, 10, 0.0)
+    assert t.accept(1, 11, 0.002)
+    assert not t.accept(1, 11, 0.003)           # duplicate
+    assert t.accept(1, 14, 0.004)               # 12 and 13 missing
+    assert t.lost == 2
+    assert not t.accept(1, 12, 0.005)           # late, not lost after all
+    assert t.stats() == {"accepted": 3, "lost": 1, "duplicates": 1, "reordered": 1}
+    assert t.histogram() == {1 << 11: 2}        # 2000 µs gaps: 1024 < dt <= 2048
+
+def test_seq_tracker_wraps_and_restarts_per_connection():
+    t = SeqTracker()
+    assert t.accept(1, 0xFFFFFFFE, 0.0)
+    assert t.accept(1, 0xFFFFFFFF, 0.001)
+    assert t.accept(1, 1, 0.002)                # wrapped past 0: one lost
+    assert t.lost == 1
+    assert not t.accept(1, 0, 0.003)            # the missing one, late and older across the wrap
+    assert t.lost == 0 and t.reordered == 1
+    assert t.accept(2, 5, 0.004)                # new connection id: sequence restarts
+    assert t.accept(2, 6, 0.005)
+    assert t.accepted == 5 and t.lost == 0
+
+def test_stale_packet_is_not_published(burst):
+    lis, send = burst
+    seen = []
+    lis.add_packet_hook(lambda app, word, now: seen.append(int.from_bytes(app[12:16], "little")))
+    send([t2o_packet(5, READY), t2o_packet(4, MOVE), t2o_packet(5, MOVE), t2o_packet(6, IN_POS)])
+    assert seen == [5, 6]
+    assert lis.get_app()[4] == IN_POS
@@ -0,0 +1,55 @@
+# tests/test_input_reader.py
+"""InputMap compilation and the decode-once ImplicitInputReader."""
+import struct
+import pytest
+from input_reader import ALM_A, IN_POS, MOVE, ImplicitInputReader, InputMap
+
+MAP = InputMap(fixed_out=4, alarm_code=6, position=8, speed=12, remote_io=16, remote_io_words=2)
+
+def _app(fixed=0, alarm=0, pos=0, spd=0, rio=(0, 0)) -> bytes:
+    return struct.pack("<4xHHiiHH", fixed, alarm, pos, spd, *rio)
+
+def test_compiles_to_one_struct():
+    dec = MAP.compile()
+    assert dec.st.format == "<4xHHiiHH"
+    s = dec.decode(_app(IN_POS | ALM_A, 0x1234, -5, 300, (7, 9)))
+    assert (s.raw, s.alarm_code, s.position, s.speed, s.remote_io) == (IN_POS | ALM_A, 0x1234, -5, 300, (7, 9))
+    assert s.in_pos and s.alm_a and not s.move
+
+def test_unmapped_fields_and_short_packets_read_zero():
+    dec = InputMap(fixed_out=4, position=8).compile()
+    s = dec.decode(struct.pack("<4xH2xi", MOVE, 42))
+    assert (s.alarm_code, s.speed, s.remote_io, s.position) == (0, 0, (), 42)
+    s = dec.decode(struct.pack("<4xH", MOVE))           # position missing from a short packet
+    assert (s.raw, s.position) == (MOVE, 0)
+
+def test_four_byte_alarm_code():
+    s = InputMap(fixed_out=4, alarm_code=8, alarm_bytes=4).compile().decode(struct.pack("<4xH2xI", 0, 0x10002))
+    assert s.alarm_code == 0x10002
+
+def test_invalid_maps():
+    with pytest.raises(ValueError, match="overlaps"):
+        InputMap(fixed_out=4, position=5).compile()
+    with pytest.raises(ValueError):
+        InputMap(fixed_out=4, alarm_code=6, alarm_bytes=3).compile()
+    with pytest.raises(ValueError):
+        InputMap().compile()                            # fixed_out not resolved
+
+def test_detect_fixed_out():
+    assert InputMap.detect_fixed_out(struct.pack("<4xH", IN_POS)) == 4
+    assert InputMap.detect_fixed_out(struct.pack("<8xH", MOVE)) == 8
+    assert InputMap.detect_fixed_out(bytes(10)) == 4    # nothing set: default offset
+    assert InputMap(position=12).resolve(struct.pack("<8xH", MOVE)).fixed_out == 8
+
+def test_reader_autodetects_and_decodes_once():
+    r = ImplicitInputReader(input_map=InputMap(position=12))
+    assert r.snapshot().raw == 0 and r.position() == 0  # no input yet
+    app = struct.pack("<8xHxxi", IN_POS, 77)
+    r.update(app)
+    assert r.fixed_out_offset_bytes() == 8
+    s = r.snapshot()
+    assert (s.in_pos, s.position) == (True, 77)
+    r.update(app)                                       # same packet object: cached snapshot kept
+    assert r.snapshot() is s
+    r.update(struct.pack("<8xHxxi", MOVE, 78))
+    assert r.snapshot() is not s and r.position() == 78 and r.move()
@@ -0,0 +1,66 @@
+# tests/test_instrument.py
+"""HdrHistogram precision and buckets, hook registry and MetricsCollector export."""
+import pytest
+from instrument import (COMMAND, FRAME_SENT, PACKET_PARSED, STATE_EDGE, HdrHistogram, Instrumentation,
+                        MetricsCollector)
+
+def test_small_values_are_exact():
+    h = HdrHistogram()
+    for v in range(16):
+        h.record(v)
+    assert (h.percentile(0.0), h.percentile(0.5), h.percentile(1.0)) == (0, 7, 15)
+    assert h.buckets() == [(1, 2), (2, 3), (4, 5), (8, 9), (16, 16)]
+
+def test_percentile_is_a_close_lower_bound():
+    h = HdrHistogram()
+    for v in range(1, 100001):
+        h.record(v)
+    for q in (0.5, 0.9, 0.99):
+        exact = int(q * 100000)
+        assert exact * (1 - 2 ** -4) <= h.percentile(q) <= exact
+    s = h.summary()
+    assert (s["count"], s["min"], s["max"], s["mean"]) == (100000, 1, 100000, 50000.5)
+
+def test_bucket_bounds_are_inclusive():
+    h = HdrHistogram()
+    for v in (16, 32, 33, 64):
+        h.record(v)
+    # 33 shares 32's sub-bucket (width 2 above 32): counted at le=32, within 2**-4
+    assert h.buckets() == [(16, 1), (32, 3), (64, 4)]
+
+def test_clamping_and_empty():
+    h = HdrHistogram(max_value=1000)
+    assert (h.percentile(0.5), h.buckets(), h.summary()["mean"]) == (0, [], 0.0)
+    h.record(-5)
+    h.record(5000)
+    assert (h.min, h.max) == (0, 1000)
+    assert h.percentile(1.0) == 992                 # lower bound of the bucket holding 1000
+
+def test_hooks_ignore_failures_and_reject_unknown_points():
+    ins = Instrumentation("x")
+    seen = []
+    ins.on(FRAME_SENT, lambda *a: 1 / 0)
+    ins.on(FRAME_SENT, lambda *a: seen.append(a))
+    ins.emit(FRAME_SENT, 1.0, 64, 7)
+    assert seen == [(1.0, 64, 7)]
+    with pytest.raises(ValueError):
+        ins.on("frame_lost", print)
+
+def test_collector_counts_and_exports():
+    mc = MetricsCollector()
+    ins = mc.instrumentation("x")
+    for k in range(5):
+        ins.emit(FRAME_SENT, 1.0 + k * 0.002, 64, k)
+    ins.emit(PACKET_PARSED, 1.0, 0, 10)
+    ins.emit(PACKET_PARSED, 1.002, 0, 13)       # 11 and 12 lost
+    ins.emit(COMMAND, 1.010, {"op_select": 1})
+    ins.emit(STATE_EDGE, 1.0125, 0, 2)
+    snap = mc.snapshot()["x"]
+    assert (snap["frames_sent"], snap["bytes_sent"], snap["lost"]) == (5, 320, 2)
+    assert snap["loss_ratio"] == pytest.approx(0.5)
+    assert snap["send_interval_us"]["count"] == 4
+    assert snap["reaction_us"]["max"] == pytest.approx(2500, abs=1)
+    text = mc.prometheus()
+    assert 'enip_frames_sent_total{axis="x"} 5' in text
+    assert 'enip_send_interval_seconds_bucket{axis="x",le="+Inf"} 4' in text
+    assert 'enip_reaction_seconds_count{axis="x"} 1' in text
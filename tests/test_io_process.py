@@ -0,0 +1,41 @@
+# tests/test_io_process.py
+"""ProcessEnipTransport: engine commands and reconnects against the loopback simulator."""
+import pytest
+from conftest import wait_until
+from driver_api import DriverAPI
+from enip_sim import SIM_INPUT_MAP
+from io_process import ProcessEnipTransport
+
+@pytest.fixture
+def pdrv(sim):
+    tx = ProcessEnipTransport(sim.ip)
+    d = DriverAPI(sim.ip, rpi_ms=2, transport=tx, input_map=SIM_INPUT_MAP)
+    d.connect()
+    try:
+        yield d
+    finally:
+        d.close()
+        tx.shutdown()
+
+def test_operation_through_engine(sim, pdrv):
+    assert pdrv.tx.conn_id == sim.o2t_conn_id != 0
+    assert pdrv.Motor_Operation(1, timeout_s=3.0)
+    assert pdrv.tx.frames_sent > 0
+
+def test_late_reply_is_not_taken_for_the_next_command(pdrv):
+    tx = pdrv.tx
+    tx.command_timeout_s = 0.0
+    with pytest.raises(RuntimeError, match="did not answer"):
+        tx.engine_stats()
+    tx.command_timeout_s = 5.0
+    assert tx._call("stop_cyclic") is None      # not the stats dict answered late
+    assert "drops" in tx.link_stats()
+
+def test_parent_follows_engine_reconnect(sim, pdrv):
+    tx = pdrv.tx
+    old = tx.conn_id
+    sim.drop_connection()
+    assert wait_until(lambda: tx.conn_id not in (0, old) and tx.conn_id == sim.o2t_conn_id, 5.0)
+    assert tx.granted.o2t_conn_id == tx.conn_id
+    assert wait_until(lambda: not pdrv.input_stale)
+    assert pdrv.Motor_Operation(2, timeout_s=3.0)
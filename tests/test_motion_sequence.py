@@ -0,0 +1,146 @@
+# tests/test_motion_sequence.py
+"""SequenceRunner driven frame by frame against a scripted drive."""
+import time
+import pytest
+from input_reader import ALM_A, IN_POS, MOVE
+from motion_sequence import AlarmReset, Dwell, Goto, Jog, OnAlarm, Op, Sequence, SequenceRunner, Stop
+from o2t_payload import IN_ALM_RST, IN_FW_JOG, IN_START, IN_STOP, O2TPayload
+
+PERIOD = 0.002
+
+class FakeDrive:
+    """One tick = the sender sends a frame, then the drive's reply is fed to the runner."""
+
+    def __init__(self, seq: Sequence, lookahead: bool = True, move_ticks: int = 4):
+        self.out = O2TPayload()
+        self.frames = 0
+        self.runner = SequenceRunner(seq, self.out, lambda: self.frames, PERIOD, lookahead)
+        self.move_ticks = move_ticks
+        self.moving = 0
+        self.alarm = False
+        self.stuck = False
+        self.started = []           # (frame, op number) per START rising edge
+        self._prev = 0
+
+    def tick(self) -> None:
+        self.frames += 1
+        fin, sel = self.out.fixed_in, self.out.op_select
+        if fin & IN_START and not self._prev & IN_START:
+            self.started.append((self.frames, sel + 1))
+            self.moving = self.move_ticks
+        if fin & IN_ALM_RST:
+            self.alarm = False
+        if fin & IN_STOP:
+            self.moving = 0
+        self._prev = fin
+        if fin & IN_FW_JOG:
+            word = MOVE
+        elif self.moving or self.stuck:
+            self.moving = max(0, self.moving - 1)
+            word = MOVE
+        else:
+            word = IN_POS
+        self.now += PERIOD
+        self.runner.on_packet(b"", word | (ALM_A if self.alarm else 0), self.now)
+
+    def start(self) -> None:
+        self.runner.start()
+        self.now = time.monotonic()     # packet times continue from the runner's start
+
+    def run(self, max_ticks: int = 2000):
+        if not self.frames:
+            self.start()
+        for _ in range(max_ticks):
+            if self.runner.done:
+                break
+            self.tick()
+        return self.runner.result
+
+def test_ops_and_dwell_complete_in_order():
+    d = FakeDrive(Sequence([Op(2), Dwell(0.01, stop=True), Op(1)]))
+    res = d.run()
+    assert res.ok and res.reason == "completed"
+    assert [n for _, n in d.started] == [2, 1]
+    assert [(t.kind, t.outcome) for t in res.steps] == [("Op", "ok"), ("Dwell", "ok"), ("Op", "ok")]
+    assert res.steps[1].duration_s == pytest.approx(0.01, abs=PERIOD)
+    assert d.out.fixed_in == 0
+
+def test_start_waits_for_the_select_frame():
+    d = FakeDrive(Sequence([Op(3)]), lookahead=False)
+    d.start()
+    d.tick()
+    assert (d.out.op_select, d.out.fixed_in) == (2, IN_START)   # select went out in frame 1
+    d.tick()
+    assert d.started == [(2, 3)]
+
+def test_goto_times_and_on_alarm():
+    seq = Sequence([Op(1, label="top"), Goto("top", times=2), OnAlarm("fix"), Stop(),
+                    AlarmReset(label="fix")])
+    d = FakeDrive(seq)
+    res = d.run()
+    assert res.ok
+    assert [n for _, n in d.started] == [1, 1, 1]
+    assert [t.kind for t in res.steps][-3:] == ["OnAlarm", "Stop", "AlarmReset"]
+
+def test_alarm_during_op_jumps_to_handler_or_aborts():
+    seq = Sequence([Op(1), Op(2, label="after"), AlarmReset(label="reset")], on_alarm="reset")
+    d = FakeDrive(seq)
+    d.start()
+    for _ in range(3):
+        d.tick()
+    d.alarm = True
+    res = d.run()
+    assert res.ok and d.alarm is False
+    assert [t.outcome for t in res.steps] == ["alarm", "ok"]
+
+    d = FakeDrive(Sequence([Op(1)]))
+    d.alarm = True
+    res = d.run()
+    assert not res.ok and res.reason.startswith("alarm in step 0")
+
+def test_jog_releases_and_waits_for_decel():
+    d = FakeDrive(Sequence([Jog(0.01), Op(1)]))
+    res = d.run()
+    assert res.ok and [t.kind for t in res.steps] == ["Jog", "Op"]
+    assert d.started and d.out.fixed_in == 0
+
+def test_timeout_and_cancel():
+    d = FakeDrive(Sequence([Op(1, timeout_s=0.02)]))
+    d.stuck = True
+    res = d.run()
+    assert not res.ok and res.reason == "timeout in step 0 (Op)"
+
+    d = FakeDrive(Sequence([Dwell(1.0)]))
+    d.start()
+    d.tick()
+    d.runner.cancel()
+    assert d.runner.done and d.runner.result.steps[-1].outcome == "cancelled"
+    d.tick()                                            # packets after the end are ignored
+    assert len(d.runner.result.steps) == 1
+
+def test_goto_loop_without_wait_is_cut_off():
+    d = FakeDrive(Sequence([Goto("a", label="a")]))
+    res = d.run()
+    assert not res.ok and "Goto loop" in res.reason
+
+def test_invalid_sequences():
+    with pytest.raises(ValueError):
+        Sequence([])
+    with pytest.raises(ValueError):
+        Sequence([Op(0)])
+    with pytest.raises(ValueError):
+        Sequence([Goto("nowhere")])
+    with pytest.raises(ValueError):
+        Sequence([Op(1, label="x"), Op(2, label="x")])
+    with pytest.raises(ValueError):
+        Sequence([Op(1)], on_alarm="missing")
+
+@pytest.mark.parametrize("first, saved", [(Dwell(0.01), 1), (Jog(0.01), 1), (Op(1), 0), (Stop(), 0)])
+def test_lookahead_saves_the_select_frame_after_dwell_and_jog(first, saved):
+    starts = {}
+    for la in (True, False):
+        d = FakeDrive(Sequence([first, Op(2)]), lookahead=la)
+        assert d.run().ok
+        starts[la] = d.started[-1]
+    assert starts[True][1] == starts[False][1] == 2
+    assert starts[False][0] - starts[True][0] == saved
@@ -0,0 +1,78 @@
+# tests/test_o2t_payload.py
+"""O2TPayload fields and the double-buffered publish/copy."""
+import struct
+import pytest
+from o2t_payload import IN_START, IN_STOP, O2T_SIZE, O2TPayload
+
+def test_default_image_is_run_header():
+    p = O2TPayload()
+    assert p.snapshot() == b"\x01\x00\x00\x00" + bytes(O2T_SIZE - 4)
+
+def test_update_lands_all_fields_in_one_publish():
+    p = O2TPayload()
+    pubs = []
+    p.on_publish = lambda: pubs.append(p.snapshot())
+    g = p.generation
+    p.update(op_select=3, set_bits=IN_START | IN_STOP, position=-1000, speed=500, trigger=1)
+    assert len(pubs) == 1 and p.generation == g + 2
+    img = pubs[0]
+    assert img[6] == 3
+    assert struct.unpack_from("<H", img, 8)[0] == IN_START | IN_STOP
+    assert struct.unpack_from("<ii", img, 12) == (-1000, 500)
+    assert struct.unpack_from("<H", img, 28)[0] == 1
+    p.update(clear_bits=IN_STOP)
+    assert p.fixed_in == IN_START
+    assert (p.op_select, p.get("position")) == (3, -1000)   # untouched fields carry over
+
+def test_rejected_update_leaves_image_unchanged():
+    p = O2TPayload()
+    before, g = p.snapshot(), p.generation
+    with pytest.raises(ValueError):
+        p.update(op_select=1, velocity=5)
+    with pytest.raises(ValueError):
+        p.update(op_select=256)
+    assert p.snapshot() == before and p.generation == g
+
+def test_load_and_resize_fit_the_image():
+    p = O2TPayload()
+    p.load(b"\x01\x02\x03")
+    assert p.snapshot() == b"\x01\x02\x03" + bytes(O2T_SIZE - 3)
+    p.resize(2)
+    assert p.snapshot() == b"\x01\x02"
+    p.resize(4)
+    assert p.snapshot() == b"\x01\x02\x00\x00"
+
+def test_copy_retries_when_two_publishes_race_it():
+    p = O2TPayload()
+    p.update(position=1)
+
+    class Racing(bytearray):
+        copies = 0
+        def __setitem__(self, k, v):
+            super().__setitem__(k, v)
+            Racing.copies += 1
+            if Racing.copies == 1:      # writer publishes twice mid-copy: our buffer was reused
+                p.update(position=2)
+                p.update(position=3)
+
+    dst = Racing(O2T_SIZE)
+    p.copy_into(dst)
+    assert Racing.copies == 2
+    assert struct.unpack_from("<i", dst, 12)[0] == 3
+
+def test_copy_keeps_a_single_racing_publish():
+    p = O2TPayload()
+    p.update(position=1)
+    done = []
+
+    class Racing(bytearray):
+        def __setitem__(self, k, v):
+            super().__setitem__(k, v)
+            if not done:
+                done.append(1)
+                p.update(position=2)    # lands in the other buffer; our copy is still whole
+
+    dst = Racing(O2T_SIZE)
+    p.copy_into(dst)
+    assert len(done) == 1
+    assert struct.unpack_from("<i", dst, 12)[0] == 1
@@ -0,0 +1,27 @@
+# tests/test_progress.py
+"""ProgressSnapshot fields and progress_filter."""
+import time
+from input_reader import InputSnapshot, IN_POS, MOVE
+from progress import KEYS, ProgressSnapshot, progress_filter
+
+def _snap(raw: int, mono: float) -> ProgressSnapshot:
+    return ProgressSnapshot().fill(b"\x01\x02", InputSnapshot(raw, 0, 7, 0), 4, True, mono, mono - 1.0, mono + 2.0)
+
+def test_ts_is_wall_time_sampled_per_snapshot(monkeypatch):
+    monkeypatch.setattr(time, "time", lambda: 1000.0)       # e.g. the clock stepped by NTP
+    s = _snap(IN_POS, time.monotonic())
+    assert s.ts == 1000.0 and s["ts"] == 1000.0
+
+def test_dict_compatibility():
+    s = _snap(IN_POS, 50.0)
+    assert s["in_pos"] and not s["move"] and s["position"] == 7
+    assert s["elapsed_s"] == 1.0 and s["remaining_s"] == 2.0 and s["app_hex"] == "0102"
+    assert s.get("nope", 3) == 3 and "position" in s
+    assert list(s.to_dict()) == list(KEYS)
+
+def test_filter_fires_on_bit_change_and_heartbeat():
+    got = []
+    f = progress_filter(lambda s: got.append((s.fixed_out_raw, s.mono)), bits=IN_POS | MOVE, min_interval_s=1.0)
+    for raw, t in [(MOVE, 0.0), (MOVE, 0.5), (MOVE, 1.1), (IN_POS, 1.2), (IN_POS | 0x20, 1.3)]:
+        f(_snap(raw, t))
+    assert got == [(MOVE, 0.0), (MOVE, 1.1), (IN_POS, 1.2)]
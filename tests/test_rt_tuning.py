@@ -0,0 +1,30 @@
+# tests/test_rt_tuning.py
+"""RtConfig application and the process-wide GIL switch interval."""
+import sys, threading
+
+from rt_tuning import RtConfig, apply_thread, measure_jitter, set_switch_interval
+
+def test_apply_thread_leaves_switch_interval_alone():
+    before = sys.getswitchinterval()
+    res = {}
+    th = threading.Thread(target=lambda: res.update(apply_thread(RtConfig(switch_interval_s=before / 4))))
+    th.start(); th.join(2.0)
+    assert sys.getswitchinterval() == before
+    assert "switch_interval_s" not in res
+
+def test_set_switch_interval_returns_previous():
+    before = sys.getswitchinterval()
+    try:
+        assert set_switch_interval(before / 4) == before
+        assert sys.getswitchinterval() == before / 4
+        assert set_switch_interval(None) == before / 4      # None: unchanged
+        assert sys.getswitchinterval() == before / 4
+    finally:
+        set_switch_interval(before)
+    assert sys.getswitchinterval() == before
+
+def test_measure_jitter_restores_switch_interval():
+    before = sys.getswitchinterval()
+    out = measure_jitter(RtConfig(switch_interval_s=before / 4), period_s=0.005, duration_s=0.05, load=False)
+    assert sys.getswitchinterval() == before
+    assert out["applied"]["switch_interval_s"] == before / 4
@@ -0,0 +1,92 @@
+# tests/test_sim_loopback.py
+"""DriverAPI against the loopback simulator: cyclic I/O, reconnect, explicit messaging."""
+import threading, time
+import pytest
+from conftest import wait_until
+from enip_sim import SIM_FEEDBACK_CLASS, SIM_PARAM_CLASS
+from input_reader import IN_POS, MOVE, READY
+
+# === cyclic I/O ===
+def test_connect_cyclic_operation_close(sim, drv):
+    assert drv.tx.conn_id and sim.forward_opens == 1
+    assert drv.wait_for(bits_set=READY, timeout=1.0)
+    assert drv.Motor_Operation(1, timeout_s=2.0)
+    assert drv.wait_for(bits_set=IN_POS, bits_clear=MOVE, timeout=1.0)
+    assert drv.input.snapshot().position == sim.position == sim.profile.distance(0)
+    assert drv.cyclic_stats()["cycles"] > 0
+    drv.close()
+    assert drv.tx.conn_id == 0
+    assert wait_until(lambda: sim.forward_closes == 1 and sim.o2t_conn_id == 0)
+
+def test_wait_for_times_out_on_unset_bit(drv):
+    t = time.monotonic()
+    assert not drv.wait_for(bits_set=MOVE, timeout=0.05)
+    assert time.monotonic() - t < 1.0
+
+# === reconnect ===
+def test_reconnect_after_drive_drops_connection(sim, drv):
+    assert drv.wait_for(bits_set=READY, timeout=1.0)
+    old = drv.tx.conn_id
+    sim.drop_connection()
+    assert wait_until(lambda: drv.link_stats()["drops"] >= 1 and drv.tx.conn_id not in (0, old), 3.0)
+    st = drv.link_stats()
+    assert st["last_downtime_s"] > 0 and st["total_downtime_s"] >= st["last_downtime_s"]
+    assert sim.forward_opens >= 2
+    assert wait_until(lambda: not drv.input_stale)     # T→O flowing on the new connection
+    assert drv.Motor_Operation(2, timeout_s=2.0)
+
+def test_failed_recovery_is_not_booked(sim, drv):
+    drv.tx.stop_cyclic()
+    sim.stop()
+    before = drv.link_stats()
+    drv.tx.reconnect_backoff = (0.01, 0.05)
+    stop = threading.Event()
+    timer = threading.Timer(0.2, stop.set)
+    timer.start()
+    try:
+        drv.tx._recover(stop)
+    finally:
+        timer.cancel()
+    assert drv.tx.conn_id == 0 and drv.tx.session == 0
+    assert drv.link_stats()["total_downtime_s"] == before["total_downtime_s"]
+
+# === explicit messaging ===
+def test_explicit_get_set(sim, drv):
+    ex = drv.explicit
+    ex.set(SIM_PARAM_CLASS, 3, 1, 1234, fmt="<i")
+    assert ex.get(SIM_PARAM_CLASS, 3, 1, fmt="<i", ttl=0) == (1234,)
+    res = ex.get_many([(SIM_PARAM_CLASS, 3, 1), (SIM_FEEDBACK_CLASS, 1, 1)], ttl=0)
+    assert res[0] == (1234).to_bytes(4, "little", signed=True) and len(res[1]) == 4
+
+def _slow_replies(sim, delay_s: float):
+    orig = sim._handle_rr
+    sim._handle_rr = lambda body, ip: (time.sleep(delay_s), orig(body, ip))[1]
+    return orig
+
+def test_explicit_timeout_keeps_io_connection(sim, drv):
+    ex = drv.explicit
+    vendor = ex.get(1, 1, 1, ttl=0)
+    tcp, conn_id = drv.tx._tcp, drv.tx.conn_id
+    orig = _slow_replies(sim, 0.3)
+    ex.timeout_s = 0.1
+    with pytest.raises(TimeoutError):
+        ex.get(1, 1, 3, ttl=0)
+    sim._handle_rr = orig
+    ex.timeout_s = 1.0
+    # the late reply to attr 3 is skipped, not taken for the answer to this request
+    assert ex.get(1, 1, 1, ttl=0) == vendor
+    assert ex.stats()["timeouts"] == 1 and ex.stats()["late_replies"] == 1
+    assert drv.tx._tcp is tcp and drv.tx.conn_id == conn_id
+    assert sim.forward_opens == 1 and drv.link_stats()["drops"] == 0
+    assert drv.Motor_Operation(1, timeout_s=2.0)
+
+def test_forward_close_skips_late_explicit_reply(sim, drv):
+    ex = drv.explicit
+    orig = _slow_replies(sim, 0.2)
+    ex.timeout_s = 0.05
+    with pytest.raises(TimeoutError):
+        ex.get(1, 1, 1, ttl=0)
+    sim._handle_rr = orig
+    drv.tx.stop_cyclic()
+    assert drv.tx.forward_close(timeout_s=1.0)      # its reply, not the late explicit one
+    assert sim.forward_closes == 1 and sim.o2t_conn_id == 0